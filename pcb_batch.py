@@ -0,0 +1,290 @@
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+
+from typing import Optional, Iterator, AsyncIterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pcb_session import *
+from pcb_tool_get import *
+from pcb_tool_check import *
+from pcb_utility import load_const_section
+from pcb_trace import configure_tracing
+from pcb_lazy import lazy_import
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+BATCH_DEFAULTS = {
+    "workers": 4
+}
+
+BATCH_ANALYSES = ['drc', 'density', 'env']
+
+
+def find_boards(patterns: list[str]) -> list[str]:
+    """
+    Expand board files, directories (searched recursively) and glob patterns into a sorted list of .kicad_pcb files
+    without duplicates.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.kicad_pcb'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for match in matches:
+            if match.endswith('.kicad_pcb') and os.path.isfile(match):
+                paths.add(os.path.abspath(match))
+    return sorted(paths)
+
+
+async def analyze_board(file_path: str, analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None) -> dict:
+    """
+    Run the chosen analyses on one board and return plain numbers that can be sent back from a worker process.
+
+    Args:
+        file_path (str): Path to the PCB file.
+        analyses (Optional[list[str]]): Analyses out of BATCH_ANALYSES. If None, runs all.
+        min_clearance (Optional[float]): Minimum clearance in mm between modules for the design rule check.
+
+    Returns:
+        dict: {'file_path', 'error', 'seconds', 'board_area'} plus 'violations', 'onboard_violations', 'clearance_violations'
+        and 'messages' for "drc", 'footprint_area' and 'power_density' for "density", and 'modules', 'nets', 'routed',
+        'connections', 'tracks' and 'vias' for "env".
+    """
+    analyses = analyses if analyses is not None else BATCH_ANALYSES
+    result = {'file_path': file_path, 'error': None}
+    start = time.perf_counter()
+
+    try:
+        board = load_board_readonly(file_path)
+        if not board:
+            result['error'] = "Could not load board"
+            return result
+        if len(board.GetFootprints()) == 0:
+            # Also what a truncated or unparsable file reads as, which must not rank as a clean variant
+            result['error'] = "No modules on the board"
+            return result
+
+        board_courtyard = await get_board_courtyard(board)
+        board_bbox = board_courtyard if board_courtyard is not None else board.ComputeBoundingBox()
+        result['board_area'] = pcbnew.ToMM(board_bbox.GetWidth()) * pcbnew.ToMM(board_bbox.GetHeight())
+
+        if 'drc' in analyses:
+            check = await get_design_rule_state(board, min_clearance).check()
+            violations = check['violations']
+            result['violations'] = len(violations)
+            result['onboard_violations'] = sum(1 for key in violations if key[0] != 'clearance')
+            result['clearance_violations'] = sum(1 for key in violations if key[0] == 'clearance')
+            result['messages'] = list(violations.values())
+
+        if 'density' in analyses:
+            density = await measure_power_density(board)
+            result['footprint_area'] = density['footprint_area']
+            result['power_density'] = density['power_density']
+
+        if 'env' in analyses:
+            env = await collect_pcb_env(board, sections=['modules', 'nets', 'tracks', 'vias'])
+            net_rows = env['nets']['rows']
+            result['modules'] = len(env['modules']['rows'])
+            result['nets'] = len(net_rows)
+            result['routed'] = sum(row[3] for row in net_rows)
+            result['connections'] = sum(row[4] for row in net_rows)
+            result['tracks'] = len(env['tracks']['rows'])
+            result['vias'] = len(env['vias']['rows'])
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+    return result
+
+
+def run_board_analysis(file_path: str, analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None) -> dict:
+    """
+    Entry point on a batch worker.
+    """
+    return asyncio.run(analyze_board(file_path, analyses, min_clearance))
+
+
+def _init_batch_worker() -> None:
+    # Messages printed by the analyses must not mix with the streamed results or the stdio transport of the server
+    sys.stdout = sys.stderr
+    # A forked worker inherits the tracing state of the server, its spans would end up in the server's trace file
+    configure_tracing(False)
+
+
+def submit_batch(paths: list[str], analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None,
+                 workers: Optional[int] = None) -> tuple:
+    """
+    Start the analyses of the boards on a new process pool.
+
+    Args:
+        paths (list[str]): Board files, at least one.
+        analyses (Optional[list[str]]): Analyses out of BATCH_ANALYSES. If None, runs all.
+        min_clearance (Optional[float]): Minimum clearance in mm between modules for the design rule check.
+        workers (Optional[int]): Number of worker processes. If None, uses the BATCH setting in pcb_const.json.
+
+    Returns:
+        tuple: (executor, {future: path}).
+    """
+    workers = workers if workers is not None else load_const_section("BATCH", BATCH_DEFAULTS)["workers"]
+    workers = max(1, min(workers, len(paths)))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker)
+    return executor, {executor.submit(run_board_analysis, path, analyses, min_clearance): path for path in paths}
+
+
+def batch_result(future, path: str) -> dict:
+    try:
+        return future.result()
+    except Exception as e:
+        # A crashed worker takes down the pool, the boards it leaves behind are reported as failed
+        return {'file_path': path, 'error': str(e) or type(e).__name__, 'seconds': 0.0}
+
+
+def iter_batch_results(paths: list[str], analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None,
+                       workers: Optional[int] = None) -> Iterator[dict]:
+    """
+    Analyze the boards over a process pool and yield the result of each board as soon as it finishes. See submit_batch
+    for the arguments.
+    """
+    if not paths:
+        return
+
+    executor, futures = submit_batch(paths, analyses, min_clearance, workers)
+    try:
+        for future in as_completed(futures):
+            yield batch_result(future, futures[future])
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def stream_batch_results(paths: list[str], analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None,
+                               workers: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    iter_batch_results for the server: the results are awaited on the event loop, which keeps serving other tool calls,
+    and each one is yielded as soon as its board finishes. Closing the iterator early cancels the boards that did not
+    start and returns without waiting for the running ones, their worker processes exit once they finish.
+    """
+    if not paths:
+        return
+
+    executor, futures = submit_batch(paths, analyses, min_clearance, workers)
+    pending = {asyncio.wrap_future(future): path for future, path in futures.items()}
+    try:
+        waiting = set(pending)
+        while waiting:
+            done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield batch_result(future, pending[future])
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def rank_batch_results(results: list[dict]) -> list[dict]:
+    """
+    Order board results from best to worst: boards that failed last, then fewest violations, highest power density and
+    smallest board area. Metrics of analyses that were not run do not count.
+    """
+    def key(result):
+        return (result.get('error') is not None, result.get('violations', 0), -result.get('power_density', 0.0),
+                result.get('board_area', float('inf')), result['file_path'])
+    return sorted(results, key=key)
+
+
+def _board_names(results: list[dict]) -> dict:
+    paths = [result['file_path'] for result in results]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return {path: os.path.relpath(path, root) for path in paths}
+
+
+def format_batch_result(result: dict, index: Optional[int] = None, count: Optional[int] = None) -> str:
+    """
+    One progress line of a finished board.
+    """
+    prefix = f"[{index}/{count}] " if index is not None else ""
+    if result.get('error') is not None:
+        return f"{prefix}{result['file_path']}: Error: {result['error']}"
+
+    info = []
+    if 'violations' in result:
+        info.append(f"{result['violations']} violations ({result['onboard_violations']} on-board, {result['clearance_violations']} clearance)")
+    if 'power_density' in result:
+        info.append(f"power density {result['power_density']:.2f}%")
+    info.append(f"board area {result['board_area']:.2f} mm²")
+    if 'connections' in result:
+        info.append(f"routed {result['routed']}/{result['connections']}")
+    return f"{prefix}{result['file_path']}: " + ", ".join(info) + f" ({result['seconds']:.2f} s)"
+
+
+def format_batch_summary(results: list[dict]) -> str:
+    """
+    Summary table of the ranked board results.
+    """
+    if not results:
+        return "No boards analyzed."
+
+    names = _board_names(results)
+    width = max(len("Board"), *(len(name) for name in names.values()))
+
+    def cell(result, key, width, spec=""):
+        value = format(result[key], spec) if key in result else "-"
+        return f"{value:>{width}}"
+
+    header = f"{'Rank':>4}  {'Board':<{width}}  {'Violations':>10}  {'On-Board':>8}  {'Clearance':>9}  {'Density (%)':>11}  {'Area (mm²)':>10}  {'Modules':>7}  {'Routed':>11}  {'Time (s)':>8}"
+    lines = [header, '=' * len(header)]
+    for rank, result in enumerate(rank_batch_results(results), 1):
+        name = names[result['file_path']]
+        if result.get('error') is not None:
+            lines.append(f"{rank:>4}  {name:<{width}}  Error: {result['error']}")
+            continue
+        routed = f"{result['routed']}/{result['connections']}" if 'connections' in result else "-"
+        lines.append(f"{rank:>4}  {name:<{width}}  {cell(result, 'violations', 10)}  {cell(result, 'onboard_violations', 8)}  "
+                     f"{cell(result, 'clearance_violations', 9)}  {cell(result, 'power_density', 11, '.2f')}  {cell(result, 'board_area', 10, '.2f')}  "
+                     f"{cell(result, 'modules', 7)}  {routed:>11}  {result['seconds']:>8.2f}")
+    failed = sum(1 for result in results if result.get('error') is not None)
+    lines.append('=' * len(header))
+    lines.append(f"Boards: {len(results)}, Failed: {failed}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the board analyses over many .kicad_pcb files in parallel and rank them.")
+    parser.add_argument("paths", nargs="+", help="Board files, directories searched for .kicad_pcb files, or glob patterns.")
+    parser.add_argument("--analyses", nargs="+", choices=BATCH_ANALYSES, default=BATCH_ANALYSES, help="Analyses to run.")
+    parser.add_argument("--min-clearance", type=float, default=None, help="Minimum clearance in mm between modules.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--jsonl", default=None, help="Also write each board result as a JSON line to this file, - for stdout.")
+    args = parser.parse_args()
+
+    paths = find_boards(args.paths)
+    if not paths:
+        print("Error: No .kicad_pcb files found", file=sys.stderr)
+        sys.exit(1)
+
+    jsonl = None
+    if args.jsonl is not None:
+        jsonl = sys.stdout if args.jsonl == "-" else open(args.jsonl, 'w')
+    # With JSON lines on stdout the progress lines go to stderr
+    progress = sys.stderr if jsonl is sys.stdout else sys.stdout
+
+    results = []
+    try:
+        for result in iter_batch_results(paths, args.analyses, args.min_clearance, args.workers):
+            results.append(result)
+            print(format_batch_result(result, len(results), len(paths)), file=progress, flush=True)
+            if jsonl is not None:
+                jsonl.write(json.dumps(result, ensure_ascii=False) + "\n")
+                jsonl.flush()
+    finally:
+        if jsonl is not None and jsonl is not sys.stdout:
+            jsonl.close()
+
+    print(format_batch_summary(results), file=progress)
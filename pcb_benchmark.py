@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+from typing import Optional
+from pcb_spatial import *
+from pcb_synth import write_board
+
+
+MM = 1000000
+
+# Modules that must not be imported before the first tool call, see pcb_lazy
+HEAVY_MODULES = ('pcbnew', 'numpy', 'httpx', 'bs4', 'xml.etree.ElementTree')
+
+# Read-only tools first, so the mutating ones do not change the board they are timed on
+BENCH_TOOLS = ['get_pcb_env', 'check_design_rule', 'set_module_position_check_rotations', 'set_board_courtyard', 'get_pcb_image']
+
+
+def random_courtyards(count: int, seed: int = 0, density: float = 0.4) -> list[tuple]:
+    """
+    Generate random courtyard boxes in internal units on a square board whose area grows with count, so the
+    number of neighbours per module stays roughly constant like on a real layout.
+    """
+    rng = random.Random(seed)
+    sizes = [(rng.uniform(1, 12) * MM, rng.uniform(1, 12) * MM) for _ in range(count)]
+    board_size = (sum(w * h for w, h in sizes) / density) ** 0.5
+
+    boxes = []
+    for w, h in sizes:
+        x = rng.uniform(0, board_size - w)
+        y = rng.uniform(0, board_size - h)
+        boxes.append((int(x), int(y), int(x + w), int(y + h)))
+    return boxes
+
+
+def clearance_pairs_naive(boxes: list[tuple], clearance: int) -> list[tuple]:
+    pairs = []
+    for i, box1 in enumerate(boxes):
+        expanded_box1 = inflate_box(box1, clearance)
+        for j in range(i + 1, len(boxes)):
+            if boxes_intersect(expanded_box1, boxes[j]):
+                pairs.append((i, j))
+    return pairs
+
+
+def clearance_pairs_grid(boxes: list[tuple], clearance: int) -> list[tuple]:
+    grid = SpatialGrid.from_boxes(dict(enumerate(boxes)))
+    pairs = []
+    for i, box1 in enumerate(boxes):
+        for j in sorted(grid.query(box1, clearance)):
+            if j > i:
+                pairs.append((i, j))
+    return pairs
+
+
+def bench_clearance(sizes: list[int], naive_limit: int = 2000, clearance_mm: float = 0.2) -> None:
+    """
+    Compare the grid-indexed clearance check against the pairwise loop it replaced.
+    """
+    clearance = int(clearance_mm * MM)
+    print(f"{'modules':>8} {'pairs':>8} {'grid (ms)':>10} {'us/module':>10} {'naive (ms)':>11} {'speedup':>8}")
+    for count in sizes:
+        boxes = random_courtyards(count)
+
+        start = time.perf_counter()
+        pairs = clearance_pairs_grid(boxes, clearance)
+        grid_time = time.perf_counter() - start
+
+        naive_info = f"{'-':>11} {'-':>8}"
+        if count <= naive_limit:
+            start = time.perf_counter()
+            naive_pairs = clearance_pairs_naive(boxes, clearance)
+            naive_time = time.perf_counter() - start
+            assert naive_pairs == pairs, "grid and pairwise clearance checks disagree"
+            naive_info = f"{naive_time * 1e3:>11.1f} {naive_time / grid_time:>7.1f}x"
+
+        print(f"{count:>8} {len(pairs):>8} {grid_time * 1e3:>10.1f} {grid_time / count * 1e6:>10.1f} {naive_info}")
+
+
+def random_ratsnest(count: int, seed: int = 0, nets: int = 40) -> list[tuple]:
+    """
+    Generate random pad-to-pad segments in mm, like the ratsnest of a high-pin-count IC and its neighbours.
+    """
+    rng = random.Random(seed)
+    board_size = 4 * count ** 0.5
+    segments = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(0, board_size), rng.uniform(0, board_size)
+        length, angle = rng.uniform(0.5, 8), rng.uniform(0, 2 * math.pi)
+        segments.append((x1, y1, x1 + length * math.cos(angle), y1 + length * math.sin(angle), f"NET{rng.randrange(nets)}"))
+    return segments
+
+
+def segment_intersections_naive(segments: list) -> list[tuple]:
+    intersecting_pairs = []
+    for i, seg1 in enumerate(segments):
+        for j in range(i + 1, len(segments)):
+            seg2 = segments[j]
+            if seg1[4] == seg2[4]:
+                continue
+            if segments_intersect(seg1[0], seg1[1], seg1[2], seg1[3], seg2[0], seg2[1], seg2[2], seg2[3]):
+                intersecting_pairs.append((i, j, seg1[4], seg2[4]))
+    return intersecting_pairs
+
+
+def bench_ratsnest(sizes: list[int], naive_limit: int = 2000) -> None:
+    """
+    Compare the grid-bucketed ratsnest intersection search against the pairwise loop it replaced.
+    """
+    print(f"{'segments':>8} {'pairs':>8} {'grid (ms)':>10} {'us/segment':>10} {'naive (ms)':>11} {'speedup':>8}")
+    for count in sizes:
+        segments = random_ratsnest(count)
+
+        start = time.perf_counter()
+        pairs = find_segment_intersections(segments)
+        grid_time = time.perf_counter() - start
+
+        naive_info = f"{'-':>11} {'-':>8}"
+        if count <= naive_limit:
+            start = time.perf_counter()
+            naive_pairs = segment_intersections_naive(segments)
+            naive_time = time.perf_counter() - start
+            assert naive_pairs == pairs, "grid and pairwise intersection searches disagree"
+            naive_info = f"{naive_time * 1e3:>11.1f} {naive_time / grid_time:>7.1f}x"
+
+        print(f"{count:>8} {len(pairs):>8} {grid_time * 1e3:>10.1f} {grid_time / count * 1e6:>10.1f} {naive_info}")
+
+
+async def time_server_start(server_module: str, timeout: float) -> tuple:
+    """
+    Start the stdio server in a fresh interpreter and time the responses to initialize and tools/list from process start.
+    """
+    code = f"import {server_module}; {server_module}.mcp.run(transport='stdio')"
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(sys.executable, "-c", code, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.DEVNULL)
+
+    async def request(message: dict) -> dict:
+        proc.stdin.write((json.dumps(message) + "\n").encode())
+        await proc.stdin.drain()
+        while True:
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout)
+            if not line:
+                raise RuntimeError(f"{server_module} exited before answering {message['method']}")
+            response = json.loads(line)
+            if response.get('id') == message['id']:
+                return response
+
+    try:
+        await request({"jsonrpc": "2.0", "id": 1, "method": "initialize",
+                       "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "pcb-benchmark", "version": "0"}}})
+        init_time = time.perf_counter() - start
+        proc.stdin.write((json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}) + "\n").encode())
+        tools = await request({"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        list_time = time.perf_counter() - start
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+    return init_time, list_time, len(tools['result']['tools'])
+
+
+def time_server_import(server_module: str) -> tuple:
+    """
+    Time the import of the server module in a fresh interpreter and list the heavy modules it pulled in.
+    """
+    code = ("import sys, time, json; start = time.perf_counter(); import " + server_module +
+            f"; print(json.dumps([time.perf_counter() - start, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return tuple(json.loads(output.strip().splitlines()[-1]))
+
+
+def bench_startup(runs: int = 5, server_module: str = "pcb_mcp", timeout: float = 60) -> None:
+    """
+    Measure the cold start of the stdio server: import time, first response to initialize and to tools/list.
+    """
+    print(f"{'run':>4} {'import (ms)':>12} {'initialize (ms)':>16} {'tools/list (ms)':>16} {'tools':>6}")
+    import_times, init_times, list_times = [], [], []
+    eager_modules = set()
+    for run in range(1, runs + 1):
+        import_time, loaded = time_server_import(server_module)
+        eager_modules.update(loaded)
+        init_time, list_time, tool_count = asyncio.run(time_server_start(server_module, timeout))
+        import_times.append(import_time)
+        init_times.append(init_time)
+        list_times.append(list_time)
+        print(f"{run:>4} {import_time * 1e3:>12.1f} {init_time * 1e3:>16.1f} {list_time * 1e3:>16.1f} {tool_count:>6}")
+
+    print(f"{'med':>4} {statistics.median(import_times) * 1e3:>12.1f} {statistics.median(init_times) * 1e3:>16.1f} {statistics.median(list_times) * 1e3:>16.1f}")
+    print(f"Heavy modules imported at startup: {', '.join(sorted(eager_modules)) or 'none'}")
+
+
+def tool_calls(file_path: str) -> dict:
+    """
+    Calls of the benchmarked tools on one board, through the same entry points the MCP server uses.
+    """
+    import pcb_mcp
+    import pcb_mcp_next
+
+    return {
+        'get_pcb_env': lambda: pcb_mcp.get_pcb_env(file_path, format="json"),
+        'check_design_rule': lambda: pcb_mcp.check_design_rule(file_path),
+        'set_module_position_check_rotations': lambda: pcb_mcp.set_module_position_check_rotations(file_path, "U1"),
+        'set_board_courtyard': lambda: pcb_mcp.set_board_courtyard(file_path),
+        'get_pcb_image': lambda: pcb_mcp_next.get_pcb_image(file_path),
+    }
+
+
+def scaling_exponent(sizes: list[int], times: list[float]) -> Optional[float]:
+    """
+    Least-squares slope of log(time) over log(size): 1 for linear scaling, 2 for quadratic.
+    """
+    points = [(math.log(size), math.log(t)) for size, t in zip(sizes, times) if t is not None and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+async def time_tools(sizes: list[int], runs: int, tools: list[str], work_dir: str, board_params: dict) -> dict:
+    results = {tool: [] for tool in tools}
+    for count in sizes:
+        file_path = os.path.join(work_dir, f"synth_{count}.kicad_pcb")
+        write_board(file_path, footprints=count, tracks=int(count * board_params['tracks']),
+                    vias=int(count * board_params['vias']), pads=board_params['pads'], fanout=board_params['fanout'], seed=0)
+        calls = tool_calls(file_path)
+        for tool in tools:
+            times = []
+            error = None
+            for _ in range(runs):
+                start = time.perf_counter()
+                msg = await calls[tool]()
+                times.append(time.perf_counter() - start)
+                if isinstance(msg, str) and msg.lstrip().startswith("Error"):
+                    error = msg.strip().splitlines()[0][:120]
+                    break
+            results[tool].append({'footprints': count, 'first': times[0], 'median': statistics.median(times[1:] or times),
+                                  'min': min(times), 'error': error})
+    return results
+
+
+def bench_tools(sizes: list[int], runs: int = 5, tools: Optional[list[str]] = None, output: Optional[str] = None,
+                baseline: Optional[str] = None, board_params: Optional[dict] = None) -> dict:
+    """
+    Time the MCP tools on synthetic boards of growing size and fit how each tool scales with the footprint count. The
+    first call of a tool on a board is reported apart, as it includes loading the board in the worker. With output the
+    results are written as JSON, and with a baseline written that way the medians are compared against it.
+    """
+    tools = tools or BENCH_TOOLS
+    board_params = {'pads': 8, 'fanout': 4, 'tracks': 2.0, 'vias': 0.5, **(board_params or {})}
+
+    with tempfile.TemporaryDirectory(prefix="pcb_bench_") as work_dir:
+        results = asyncio.run(time_tools(sizes, runs, tools, work_dir, board_params))
+
+    previous = {}
+    if baseline is not None:
+        with open(baseline, 'r') as f:
+            for tool, rows in json.load(f)['tools'].items():
+                previous.update({(tool, row['footprints']): row['median'] for row in rows if row['error'] is None})
+
+    exponents = {}
+    for tool, rows in results.items():
+        print(f"{tool}")
+        print(f"{'modules':>8} {'first (ms)':>11} {'median (ms)':>12} {'min (ms)':>10} {'baseline':>9}")
+        for row in rows:
+            if row['error'] is not None:
+                print(f"{row['footprints']:>8} {row['error']}")
+                continue
+            ratio = previous.get((tool, row['footprints']))
+            ratio_info = f"{row['median'] / ratio:>8.2f}x" if ratio else f"{'-':>9}"
+            print(f"{row['footprints']:>8} {row['first'] * 1e3:>11.1f} {row['median'] * 1e3:>12.1f} {row['min'] * 1e3:>10.1f} {ratio_info}")
+        exponent = scaling_exponent([row['footprints'] for row in rows], [row['median'] if row['error'] is None else None for row in rows])
+        exponents[tool] = exponent
+        print(f"Scaling exponent: {exponent:.2f}\n" if exponent is not None else "Scaling exponent: -\n")
+
+    report = {'sizes': sizes, 'runs': runs, 'board': board_params, 'tools': results, 'exponents': exponents}
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the PCB MCP tools.")
+    parser.add_argument("bench", choices=["clearance", "ratsnest", "startup", "tools"], help="Benchmark to run.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help="Problem sizes. Defaults to 100 to 8000 modules, and 50 to 800 for the tools benchmark.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts for the startup benchmark, or calls per tool and size.")
+    parser.add_argument("--server", default="pcb_mcp", help="Server module for the startup benchmark.")
+    parser.add_argument("--tools", nargs="+", choices=BENCH_TOOLS, default=None, help="Tools to time. If not given, times all.")
+    parser.add_argument("--pads", type=int, default=8, help="Pads per footprint of the synthetic boards.")
+    parser.add_argument("--fanout", type=int, default=4, help="Pads per signal net of the synthetic boards.")
+    parser.add_argument("--output", default=None, help="Write the tools benchmark results as JSON to this file.")
+    parser.add_argument("--baseline", default=None, help="Earlier --output file to compare the tools benchmark against.")
+    args = parser.parse_args()
+
+    if args.bench == "clearance":
+        bench_clearance(args.sizes or [100, 250, 500, 1000, 2000, 4000, 8000])
+    elif args.bench == "ratsnest":
+        bench_ratsnest(args.sizes or [100, 250, 500, 1000, 2000, 4000, 8000])
+    elif args.bench == "startup":
+        bench_startup(args.runs, args.server)
+    elif args.bench == "tools":
+        bench_tools(args.sizes or [50, 100, 200, 400, 800], args.runs, args.tools, args.output, args.baseline,
+                    {'pads': args.pads, 'fanout': args.fanout})
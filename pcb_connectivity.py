@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from pcb_spatial import *
+from pcb_session import *
+from pcb_lazy import lazy_import
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+class UnionFind:
+    def __init__(self, count: int = 0):
+        self.parent = list(range(count))
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, node: int) -> int:
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, node1: int, node2: int) -> None:
+        root1, root2 = self.find(node1), self.find(node2)
+        if root1 != root2:
+            self.parent[root2] = root1
+
+
+class BoardConnectivity:
+    """
+    Net-to-pad and pad-to-net maps plus footprint adjacency of a board, built in one pass over its pads.
+
+    Pad objects are kept, so pad positions are always read live and stay valid while modules are moved.
+    """
+
+    def __init__(self, board: pcbnew.BOARD):
+        self.board = board
+        self.net_names = {}
+        self.net_codes = {}
+        self.net_pads = {}
+        self.pad_nets = {}
+        self.footprint_nets = {}
+
+        for net_name, net in board.GetNetsByName().items():
+            net_code = net.GetNetCode()
+            if net_code != 0:
+                self.net_names[net_code] = str(net_name)
+                self.net_codes[str(net_name)] = net_code
+
+        for module in board.GetFootprints():
+            module_ref = module.GetReference()
+            module_nets = self.footprint_nets.setdefault(module_ref, set())
+            for pad in module.Pads():
+                net_code = pad.GetNetCode()
+                self.pad_nets[(module_ref, pad.GetNumber())] = net_code
+                if net_code != 0:
+                    self.net_pads.setdefault(net_code, []).append((module, pad))
+                    module_nets.add(net_code)
+
+    def get_net_code(self, net_name: str) -> int:
+        return self.net_codes.get(net_name, 0)
+
+    def get_adjacent_footprints(self, module_ref: str, exclude_nets: tuple = ()) -> set:
+        """
+        Return the references of all footprints sharing at least one net with the given footprint.
+        """
+        adjacent = set()
+        for net_code in self.footprint_nets.get(module_ref, ()):
+            if self.net_names.get(net_code) in exclude_nets:
+                continue
+            for module, _ in self.net_pads[net_code]:
+                adjacent.add(module.GetReference())
+        adjacent.discard(module_ref)
+        return adjacent
+
+    def get_routing_status(self) -> dict:
+        """
+        Group pads into copper islands with a union-find over tracks, vias, filled zones and pads, and return
+        {net_code: (routed_connections, total_connections)}, where a net with n pads needs n - 1 connections.
+        """
+        union_find = UnionFind()
+        pad_nodes = {}
+        pad_grids = {}
+        for net_code, pads in self.net_pads.items():
+            boxes = {}
+            for module, pad in pads:
+                node = union_find.add()
+                pad_nodes[node] = pad
+                bbox = pad.GetBoundingBox()
+                boxes[node] = (bbox.GetX(), bbox.GetY(), bbox.GetRight(), bbox.GetBottom())
+            pad_grids[net_code] = SpatialGrid.from_boxes(boxes)
+
+        def connect_pads(net_code, node, point, layer):
+            pad_grid = pad_grids.get(net_code)
+            if pad_grid is None:
+                return
+            for pad_node in pad_grid.query((point.x, point.y, point.x, point.y)):
+                pad = pad_nodes[pad_node]
+                if (layer is None or pad.IsOnLayer(layer)) and pad.HitTest(point):
+                    union_find.union(node, pad_node)
+
+        # Items meeting at the same point: a via joins every layer, track ends only join on their own layer
+        junctions = {}
+        for item in self.board.GetTracks():
+            net_code = item.GetNetCode()
+            if net_code == 0:
+                continue
+            node = union_find.add()
+            if item.GetClass() == "PCB_VIA":
+                point = item.GetPosition()
+                junctions.setdefault((net_code, point.x, point.y), []).append((None, node))
+                connect_pads(net_code, node, point, None)
+            else:
+                layer = item.GetLayer()
+                for point in (item.GetStart(), item.GetEnd()):
+                    junctions.setdefault((net_code, point.x, point.y), []).append((layer, node))
+                    connect_pads(net_code, node, point, layer)
+
+        for items in junctions.values():
+            if any(layer is None for layer, _ in items):
+                for _, node in items[1:]:
+                    union_find.union(items[0][1], node)
+            else:
+                first_on_layer = {}
+                for layer, node in items:
+                    if layer in first_on_layer:
+                        union_find.union(first_on_layer[layer], node)
+                    else:
+                        first_on_layer[layer] = node
+
+        for zone in self.board.Zones():
+            net_code = zone.GetNetCode()
+            if net_code == 0 or not zone.IsFilled():
+                continue
+            node = union_find.add()
+            zone_layers = list(zone.GetLayerSet().Seq())
+            for pad_node in pad_grids.get(net_code, SpatialGrid(1)).keys():
+                pad = pad_nodes[pad_node]
+                for layer in zone_layers:
+                    if pad.IsOnLayer(layer) and zone.HitTestFilledArea(layer, pad.GetPosition()):
+                        union_find.union(node, pad_node)
+                        break
+
+        islands = {}
+        for net_code, pad_grid in pad_grids.items():
+            islands[net_code] = {union_find.find(pad_node) for pad_node in pad_grid.keys()}
+
+        status = {}
+        for net_code, pads in self.net_pads.items():
+            total = len(pads) - 1
+            status[net_code] = (total - (len(islands[net_code]) - 1), total)
+        return status
+
+
+_board_connectivity = {}
+
+
+def _release_board_connectivity(path: str) -> None:
+    _board_connectivity.pop(path, None)
+
+board_cache.add_release_hook(_release_board_connectivity)
+
+
+def get_board_connectivity(board: pcbnew.BOARD) -> BoardConnectivity:
+    """
+    Return the connectivity index of a board, built once per board load and shared by all tools.
+    """
+    path = get_board_key(board)
+    connectivity = _board_connectivity.get(path)
+    if connectivity is None or connectivity.board is not board:
+        connectivity = BoardConnectivity(board)
+        if path:
+            _board_connectivity[path] = connectivity
+    return connectivity
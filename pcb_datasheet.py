@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+
+from typing import Optional
+from urllib.parse import urlsplit
+from pcb_utility import CONST_PATH, extract_table_data, load_const_section
+from pcb_lazy import lazy_import
+from pcb_trace import span, traced
+
+
+httpx = lazy_import('httpx')
+bs4 = lazy_import('bs4')
+
+
+DATASHEET_CACHE_DEFAULTS = {
+    "dir": ".datasheet_cache",
+    "ttl_days": 30,
+    "max_bytes": 64 * 1024 * 1024,
+    "offline": False
+}
+
+DATASHEET_FETCH_DEFAULTS = {
+    "max_concurrency": 8,
+    "max_connections_per_host": 4,
+    "host_interval_seconds": 0.2,
+    "retries": 3,
+    "backoff_seconds": 0.5,
+    "page_timeout_seconds": 30,
+    "section_timeout_seconds": 10
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DATASHEET_SECTIONS = re.compile(r'(description|pin|layout guidelines)', re.IGNORECASE)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+def get_datasheet_url(ic_module: str) -> str:
+    return f"https://www.ti.com/document-viewer/{ic_module}/datasheet"
+
+
+def load_datasheet_config() -> dict:
+    config = load_const_section('DATASHEET_CACHE', DATASHEET_CACHE_DEFAULTS)
+    if not os.path.isabs(config['dir']):
+        config['dir'] = os.path.join(os.path.dirname(CONST_PATH), config['dir'])
+    return config
+
+
+def clean_text(element) -> str:
+    text_info = element.get_text(separator=' ', strip=True)
+    return re.sub(r'\s+', ' ', text_info).strip()
+
+
+def find_section_links(html: str, url: str) -> list[tuple]:
+    """
+    Find the (section_title, full_url) links of the wanted sections in the navigation of a datasheet page.
+    """
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    links = soup.find_all('a', attrs={
+        'class': 'no-children',
+        'data-navtitle': DATASHEET_SECTIONS
+    })
+
+    section_links = []
+    for link in links:
+        href = link.get('href', '')
+        section_title = link.get('data-navtitle', '')
+
+        full_url = url if not href.startswith('http') else href
+        if not href.startswith('http'):
+            full_url = f"https:{href}" if href.startswith('/') else f"{url.rstrip('/')}/{href}"
+        section_links.append((section_title, full_url))
+    return section_links
+
+
+def read_subsection(subsection, section_title: str) -> dict:
+    paragraphs_data = [text for text in (clean_text(p) for p in subsection.find_all('p')) if text]
+    lists_data = [text for text in (clean_text(li) for li in subsection.find_all('li')) if text]
+    tables_data = []
+    for table in subsection.find_all('table'):
+        table_info = extract_table_data(table)
+        if table_info:
+            tables_data.append(table_info)
+    return {
+        'section': section_title,
+        'paragraphs': paragraphs_data,
+        'lists': lists_data,
+        'tables': tables_data
+    }
+
+
+def read_section_page(html: str, section_title: str) -> Optional[dict]:
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    for subsection in soup.find_all('div', {'class': 'subsection'}):
+        header = subsection.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        if header and section_title.lower() in header.get_text().lower():
+            return read_subsection(subsection, section_title)
+    return None
+
+
+def read_datasheet_html(html: str) -> list[dict]:
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    infos = []
+    for subsection in soup.find_all('div', {'class': 'subsection'}):
+        header = subsection.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        if header and DATASHEET_SECTIONS.search(header.get_text()):
+            infos.append(read_subsection(subsection, clean_text(header)))
+    return infos
+
+
+# The parsers run on worker threads so the event loop keeps serving other tool calls while a page is parsed
+
+@traced()
+async def parse_section_page(html: str, section_title: str) -> Optional[dict]:
+    """
+    Extract paragraphs, lists and tables of the subsection whose header contains the section title.
+    """
+    return await asyncio.to_thread(read_section_page, html, section_title)
+
+
+@traced()
+async def parse_datasheet_html(html: str) -> list[dict]:
+    """
+    Extract every wanted section from a saved datasheet page, used to seed the cache from local files.
+    """
+    return await asyncio.to_thread(read_datasheet_html, html)
+
+
+class DatasheetFetcher:
+    """
+    Pooled async HTTP client for datasheet pages, shared by all scrapes on one event loop.
+
+    At most max_concurrency requests run at once, requests to the same host are spaced by host_interval_seconds,
+    and connection errors, timeouts and 429/5xx answers are retried with exponential backoff.
+
+    Args:
+        config (dict): DATASHEET_FETCH settings, see DATASHEET_FETCH_DEFAULTS.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.loop = asyncio.get_running_loop()
+        self.client = httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=config['max_concurrency'], max_keepalive_connections=config['max_concurrency'])
+        )
+        self._semaphore = asyncio.Semaphore(config['max_concurrency'])
+        self._host_semaphores = {}
+        self._host_locks = {}
+        self._host_next_time = {}
+
+    async def _wait_for_host(self, host: str) -> None:
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self._host_next_time.get(host, 0) - self.loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._host_next_time[host] = self.loop.time() + self.config['host_interval_seconds']
+
+    async def fetch(self, url: str, timeout: float) -> str:
+        host = urlsplit(url).netloc
+        host_semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.config['max_connections_per_host']))
+        retries = self.config['retries']
+
+        for attempt in range(retries + 1):
+            try:
+                async with self._semaphore, host_semaphore:
+                    await self._wait_for_host(host)
+                    with span("fetch_page"):
+                        response = await self.client.get(url, timeout=timeout)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    response.raise_for_status()
+                    return response.text
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else None
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == retries:
+                    raise
+                delay = None
+            if delay is None:
+                delay = self.config['backoff_seconds'] * 2 ** attempt * (1 + random.random())
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_fetcher = None
+
+
+def get_datasheet_fetcher() -> DatasheetFetcher:
+    global _fetcher
+    # An httpx client cannot be shared across event loops
+    if _fetcher is None or _fetcher.loop is not asyncio.get_running_loop():
+        _fetcher = DatasheetFetcher(load_const_section('DATASHEET_FETCH', DATASHEET_FETCH_DEFAULTS))
+    return _fetcher
+
+
+async def spider_datasheet_info(url: str):
+    try:
+        fetcher = get_datasheet_fetcher()
+        config = fetcher.config
+        html = await fetcher.fetch(url, config['page_timeout_seconds'])
+        section_links = await asyncio.to_thread(find_section_links, html, url)
+
+        async def fetch_section(section_title, full_url):
+            return await parse_section_page(await fetcher.fetch(full_url, config['section_timeout_seconds']), section_title)
+
+        infos = await asyncio.gather(*(fetch_section(section_title, full_url) for section_title, full_url in section_links))
+        return [info for info in infos if info]
+
+    except Exception as e:
+        # stdout is the MCP transport of the server
+        print(f"Error reading page {url}: {str(e)}", file=sys.stderr)
+        return None
+
+
+class DatasheetCache:
+    """
+    On-disk cache of parsed datasheet sections, one JSON file per IC module.
+
+    Entries older than the TTL are scraped again when online and still served when offline. The least recently used
+    entries are deleted once the cache directory grows beyond max_bytes.
+
+    Args:
+        cache_dir (str): Directory holding the cache files.
+        ttl_days (float): Age in days after which an entry is refreshed.
+        max_bytes (int): Maximum total size of the cache files.
+    """
+
+    def __init__(self, cache_dir: str, ttl_days: float, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, ic_module: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9._-]', '_', ic_module.upper()) + '.json')
+
+    def get(self, ic_module: str, allow_stale: bool = False) -> Optional[dict]:
+        path = self._entry_path(ic_module)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not allow_stale and time.time() - entry.get('fetched_at', 0) > self.ttl_seconds:
+            return None
+        # The file access time is unreliable on many mounts, so the mtime records the last use for eviction
+        os.utime(path)
+        return entry
+
+    def put(self, ic_module: str, infos: list[dict], source: str) -> dict:
+        entry = {
+            'ic_module': ic_module,
+            'source': source,
+            'fetched_at': time.time(),
+            'sections': infos
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(ic_module)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+        self._evict(keep=path)
+        return entry
+
+    def _evict(self, keep: str = None) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.cache_dir, name)))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total_bytes -= size
+
+
+def get_datasheet_cache() -> DatasheetCache:
+    config = load_datasheet_config()
+    return DatasheetCache(config['dir'], config['ttl_days'], config['max_bytes'])
+
+
+@traced()
+async def get_datasheet_info(ic_module: str, offline: Optional[bool] = None):
+    """
+    Return the parsed datasheet sections of an IC module from the cache, scraping them when missing or expired.
+
+    Args:
+        ic_module (str): IC module name, e.g. TPS54560.
+        offline (Optional[bool]): Only serve cached entries, even expired ones. If None, uses the configured mode.
+
+    Returns:
+        list[dict] | None: Parsed sections, or None if the datasheet is neither cached nor reachable.
+    """
+    if offline is None:
+        offline = load_datasheet_config()['offline']
+    cache = get_datasheet_cache()
+
+    entry = await asyncio.to_thread(cache.get, ic_module, offline)
+    if entry is not None:
+        return entry['sections']
+    if offline:
+        return None
+
+    url = get_datasheet_url(ic_module)
+    infos = await spider_datasheet_info(url)
+    if infos is None:
+        # Serve an expired entry rather than nothing when the site is unreachable
+        entry = await asyncio.to_thread(cache.get, ic_module, True)
+        return entry['sections'] if entry is not None else None
+
+    await asyncio.to_thread(cache.put, ic_module, infos, url)
+    return infos
+
+
+async def get_datasheet_infos(ic_modules: list[str], offline: Optional[bool] = None) -> dict:
+    """
+    Fetch the datasheets of several IC modules concurrently, each module once.
+
+    Returns:
+        dict: {ic_module: parsed sections or None}.
+    """
+    ic_modules = list(dict.fromkeys(ic_modules))
+    infos = await asyncio.gather(*(get_datasheet_info(ic_module, offline) for ic_module in ic_modules))
+    return dict(zip(ic_modules, infos))
+
+
+def read_text_file(file: str) -> str:
+    with open(file, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+async def seed_datasheet_cache(html_path: str, ic_module: Optional[str] = None) -> list[str]:
+    """
+    Parse saved datasheet pages and store them in the cache. A directory is seeded file by file, each file named after its IC module.
+
+    Returns:
+        list[str]: The seeded IC modules.
+    """
+    if os.path.isdir(html_path):
+        files = [os.path.join(html_path, name) for name in sorted(os.listdir(html_path)) if name.lower().endswith(('.html', '.htm'))]
+    else:
+        files = [html_path]
+
+    cache = get_datasheet_cache()
+    seeded = []
+    for file in files:
+        module = ic_module if ic_module and len(files) == 1 else os.path.splitext(os.path.basename(file))[0]
+        infos = await parse_datasheet_html(await asyncio.to_thread(read_text_file, file))
+        await asyncio.to_thread(cache.put, module, infos, os.path.abspath(file))
+        seeded.append(module)
+    return seeded
@@ -0,0 +1,280 @@
+import sys
+import time
+import asyncio
+import inspect
+import functools
+import importlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pcb_session import *
+from pcb_utility import load_const_section
+from pcb_trace import tracer, span, tool_span, current_tool, collect_spans
+
+
+EXECUTOR_DEFAULTS = {
+    "mode": "process",
+    "workers": 4
+}
+
+_worker_state = threading.local()
+
+
+def redirect_tool_output() -> None:
+    """
+    Send messages printed by the tools to stderr, so they never end up in the stdio transport of the server. The transport
+    keeps the stdout buffer it took when it started, so switching sys.stdout once the first tool call runs is safe.
+    """
+    sys.stdout = sys.stderr
+
+
+def _init_worker() -> None:
+    _worker_state.active = True
+    redirect_tool_output()
+
+
+def in_board_worker() -> bool:
+    return getattr(_worker_state, 'active', False)
+
+
+def run_board_call(module_name: str, func_name: str, file_path: str, args: tuple, kwargs: dict, trace: str = None) -> tuple:
+    """
+    Entry point on a board worker: run the named coroutine function to completion with the board pinned in the session cache.
+
+    Returns:
+        tuple: (result, spans), where spans are the timing spans of the call recorded under the tool named by trace, or
+        None if trace is None.
+    """
+    func = getattr(importlib.import_module(module_name), func_name)
+    func = inspect.unwrap(func)
+    with pinned_board(file_path), collect_spans(trace) as spans:
+        with span("worker"):
+            result = asyncio.run(func(*args, **kwargs))
+    return result, spans.events
+
+
+class BoardLock:
+    """
+    Async reader/writer lock of one board file. Readers share the board, writers are exclusive, and waiting writers
+    block new readers so a stream of reads cannot starve a mutation.
+    """
+
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self._condition = asyncio.Condition()
+
+    def _can_read(self) -> bool:
+        return not self.writer and self.waiting_writers == 0
+
+    def _can_write(self) -> bool:
+        return not self.writer and self.readers == 0
+
+    async def acquire(self, readonly: bool) -> bool:
+        """
+        Returns:
+            bool: True if the lock was contended and the caller had to wait.
+        """
+        async with self._condition:
+            if readonly:
+                contended = not self._can_read()
+                await self._condition.wait_for(self._can_read)
+                self.readers += 1
+            else:
+                contended = not self._can_write()
+                self.waiting_writers += 1
+                try:
+                    await self._condition.wait_for(self._can_write)
+                finally:
+                    self.waiting_writers -= 1
+                self.writer = True
+            return contended
+
+    async def release(self, readonly: bool) -> None:
+        async with self._condition:
+            if readonly:
+                self.readers -= 1
+            else:
+                self.writer = False
+            self._condition.notify_all()
+
+
+class LockMetrics:
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds: float, contended: bool) -> None:
+        self.acquired += 1
+        self.contended += contended
+        self.wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+
+class BoardExecutor:
+    """
+    Runs blocking board work off the event loop on a fixed set of single-threaded workers.
+
+    Every board is bound to one home worker the first time it is used, so all mutations of the same file run in order on
+    the same thread or process and share its loaded board, while different boards are served in parallel. A per-file
+    reader/writer lock serializes mutations, while read-only calls share the board and may fan out to idle workers as
+    long as no transaction keeps unsaved changes on the home worker.
+
+    Args:
+        mode (str): "process" for worker processes, "thread" for worker threads, "inline" to run on the event loop.
+        workers (int): Number of workers.
+    """
+
+    def __init__(self, mode: str = "process", workers: int = 4):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._executors = [None] * self.workers
+        self._affinity = {}
+        self._load = [0] * self.workers
+        self._inflight = [0] * self.workers
+        self._transactions = set()
+        self._board_locks = {}
+        self._lock_metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self, slot: int):
+        executor = self._executors[slot]
+        if executor is None:
+            if self.mode == "process":
+                executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+            else:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"board-worker-{slot}", initializer=_init_worker)
+            self._executors[slot] = executor
+        return executor
+
+    def get_slot(self, file_path: str) -> int:
+        path = resolve_board_path(file_path)
+        with self._lock:
+            slot = self._affinity.get(path)
+            if slot is None:
+                slot = self._load.index(min(self._load))
+                self._affinity[path] = slot
+                self._load[slot] += 1
+            return slot
+
+    def _get_read_slot(self, path: str) -> int:
+        slot = self.get_slot(path)
+        if path in self._transactions or self._inflight[slot] == 0:
+            return slot
+        return self._inflight.index(min(self._inflight))
+
+    def set_transaction(self, file_path: str, active: bool) -> None:
+        path = resolve_board_path(file_path)
+        if active:
+            self._transactions.add(path)
+        else:
+            self._transactions.discard(path)
+
+    async def run(self, file_path: str, func, *args, readonly: bool = False, home_only: bool = False, **kwargs):
+        """
+        Await the coroutine function func(*args, **kwargs) on a worker of the board under its reader/writer lock. func must
+        be a module-level function so worker processes can import it. home_only keeps a read-only call on the home worker
+        of the board, for calls that build on state kept there by earlier calls.
+        """
+        if in_board_worker():
+            return await func(*args, **kwargs)
+
+        path = resolve_board_path(file_path)
+        board_lock = self._board_locks.setdefault(path, BoardLock())
+        metrics = self._lock_metrics.setdefault(path, {'read': LockMetrics(), 'write': LockMetrics()})
+
+        wall_start = time.time()
+        start = time.perf_counter()
+        contended = await board_lock.acquire(readonly)
+        wait_seconds = time.perf_counter() - start
+        metrics['read' if readonly else 'write'].record(wait_seconds, contended)
+        if tracer.enabled:
+            tracer.record(current_tool(func.__name__), "lock_wait", wall_start, wait_seconds)
+        try:
+            if self.mode == "inline":
+                redirect_tool_output()
+                return await func(*args, **kwargs)
+            return await self._run_on_worker(path, func, args, kwargs, readonly and not home_only)
+        finally:
+            await board_lock.release(readonly)
+
+    async def _run_on_worker(self, path: str, func, args: tuple, kwargs: dict, readonly: bool):
+        slot = self._get_read_slot(path) if readonly else self.get_slot(path)
+        loop = asyncio.get_running_loop()
+        self._inflight[slot] += 1
+        try:
+            result, spans = await loop.run_in_executor(self._get_executor(slot), run_board_call,
+                                                       func.__module__, func.__name__, path, args, kwargs,
+                                                       current_tool(func.__name__) if tracer.enabled else None)
+            if spans:
+                tracer.merge(spans)
+            return result
+        except BrokenProcessPool:
+            # A crashed worker process takes its boards with it, start a fresh one on the next call
+            self._executors[slot] = None
+            raise
+        finally:
+            self._inflight[slot] -= 1
+
+    def get_lock_metrics(self, file_path: str = None) -> dict:
+        """
+        Returns:
+            dict: {path: {'read': LockMetrics, 'write': LockMetrics, 'lock': BoardLock}} of all boards or the given one.
+        """
+        paths = [resolve_board_path(file_path)] if file_path else list(self._lock_metrics)
+        return {path: {**self._lock_metrics[path], 'lock': self._board_locks[path]} for path in paths if path in self._lock_metrics}
+
+    def shutdown(self) -> None:
+        for slot, executor in enumerate(self._executors):
+            if executor is not None:
+                executor.shutdown(wait=True)
+                self._executors[slot] = None
+
+
+_board_executor = None
+
+
+def get_board_executor() -> BoardExecutor:
+    global _board_executor
+    if _board_executor is None:
+        config = load_const_section('EXECUTOR', EXECUTOR_DEFAULTS)
+        _board_executor = BoardExecutor(config['mode'], config['workers'])
+    return _board_executor
+
+
+def board_tool(func=None, *, readonly: bool = False, home_only: bool = False, transaction: str = None):
+    """
+    Run an async tool taking file_path on a worker of that board, so the event loop stays free for other requests.
+
+    Args:
+        readonly (bool): The tool never mutates the board, so it may run alongside other read-only tools.
+        home_only (bool): Never send the tool to another worker than the home worker of the board, because it keeps
+            state there between calls.
+        transaction (str): "begin" or "end" for the tools opening or closing a transaction on the board.
+    """
+
+    if func is None:
+        return functools.partial(board_tool, readonly=readonly, home_only=home_only, transaction=transaction)
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        file_path = signature.bind(*args, **kwargs).arguments['file_path']
+        executor = get_board_executor()
+        try:
+            with tool_span(func.__name__):
+                result = await executor.run(file_path, func, *args, readonly=readonly, home_only=home_only, **kwargs)
+        except Exception as e:
+            result = f"Error: {str(e)}"
+        if transaction == "begin" and str(result).startswith("SUCCESS"):
+            executor.set_transaction(file_path, True)
+        elif transaction == "end":
+            executor.set_transaction(file_path, False)
+        return result
+
+    return wrapper
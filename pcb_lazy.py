@@ -0,0 +1,51 @@
+import types
+import importlib
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a heavy module that is only imported when one of its attributes is first used, so importing the tool
+    modules and registering the tools stays cheap.
+
+    Args:
+        name (str): Module to import.
+        fallback (str): Module used instead when name cannot be imported.
+    """
+
+    def __init__(self, name: str, fallback: str = None):
+        super().__init__(name)
+        self._lazy_fallback = fallback
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        if self._lazy_module is None:
+            try:
+                module = importlib.import_module(self.__name__)
+            except ImportError:
+                if self._lazy_fallback is None:
+                    raise
+                module = importlib.import_module(self._lazy_fallback)
+            # Copy the attributes over so later lookups are plain attribute hits instead of going through __getattr__
+            self.__dict__.update((key, value) for key, value in vars(module).items() if not key.startswith('_'))
+            self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = repr(self._lazy_module) if self._lazy_module is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+_lazy_modules = {}
+
+
+def lazy_import(name: str, fallback: str = None) -> LazyModule:
+    """
+    Return a shared lazy stand-in of the named module, imported on first attribute access.
+    """
+    module = _lazy_modules.get((name, fallback))
+    if module is None:
+        module = _lazy_modules.setdefault((name, fallback), LazyModule(name, fallback))
+    return module
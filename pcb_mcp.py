@@ -1,39 +1,53 @@
+import os
 import re
+import json
 import asyncio
-import pcbnew
 
 from typing import Optional
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+from pcb_session import *
+from pcb_executor import *
 from pcb_tool_get import *
 from pcb_tool_set import *
 from pcb_tool_check import *
+from pcb_batch import *
+from pcb_routing import get_routing_jobs, format_routing_job
+from pcb_trace import tracer, configure_tracing, traced_tool, format_tool_timing
+from pcb_lazy import lazy_import
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
 
 
 mcp = FastMCP("PCB", log_level="ERROR")
+configure_tracing()
 
 @mcp.tool()
-async def get_dataset_resource(file_path: str) -> str:
+@traced_tool
+async def get_dataset_resource(file_path: str, offline: Optional[bool] = None) -> str:
     """
     Scrape the IC dataset webpage to extract textual and tabular information about the general description, the pin function and the layout guidance.
+    Parsed datasheets are cached on disk and reused until they expire.
 
     Args:
         file_path (str): Path to the PCB file.
+        offline (Optional[bool]): Only use cached datasheets and never access the web. If None, uses the DATASHEET_CACHE setting in pcb_const.json.
     """
 
-    board = pcbnew.LoadBoard(file_path)
-    if not board:
+    # Only reading the board needs its worker, the scrape itself runs concurrently on the event loop
+    ic_refs = await get_board_executor().run(file_path, get_ic_modules, file_path, readonly=True)
+    if ic_refs is None:
         print(f"Error: Could not load PCB from {file_path}")
         return "Error: Could not load PCB"
-    
+
+    datasheet_infos = await get_datasheet_infos([ic_module for _, ic_module in ic_refs], offline)
+
     msg = ""
-    for module in board.GetFootprints():
-        ref = module.GetReference()
-        if ref.startswith('U'):
-            value = module.GetValue()
-            ic_module = re.sub(r'[A-Za-z]+$', '', value)
-            ic_url = f"https://www.ti.com/document-viewer/{ic_module}/datasheet"
-            datasheet_info = await spider_datasheet_info(ic_url)
-            msg += f"Reference: {ref}, IC Module: {ic_module}, Datasheet Info: {datasheet_info}\n"
+    for ref, ic_module in ic_refs:
+        datasheet_info = datasheet_infos[ic_module]
+        if datasheet_info is None and offline:
+            datasheet_info = "Not cached, seed the datasheet cache or disable the offline mode"
+        msg += f"Reference: {ref}, IC Module: {ic_module}, Datasheet Info: {datasheet_info}\n"
     if not msg:
         return "No modules with reference starting with 'U' found"
 
@@ -41,36 +55,93 @@ async def get_dataset_resource(file_path: str) -> str:
 
 
 @mcp.tool()
-async def get_pcb_env(file_path: str) -> str:
+@traced_tool
+async def seed_dataset_resource(html_path: str, ic_module: Optional[str] = None) -> str:
+    """
+    Seed the datasheet cache from saved datasheet HTML pages, so get_dataset_resource works without internet access.
+
+    Args:
+        html_path (str): Path to a saved HTML page, or to a directory of pages each named after its IC module, e.g. TPS54560.html.
+        ic_module (Optional[str]): IC module of a single page. If None, uses the file name.
+    """
+
+    if not os.path.exists(html_path):
+        return f"Error: {html_path} does not exist"
+
+    try:
+        seeded = await seed_datasheet_cache(html_path, ic_module)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+    if not seeded:
+        return f"Error: No HTML pages found in {html_path}"
+    return f"SUCCESS: Datasheet cache seeded for {', '.join(seeded)}."
+
+
+@mcp.tool()
+@board_tool(readonly=True)
+async def get_pcb_env(file_path: str, format: Optional[str] = None, sections: Optional[list[str]] = None, nets: Optional[list[str]] = None,
+                      refs: Optional[list[str]] = None, precision: Optional[int] = None, since: Optional[str] = None) -> str:
     """
     Analyze the basic pre-defined pcb environment of board, module, track and via.
+    The "json" and "table" formats return a snapshot token, pass it as since on the next call to only get what changed.
     
     Args:
         file_path (str): Path to the PCB file.
+        format (Optional[str]): "text" for the descriptive report, "json" for compact columnar JSON, "table" for tab-separated tables. If None, uses "text".
+        sections (Optional[list[str]]): Sections to include out of "board", "modules", "nets", "tracks" and "vias". If None, includes all.
+        nets (Optional[list[str]]): Only report these nets, glob patterns like "VIN*" are allowed. Only used by the "json" and "table" formats.
+        refs (Optional[list[str]]): Only report these modules, glob patterns like "U*" are allowed. Only used by the "json" and "table" formats.
+        precision (Optional[int]): Decimal places of lengths and angles. If None, uses 2. Only used by the "json" and "table" formats.
+        since (Optional[str]): Token of an earlier call with the same sections, filters and precision. Only the modules, nets, tracks and vias
+            added or changed since then are returned, plus the removed ones. If the board was not modified since then, the
+            answer comes without reading the board again. If None, returns the full environment.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    format = format if format is not None else "text"
+    if format not in ("text", "json", "table"):
+        return f"Error: Unknown format {format}, use text, json or table"
+    if format == "text" and since is not None:
+        return "Error: since needs the json or table format"
+    if sections is not None and any(section not in PCB_ENV_SECTIONS for section in sections):
+        return f"Error: Unknown section, use {', '.join(PCB_ENV_SECTIONS)}"
+
+    board = load_board_readonly(file_path)
     if not board:
         print(f"Error: Could not load PCB from {file_path}")
         return "Error: Could not load PCB"
 
-    info_functions = [ana_board_env, ana_module_env, ana_net_env, ana_track_env, ana_via_env]
+    if format != "text":
+        precision = precision if precision is not None else 2
+        params = {'sections': sections, 'nets': nets, 'refs': refs, 'precision': precision}
+        try:
+            revision = get_board_revision(file_path)
+            env = await reuse_pcb_env_snapshot(board, params, since, revision)
+            if env is None:
+                env = await collect_pcb_env(board, sections, nets, refs, precision)
+                env = await snapshot_pcb_env(board, env, params, since, revision)
+        except Exception as e:
+            return f"Error: {str(e)}\n"
+        return format_pcb_env(env, format)
+
+    info_functions = {'board': ana_board_env, 'modules': ana_module_env, 'nets': ana_net_env, 'tracks': ana_track_env, 'vias': ana_via_env}
     info_results = []
-    for func in info_functions:
+    for section, func in info_functions.items():
+        if sections is not None and section not in sections:
+            continue
         try:
             result = await func(board)
-            info_results.append(result)
+            info_results.append("".join(result))
         except Exception as e:
             error_msg = f"Error: {str(e)}\n"
             return error_msg
-    board_info, module_info, net_info, track_info, via_info = info_results
 
-    msg = f"{board_info}" + f"{'='*60}\n" + "".join(module_info) + f"{'='*60}\n" + "".join(net_info) + f"{'='*60}\n" + "".join(track_info) + f"{'='*60}\n" + "".join(via_info)
-    print(msg)
+    msg = f"{'='*60}\n".join(info_results)
     return msg
 
 
 @mcp.tool()
+@board_tool
 async def init_layout(file_path: str) -> str:
     """
     Initialize the modules to ensure the center of the courtyard is at the origin of each footprint. This is a prerequisite for subsequent layout operations.
@@ -85,7 +156,66 @@ async def init_layout(file_path: str) -> str:
 
 
 @mcp.tool()
-async def set_module_position_check_rotations(file_path: str, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None) -> str:
+@board_tool(transaction="begin")
+async def begin_transaction(file_path: str, flush_ops: Optional[int] = None, flush_seconds: Optional[float] = None) -> str:
+    """
+    Start a transaction on the PCB file. Subsequent layout changes stay on the in-memory board and are saved once on commit.
+
+    Args:
+        file_path (str): Path to the PCB file.
+        flush_ops (Optional[int]): Save automatically after this many changes. If None, only save on commit.
+        flush_seconds (Optional[float]): Save automatically on the next change once unsaved changes are older than this many seconds. If None, only save on commit.
+    """
+
+    board = board_cache.begin(file_path, flush_ops, flush_seconds)
+    if not board:
+        print(f"Error: Could not load PCB from {file_path}")
+        return "Error: Could not load PCB"
+
+    return f"SUCCESS: Transaction started on {file_path}."
+
+
+@mcp.tool()
+@board_tool(transaction="end")
+async def commit_transaction(file_path: str) -> str:
+    """
+    Save all pending layout changes of the open transaction to the PCB file and close the transaction.
+
+    Args:
+        file_path (str): Path to the PCB file.
+    """
+
+    try:
+        pending_ops = board_cache.commit(file_path)
+    except RuntimeError as e:
+        return f"Error: Could not commit transaction - {str(e)}"
+
+    if pending_ops == 0:
+        return "SUCCESS: Transaction committed, no changes to save."
+    return f"SUCCESS: Transaction committed, {pending_ops} changes saved to {file_path}."
+
+
+@mcp.tool()
+@board_tool(transaction="end")
+async def rollback_transaction(file_path: str) -> str:
+    """
+    Discard all unsaved layout changes of the open transaction and close the transaction.
+
+    Args:
+        file_path (str): Path to the PCB file.
+    """
+
+    try:
+        pending_ops = board_cache.rollback(file_path)
+    except RuntimeError as e:
+        return f"Error: Could not roll back transaction - {str(e)}"
+
+    return f"SUCCESS: Transaction rolled back, {pending_ops} unsaved changes discarded."
+
+
+@mcp.tool()
+@board_tool
+async def set_module_position_check_rotations(file_path: str, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, angle_step: Optional[float] = None) -> str:
     """
     Adjust roughly the position of the referred module, and evaluate the module status in four different angles.
 
@@ -94,28 +224,106 @@ async def set_module_position_check_rotations(file_path: str, module_ref: str, p
         module_ref (str): Reference of the module to modify.
         pos_x (Optional[float]): Horizontal position of the module to set in mm. If None, keeps current position.
         pos_y (Optional[float]): Vertical position of the module to set in mm. If None, keeps current position.
+        angle_step (Optional[float]): Step in degrees between the evaluated angles, e.g. 45 for eight angles. If None, evaluates 0, 90, 180 and 270 degrees.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    if angle_step is not None and not 0 < angle_step <= 360:
+        return "Error: angle_step must be greater than 0 and at most 360 degrees"
+
+    board = load_board(file_path)
     
     if not board:
         print(f"Error: Could not load PCB from {file_path}")
         return "Error: Could not load PCB"
 
-    msg_functions = [set_module_position, check_module_status_by_angles]
+    angles = [i * angle_step for i in range(int(360 // angle_step))] if angle_step is not None else None
+
     msg = ""
-    for func in msg_functions:
-        try:
-            result = await func(file_path, board, module_ref, pos_x, pos_y)
-            msg += result
-        except Exception as e:
-            error_msg = f"Error: {str(e)}\n"
-            return error_msg
-    print(msg)
+    try:
+        msg += await set_module_position(file_path, board, module_ref, pos_x, pos_y)
+        msg += await check_module_status_by_angles(file_path, board, module_ref, pos_x, pos_y, angles=angles)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}\n"
+        return error_msg
+    return msg
+
+
+@mcp.tool()
+@board_tool
+async def place_modules(file_path: str, module_refs: list[str], pos_x: Optional[list[Optional[float]]] = None, pos_y: Optional[list[Optional[float]]] = None,
+                        angle: Optional[list[Optional[float]]] = None, min_clearance: Optional[float] = None) -> str:
+    """
+    Move and rotate several modules in one step, and evaluate the clearance and connection status of the placed modules together.
+
+    Args:
+        file_path (str): Path to the PCB file.
+        module_refs (list[str]): References of the modules to place.
+        pos_x (Optional[list[Optional[float]]]): Horizontal positions in mm, one per module. A None entry keeps the current position.
+        pos_y (Optional[list[Optional[float]]]): Vertical positions in mm, one per module. A None entry keeps the current position.
+        angle (Optional[list[Optional[float]]]): Angles in degrees, one per module. A None entry keeps the current angle.
+        min_clearance (Optional[float]): Minimum clearance in mm between modules. If None, uses default 0.2 mm.
+    """
+
+    board = load_board(file_path)
+    if not board:
+        print(f"Error: Could not load PCB from {file_path}")
+        return "Error: Could not load PCB"
+
+    msg = await set_module_placements(file_path, board, module_refs, pos_x, pos_y, angle)
+    if msg.startswith("Error"):
+        return msg
+
+    try:
+        msg += await check_module_placements(board, module_refs, min_clearance)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}\n"
+        return error_msg
+
+    return msg
+
+
+@mcp.tool()
+@board_tool(readonly=True)
+async def search_module_position(file_path: str, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, search_radius: Optional[float] = None,
+                                 step: Optional[float] = None, angle_step: Optional[float] = None, top_k: Optional[int] = None, min_clearance: Optional[float] = None) -> str:
+    """
+    Search candidate positions and angles around a point for the referred module and report the best placements, without moving the module.
+    Apply a reported candidate with place_modules.
+
+    Args:
+        file_path (str): Path to the PCB file.
+        module_ref (str): Reference of the module to place.
+        pos_x (Optional[float]): Horizontal center of the search in mm. If None, uses the current position.
+        pos_y (Optional[float]): Vertical center of the search in mm. If None, uses the current position.
+        search_radius (Optional[float]): Half width of the searched square in mm. If None, uses 5 mm.
+        step (Optional[float]): Distance between candidate positions in mm. If None, uses 1 mm.
+        angle_step (Optional[float]): Step in degrees between the evaluated angles. If None, evaluates 0, 90, 180 and 270 degrees.
+        top_k (Optional[int]): Number of best candidates to report. If None, reports 5.
+        min_clearance (Optional[float]): Minimum clearance in mm between modules. If None, uses default 0.2 mm.
+    """
+
+    if angle_step is not None and not 0 < angle_step <= 360:
+        return "Error: angle_step must be greater than 0 and at most 360 degrees"
+
+    board = load_board_readonly(file_path)
+    if not board:
+        print(f"Error: Could not load PCB from {file_path}")
+        return "Error: Could not load PCB"
+
+    angles = [i * angle_step for i in range(int(360 // angle_step))] if angle_step is not None else None
+
+    try:
+        msg = await check_module_status_by_positions(file_path, board, module_ref, pos_x, pos_y, min_clearance=min_clearance,
+                                                     search_radius=search_radius, step=step, angles=angles, top_k=top_k)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}\n"
+        return error_msg
+
     return msg
 
 
 @mcp.tool()
+@board_tool
 async def adjust_module_angle(file_path: str, module_ref: str, angle: Optional[float] = None) -> str:
     """
     Adjust the angle of the referred module according to the module status feedback of four different angles.
@@ -126,7 +334,7 @@ async def adjust_module_angle(file_path: str, module_ref: str, angle: Optional[f
         angle (Optional[float]): Angle of the module to set in degrees. If None, keeps current angle.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board(file_path)
     if not board:
         print(f"Error: Could not load PCB from {file_path}")
         return "Error: Could not load PCB"
@@ -145,6 +353,7 @@ async def adjust_module_angle(file_path: str, module_ref: str, angle: Optional[f
 
 
 @mcp.tool()
+@board_tool
 async def adjust_module_position(file_path: str, module_ref: str, re_pos_x: Optional[float] = None, re_pos_y: Optional[float] = None) -> str:
     """
     Adjust precisely the position of the referred module given the relative position adjustments.
@@ -156,7 +365,7 @@ async def adjust_module_position(file_path: str, module_ref: str, re_pos_x: Opti
         re_pos_y (Optional[float]): Relative vertical position adjustment of the module to set in mm. If None, keeps current position.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board(file_path)
     if not board:
         print(f"Error: Could not load PCB from {file_path}")
         return "Error: Could not load PCB"
@@ -180,6 +389,7 @@ async def adjust_module_position(file_path: str, module_ref: str, re_pos_x: Opti
 
 
 @mcp.tool()
+@board_tool
 async def set_board_courtyard(file_path: str) -> str:
     """
     Adjust the board size in the Edge.Cuts layer according to the current effective area, and add the copper zone for GND net on B.Cu layer, once the module placement is finished.
@@ -188,13 +398,21 @@ async def set_board_courtyard(file_path: str) -> str:
         path (str): Path to the PCB file.
     """
 
-    msg =  await set_board_cut(file_path)
-    msg += "\n" + await set_board_GND(file_path)
+    msg = ""
+    try:
+        with board_transaction(file_path):
+            msg = await set_board_cut(file_path)
+            if not msg.startswith("Error"):
+                msg += "\n" + await set_board_GND(file_path)
+    except RuntimeError as e:
+        # A failed step rolled back the whole tool call, including the steps that reported success
+        return f"{msg}\nError: {str(e)}"
 
     return msg
 
 
 @mcp.tool()
+@board_tool(readonly=True)
 async def check_power_density(file_path: str) -> str:
     """
     Check the power density of the PCB board by calculating the footprint area ratio and the effective area ratio.
@@ -203,7 +421,7 @@ async def check_power_density(file_path: str) -> str:
         file_path (str): Path to the PCB file.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board_readonly(file_path)
 
     if not board:
         print(f"Error: Could not load board from {file_path}")
@@ -215,34 +433,34 @@ async def check_power_density(file_path: str) -> str:
 
 
 @mcp.tool()
-async def check_design_rule(file_path: str, min_clearance: Optional[float] = None) -> str:
+@board_tool(readonly=True, home_only=True)
+async def check_design_rule(file_path: str, min_clearance: Optional[float] = None, incremental: Optional[bool] = None) -> str:
     """
     Run Design Rule Check (DRC) on the PCB file and report violations. The current implementation checks for module clearance violations.
+    Violations are kept between checks, so only modules moved or rotated since the previous check are rechecked, and the
+    report lists the new, resolved and still-open violations.
     
     Args:
         file_path (str): Path to the PCB file.
         min_clearance (Optional[float]): Minimum clearance in mm between modules. If None, uses default 0.2 mm.
+        incremental (Optional[bool]): Reuse the violations of the previous check. If None, uses True. False rechecks the whole board.
     """
     
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board_readonly(file_path)
     
     if not board:
         print(f"Error: Could not load board from {file_path}")
         return "Error: Could not load board"
 
-    check_functions = [check_board_onboard_violations, check_board_clearance_violations]
-    check_results = []
-    for func in check_functions:
-        try:
-            if func == check_board_clearance_violations:
-                result = await func(board, min_clearance)
-            else:
-                result = await func(board)
-            check_results.append(result)
-        except Exception as e:
-            error_msg = f"Error: {str(e)}\n"
-            return error_msg
-    onboard_violations, clearance_violations = check_results
+    try:
+        state = get_design_rule_state(board, min_clearance, reset=incremental is False)
+        result = await state.check()
+    except Exception as e:
+        error_msg = f"Error: {str(e)}\n"
+        return error_msg
+    violations = result['violations']
+    onboard_violations = [v for key, v in violations.items() if key[0] != 'clearance']
+    clearance_violations = [v for key, v in violations.items() if key[0] == 'clearance']
 
     # Violation summary
     if len(onboard_violations) + len(clearance_violations) == 0:
@@ -272,26 +490,195 @@ Clearance Violations: {len(clearance_violations)}
     if len(clearance_violations) > 0:
         msg += f"{'='*60}\n"
 
-    print(msg)
+    # Changes since the previous check
+    previous = result['previous']
+    if previous is not None:
+        new_violations = [v for key, v in violations.items() if key not in previous]
+        resolved_violations = [v for key, v in previous.items() if key not in violations]
+        open_count = len(violations) - len(new_violations)
+        msg += f"Changes since the previous check: {len(new_violations)} new, {len(resolved_violations)} resolved, {open_count} still open (rechecked {result['rechecked']} of {result['modules']} modules)\n"
+        if len(new_violations) > 0:
+            msg += "New Violations:\n"
+        for i, v in enumerate(new_violations, 1):
+            msg += f"{i}. {v}\n"
+        if len(resolved_violations) > 0:
+            msg += "Resolved Violations:\n"
+        for i, v in enumerate(resolved_violations, 1):
+            msg += f"{i}. {v}\n"
+        msg += f"{'='*60}\n"
+
+    return msg
+
+
+@mcp.tool()
+@traced_tool
+async def batch_analyze(paths: list[str], analyses: Optional[list[str]] = None, min_clearance: Optional[float] = None, workers: Optional[int] = None,
+                        ctx: Context = None) -> str:
+    """
+    Run the design rule check, the power density check and the environment analysis over many board variants in parallel,
+    and rank the variants by violations, power density and board area. Boards are read from disk, so unsaved changes of an
+    open transaction are not seen. The result of each board is sent as a progress and log message as soon as it finishes,
+    the ranked summary is returned at the end.
+
+    Args:
+        paths (list[str]): Board files, directories searched for .kicad_pcb files, or glob patterns like "runs/*/board.kicad_pcb".
+        analyses (Optional[list[str]]): Analyses out of "drc", "density" and "env". If None, runs all.
+        min_clearance (Optional[float]): Minimum clearance in mm between modules. If None, uses default 0.2 mm.
+        workers (Optional[int]): Number of worker processes. If None, uses the BATCH setting in pcb_const.json.
+    """
+
+    if analyses is not None and any(analysis not in BATCH_ANALYSES for analysis in analyses):
+        return f"Error: Unknown analysis, use {', '.join(BATCH_ANALYSES)}"
+
+    board_paths = find_boards(paths)
+    if not board_paths:
+        return "Error: No .kicad_pcb files found"
+
+    results = []
+    async for result in stream_batch_results(board_paths, analyses, min_clearance, workers):
+        results.append(result)
+        if ctx is not None:
+            await ctx.report_progress(len(results), len(board_paths))
+            await ctx.info(format_batch_result(result, len(results), len(board_paths)))
+
+    return format_batch_summary(results)
+
+
+@mcp.tool()
+async def submit_routing_job(file_path: str, seeds: Optional[list[int]] = None, max_parallel: Optional[int] = None, timeout_seconds: Optional[float] = None,
+                             max_passes: Optional[int] = None, keep_connections: Optional[list[list[str]]] = None, jar_path: Optional[str] = None,
+                             nets: Optional[list[str]] = None, use_cache: Optional[bool] = None) -> str:
+    """
+    Start FreeRouting on the board in the background and return a job id right away. The board is routed with several
+    random seeds in parallel, the result with the fewest unrouted connections and then the fewest vias is imported and
+    saved. Poll the job with get_routing_job. The result is not imported if the board was saved by another tool meanwhile.
+    A board routed before with the same placement, nets, copper, zones, saved project design rules and keep_connections
+    reuses the cached result at once.
+
+    Args:
+        file_path (str): Path to the PCB file.
+        seeds (Optional[list[int]]): Random seeds of the router runs. If None, uses the ROUTING setting in pcb_const.json.
+        max_parallel (Optional[int]): Maximum number of router processes at once. If None, uses the ROUTING setting.
+        timeout_seconds (Optional[float]): Seconds after which a router run is stopped. If None, uses the ROUTING setting.
+        max_passes (Optional[int]): Maximum number of router passes. If None, the router decides.
+        keep_connections (Optional[list[list[str]]]): [reference, pad number] pairs to route, e.g. [["U1", "1"], ["C1", "2"]]. If None and nets is None, routes all nets.
+        nets (Optional[list[str]]): Names of the nets to route, e.g. ["VIN", "GND"]. With keep_connections or nets the other pads are left unconnected
+            and the existing tracks and vias stay in place, so power loops can be routed first and the remaining nets in a later job.
+        jar_path (Optional[str]): Path to the FreeRouting JAR file. If None, uses the ROUTING setting.
+        use_cache (Optional[bool]): Reuse a cached result of the same board state. If None, reuses it, pass False to route again with other seeds.
+    """
+
+    if not os.path.exists(resolve_board_path(file_path)):
+        return f"Error: File not found: {file_path}"
+
+    job = get_routing_jobs().submit(file_path, seeds, jar_path, max_parallel, max_passes, timeout_seconds, keep_connections,
+                                      nets, use_cache if use_cache is not None else True)
+    return f"SUCCESS: Routing job {job.id} started with seeds {', '.join(str(run.seed) for run in job.runs)}, poll it with get_routing_job."
+
+
+@mcp.tool()
+async def get_routing_job(job_id: Optional[str] = None) -> str:
+    """
+    Report the progress of a routing job: state, router pass and result of every seed, and the imported result.
+
+    Args:
+        job_id (Optional[str]): Id returned by submit_routing_job. If None, reports all recent jobs.
+    """
+
+    manager = get_routing_jobs()
+    if job_id is None:
+        if not manager.jobs:
+            return "No routing jobs submitted yet."
+        return "\n".join(format_routing_job(job) for job in manager.jobs.values())
+
+    job = manager.get(job_id)
+    if job is None:
+        return f"Error: Unknown routing job {job_id}"
+    return format_routing_job(job)
+
+
+@mcp.tool()
+async def cancel_routing_job(job_id: str) -> str:
+    """
+    Stop the router processes of a routing job. The board is left unchanged.
+
+    Args:
+        job_id (str): Id returned by submit_routing_job.
+    """
+
+    return get_routing_jobs().cancel(job_id)
+
+
+@mcp.tool()
+async def get_lock_metrics(file_path: Optional[str] = None) -> str:
+    """
+    Report how long tool calls waited for the per-board read and write locks, and how often they had to wait.
+
+    Args:
+        file_path (Optional[str]): Path to the PCB file. If None, reports all boards used so far.
+    """
+
+    metrics = get_board_executor().get_lock_metrics(file_path)
+    if not metrics:
+        return "No lock activity recorded yet."
+
+    msg = ""
+    for path, board_metrics in metrics.items():
+        board_lock = board_metrics['lock']
+        msg += f"Board: {path}, Active Readers: {board_lock.readers}, Active Writer: {board_lock.writer}, Waiting Writers: {board_lock.waiting_writers}\n"
+        for mode in ['read', 'write']:
+            lock_metrics = board_metrics[mode]
+            mean_wait = lock_metrics.wait_seconds / lock_metrics.acquired if lock_metrics.acquired else 0.0
+            msg += f"  {mode.capitalize()} Lock: {lock_metrics.acquired} acquired, {lock_metrics.contended} contended, "
+            msg += f"Mean Wait: {mean_wait * 1e3:.2f} ms, Max Wait: {lock_metrics.max_wait_seconds * 1e3:.2f} ms, Total Wait: {lock_metrics.wait_seconds:.3f} s\n"
+
     return msg
 
+
+@mcp.tool()
+async def get_tool_timing(tool: Optional[str] = None, reset: Optional[bool] = None) -> str:
+    """
+    Report where the time of the tool calls went: call counts, the time spent in each phase (board load, geometry checks,
+    zone fill, SVG plotting, datasheet scraping, save, ...) and a histogram of the whole call per tool.
+
+    Args:
+        tool (Optional[str]): Only report this tool. If None, reports all tools called so far.
+        reset (Optional[bool]): Clear the collected timings after reporting them. If None, keeps them.
+    """
+
+    if not tracer.enabled and not tracer.stats:
+        return "Timing is off, turn it on with set_tool_timing or the TRACE setting in pcb_const.json."
+
+    stats = tracer.get_stats(tool)
+    if reset:
+        tracer.reset()
+    if not stats:
+        return "No tool calls timed yet."
+    return format_tool_timing(stats)
+
+
+@mcp.tool()
+async def set_tool_timing(enabled: bool, trace_file: Optional[str] = None) -> str:
+    """
+    Turn the timing of tool calls on or off.
+
+    Args:
+        enabled (bool): Time the tool calls and their phases.
+        trace_file (Optional[str]): Also append every timed phase as a JSON line to this file. If None, only aggregates.
+    """
+
+    configure_tracing(enabled, trace_file)
+    state = "on" if enabled else "off"
+    return f"SUCCESS: Tool timing turned {state}" + (f", tracing to {trace_file}." if enabled and trace_file else ".")
+
+
+@mcp.resource("pcb://timing")
+def tool_timing_resource() -> str:
+    """
+    Per-tool span timings and histograms as JSON.
+    """
+    stats = tracer.get_stats()
+    return json.dumps({tool: {name: span_stats.as_dict() for name, span_stats in spans.items()} for tool, spans in stats.items()})
+
 if __name__ == "__main__":
-    # mcp.run(transport="stdio")
-
-    file_path = r"test_board\test.kicad_pcb"
-    module_ref = "L1"
-    pos_x = 55.0
-    pos_y = 40
-    angle = 90
-    asyncio.run(set_module_position_check_rotations(file_path, module_ref))
-
-    # center_x = 75.0
-    # center_y = 50.0
-    # size_x = 20.0
-    # size_y = 20.0
-
-    # asyncio.run(get_pcb_env(file_path))
-    # asyncio.run(init_pcb(file_path))
-    # asyncio.run(label_area(file_path, "myVOUT", center_x, center_y, size_x, size_y))
-    # asyncio.run(check_design_rule(file_path))
-    # asyncio.run(set_board(file_path))
\ No newline at end of file
+    mcp.run(transport="stdio")
@@ -1,18 +1,26 @@
 import re
 import json
 import asyncio
-import pcbnew
 
 from typing import Optional
 from mcp.server.fastmcp import FastMCP
+from pcb_session import *
+from pcb_executor import *
 from pcb_tool_get import *
 from pcb_tool_set import *
 from pcb_tool_check import *
+from pcb_trace import configure_tracing
+from pcb_lazy import lazy_import
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
 
 
 mcp = FastMCP("PCB", log_level="ERROR")
+configure_tracing()
 
 @mcp.tool()
+@board_tool
 async def label_area(file_path: str, func: str, center_x: float, center_y: float, size_x: float, size_y: float) -> str:
     """
     Label a rectangular area by its function on a specific user layer.
@@ -26,19 +34,26 @@ async def label_area(file_path: str, func: str, center_x: float, center_y: float
         size_y (float): Height of the area in mm.
     """
 
-    msg = await label_shape_by_layer(file_path, func, center_x, center_y, size_x, size_y)
-    msg = await label_zone_by_name(file_path, func, center_x, center_y, size_x, size_y)
+    msg = ""
+    try:
+        with board_transaction(file_path):
+            msg = await label_shape_by_layer(file_path, func, center_x, center_y, size_x, size_y)
+            if not msg.startswith("Error"):
+                msg = await label_zone_by_name(file_path, func, center_x, center_y, size_x, size_y)
+    except RuntimeError as e:
+        return f"{msg}\nError: {str(e)}"
 
     return msg
 
 
 @mcp.tool()
+@board_tool
 async def adjust_net_track(file_path: str, net: str, start_x: list[float], start_y: list[float], end_x: list[float], end_y: list[float], width: list[float]) -> str:
     """
     Adjust the position and width of tracks for a net.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board(file_path)
 
     if not board:
         print(f"Error: Could not load board from {file_path}")
@@ -50,6 +65,7 @@ async def adjust_net_track(file_path: str, net: str, start_x: list[float], start
 
 
 @mcp.tool()
+@board_tool(readonly=True)
 async def get_pcb_image(file_path: str) -> str:
     """
     Export svg images of the current PCB layout with the board outline adjusted to the effective area.
@@ -59,6 +75,5 @@ async def get_pcb_image(file_path: str) -> str:
     """
 
     msg = await export_pcb_image(file_path)
-    print(msg)
 
     return msg
\ No newline at end of file
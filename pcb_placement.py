@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+from pcb_spatial import *
+from pcb_utility import *
+from pcb_connectivity import *
+from pcb_lazy import lazy_import
+from pcb_trace import traced
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+np = lazy_import('numpy')
+
+
+PLACEMENT_SEARCH_DEFAULTS = {
+    "max_candidates": 200000,
+    "chunk_size": 4096
+}
+
+
+class PlacementEvaluator:
+    """
+    Batched evaluation of candidate placements (x, y, angle) of one module against the rest of the board.
+
+    Pad offsets and the courtyard outline are taken once in the module's local frame, so clearance, pad-to-pad
+    distances and ratsnest crossings of any number of candidates are computed with NumPy without modifying the board.
+    Courtyard boxes find the neighbours a candidate may touch, and the true outlines confirm them like the design rule
+    check does.
+    Positions are in internal units, distances in the results are in mm like the rest of the tool output.
+    """
+
+    def __init__(self, module_ref: str, outline_polylines: list, outline_margin: int, neighbor_refs: list[str], neighbor_boxes,
+                 neighbor_outlines: list[tuple], edges: list[tuple], edge_pad_local, edge_partner_pos, edge_partner_module_pos,
+                 board_box: tuple = None):
+        self.module_ref = module_ref
+        self.board_box = board_box
+        self.outline_polylines = outline_polylines
+        self.outline_points = np.asarray([point for polyline in outline_polylines for point in polyline], dtype=float).reshape(-1, 2)
+        self.outline_margin = outline_margin
+        # A rectangular outline stays a rectangle at multiples of 90 degrees, its candidates are confirmed from the boxes alone
+        self.outline_is_rect = outline_rect(outline_segments(outline_polylines, (0, 0), 0)) is not None
+        self.neighbor_refs = neighbor_refs
+        self.neighbor_boxes = np.asarray(neighbor_boxes, dtype=float).reshape(-1, 4)
+        self.neighbor_outlines = neighbor_outlines
+        self.neighbor_margins = np.array([margin for _, margin, _ in neighbor_outlines], dtype=float)
+        self.neighbor_rects = np.array([rect if rect is not None else (np.nan,) * 4 for _, _, rect in neighbor_outlines],
+                                       dtype=float).reshape(-1, 4)
+        self.edges = edges
+        self.edge_pad_local = np.asarray(edge_pad_local, dtype=float).reshape(-1, 2)
+        self.edge_partner_pos = np.asarray(edge_partner_pos, dtype=float).reshape(-1, 2)
+        self.edge_partner_module_pos = np.asarray(edge_partner_module_pos, dtype=float).reshape(-1, 2)
+
+        nets = np.array([edge[4] for edge in edges], dtype=object)
+        self.edge_pair_mask = np.triu(nets[:, None] != nets[None, :], k=1) if len(edges) else np.zeros((0, 0), dtype=bool)
+
+    @classmethod
+    @traced("placement_setup")
+    async def from_board(cls, board: pcbnew.BOARD, module: pcbnew.FOOTPRINT, courtyard_index=None):
+        module_ref = module.GetReference()
+        pos = module.GetPosition()
+        angle_degrees = module.GetOrientationDegrees()
+
+        polylines, margin = await get_footprint_outline(module)
+
+        if courtyard_index is None:
+            courtyard_index = await build_courtyard_index(board)
+        courtyard_grid, courtyards = courtyard_index
+        neighbor_refs = []
+        neighbor_boxes = []
+        neighbor_outlines = []
+        for j, (module_j, _) in enumerate(courtyards):
+            ref_j = module_j.GetReference()
+            if ref_j != module_ref:
+                neighbor_refs.append(ref_j)
+                neighbor_boxes.append(courtyard_grid.get(j))
+                neighbor_outlines.append(await get_footprint_segments(module_j))
+
+        # Same connection order as check_pad2pad_connection: module pads, then partner pads in board order
+        connectivity = get_board_connectivity(board)
+        edges = []
+        edge_pad_world = []
+        edge_partner_pos = []
+        edge_partner_module_pos = []
+        for pad in module.Pads():
+            net_name = pad.GetNetname()
+            if net_name == "" or net_name == "GND":
+                continue
+            pad_pos = pad.GetPosition()
+            for module_i, pad_i in connectivity.net_pads.get(pad.GetNetCode(), []):
+                if module_i.GetReference() != module_ref and module_i.IsLocked() == False:
+                    pad_i_pos = pad_i.GetPosition()
+                    module_i_pos = module_i.GetPosition()
+                    edges.append((pad.GetNumber(), module_ref, pad_i.GetNumber(), module_i.GetReference(), net_name))
+                    edge_pad_world.append((pad_pos.x, pad_pos.y))
+                    edge_partner_pos.append((pad_i_pos.x, pad_i_pos.y))
+                    edge_partner_module_pos.append((module_i_pos.x, module_i_pos.y))
+
+        edge_pad_local = board_to_local(edge_pad_world, (pos.x, pos.y), angle_degrees)
+
+        board_courtyard = await get_board_courtyard(board)
+        board_box = box_to_tuple(board_courtyard) if board_courtyard else None
+
+        return cls(module_ref, polylines, margin, neighbor_refs, neighbor_boxes, neighbor_outlines,
+                   edges, edge_pad_local, edge_partner_pos, edge_partner_module_pos, board_box)
+
+    @staticmethod
+    def _rotate(points, xs, ys, angles):
+        """
+        Map local points (P x 2) to board coordinates for K candidates, giving K x P x 2.
+        """
+        radians = np.radians(angles)
+        cos = np.round(np.cos(radians), 12)[:, None]
+        sin = np.round(np.sin(radians), 12)[:, None]
+        local_x = points[None, :, 0]
+        local_y = points[None, :, 1]
+        board_x = xs[:, None] + local_x * cos + local_y * sin
+        board_y = ys[:, None] - local_x * sin + local_y * cos
+        return np.stack((board_x, board_y), axis=-1)
+
+    @staticmethod
+    def _orientation(a, b, c):
+        cross = (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+        return np.sign(cross)
+
+    @staticmethod
+    def _on_segment(a, b, c):
+        return ((np.minimum(a[..., 0], b[..., 0]) <= c[..., 0]) & (c[..., 0] <= np.maximum(a[..., 0], b[..., 0])) &
+                (np.minimum(a[..., 1], b[..., 1]) <= c[..., 1]) & (c[..., 1] <= np.maximum(a[..., 1], b[..., 1])))
+
+    def _intersect(self, a, b):
+        """
+        Pairwise intersection of the ratsnest segments a -> b of a chunk of C candidates (C x E x 2 each), giving
+        C x E x E (upper triangle, different nets only).
+        """
+        a_i, b_i = a[:, :, None, :], b[:, :, None, :]
+        a_j, b_j = a[:, None, :, :], b[:, None, :, :]
+
+        o1 = self._orientation(a_i, b_i, a_j)
+        o2 = self._orientation(a_i, b_i, b_j)
+        o3 = self._orientation(a_j, b_j, a_i)
+        o4 = self._orientation(a_j, b_j, b_i)
+
+        intersect = (o1 != o2) & (o3 != o4)
+        intersect |= (o1 == 0) & self._on_segment(a_i, b_i, a_j)
+        intersect |= (o2 == 0) & self._on_segment(a_i, b_i, b_j)
+        intersect |= (o3 == 0) & self._on_segment(a_j, b_j, a_i)
+        intersect |= (o4 == 0) & self._on_segment(a_j, b_j, b_i)
+        return intersect & self.edge_pair_mask
+
+    def _crossing_counts(self, pad_pos, partner_pos, max_elements: int = 1 << 20):
+        """
+        Number of crossing ratsnest segment pairs of every candidate (K). Candidates are processed in chunks of at most
+        max_elements segment pairs and reduced right away, so memory does not grow with K x E x E.
+        """
+        count, edge_count = pad_pos.shape[0], pad_pos.shape[1]
+        counts = np.zeros(count, dtype=int)
+        if edge_count < 2:
+            return counts
+
+        chunk_size = max(1, max_elements // (edge_count * edge_count))
+        for start in range(0, count, chunk_size):
+            a = pad_pos[start:start + chunk_size]
+            b = np.broadcast_to(partner_pos, a.shape)
+            counts[start:start + chunk_size] = self._intersect(a, b).sum(axis=(1, 2))
+        return counts
+
+    def _confirm_overlaps(self, overlaps, outline, xs, ys, angles, clearance: int):
+        """
+        Narrow phase of the overlap test: keep the box hits whose true courtyard outlines are closer than the clearance,
+        counting half the courtyard line width on both sides like courtyards_too_close. Hits between rectangles are
+        decided on all candidates at once, the others one outline pair at a time.
+        """
+        hits_k, hits_j = np.nonzero(overlaps)
+        if not len(hits_k):
+            return overlaps
+
+        margins = self.outline_margin + self.neighbor_margins[hits_j]
+        neighbor_rects = self.neighbor_rects[hits_j]
+        rect_hits = self.outline_is_rect & (np.mod(angles[hits_k], 90) == 0) & ~np.isnan(neighbor_rects[:, 0])
+        low, high = outline.min(axis=1)[hits_k], outline.max(axis=1)[hits_k]
+        dx = np.maximum(np.maximum(low[:, 0] - neighbor_rects[:, 2], neighbor_rects[:, 0] - high[:, 0]), 0)
+        dy = np.maximum(np.maximum(low[:, 1] - neighbor_rects[:, 3], neighbor_rects[:, 1] - high[:, 1]), 0)
+        too_close = np.hypot(dx, dy) - margins < clearance
+
+        segments = {}
+        for h in np.flatnonzero(~rect_hits):
+            k, j = hits_k[h], hits_j[h]
+            if k not in segments:
+                segments[k] = outline_segments(self.outline_polylines, (xs[k], ys[k]), angles[k])
+            too_close[h] = outline_distance(segments[k], self.neighbor_outlines[j][0]) - margins[h] < clearance
+
+        confirmed = np.zeros_like(overlaps)
+        confirmed[hits_k, hits_j] = too_close
+        return confirmed
+
+    @traced("placement_evaluate")
+    def evaluate(self, xs, ys, angles, min_clearance: float = 0.2) -> dict:
+        """
+        Evaluate K candidate placements given as arrays of positions in internal units and angles in degrees.
+
+        Returns:
+            dict: NumPy arrays 'boxes' (K x 4 courtyard boxes), 'overlaps' (K x N, courtyards closer than min_clearance to neighbor_refs),
+            'on_board' (K, always True if the board edge is not defined), 'pad2pad' and 'module2module'
+            (K x E distances in mm), 'misaligned' (K x E), 'crossing_count' (K), 'ratsnest_length' (K, mm) and 'pad_pos'
+            (K x E x 2 pad positions in mm, used by get_intersections to list the crossings of one candidate).
+        """
+        xs = np.atleast_1d(np.asarray(xs, dtype=float))
+        ys = np.atleast_1d(np.asarray(ys, dtype=float))
+        angles = np.atleast_1d(np.asarray(angles, dtype=float))
+        xs, ys, angles = np.broadcast_arrays(xs, ys, angles)
+        mm_per_iu = pcbnew.ToMM(1)
+
+        if len(self.outline_points):
+            outline = self._rotate(self.outline_points, xs, ys, angles)
+            boxes = np.concatenate((np.round(outline.min(axis=1)) - self.outline_margin,
+                                    np.round(outline.max(axis=1)) + self.outline_margin), axis=1)
+            expanded = boxes + np.array([-1, -1, 1, 1]) * pcbnew.FromMM(min_clearance)
+            neighbors = self.neighbor_boxes[None, :, :]
+            overlaps = ((expanded[:, None, 0] <= neighbors[..., 2]) & (neighbors[..., 0] <= expanded[:, None, 2]) &
+                        (expanded[:, None, 1] <= neighbors[..., 3]) & (neighbors[..., 1] <= expanded[:, None, 3]))
+            overlaps = self._confirm_overlaps(overlaps, outline, xs, ys, angles, pcbnew.FromMM(min_clearance))
+        else:
+            boxes = np.full((len(xs), 4), np.nan)
+            overlaps = np.zeros((len(xs), len(self.neighbor_refs)), dtype=bool)
+
+        if self.board_box is not None and len(self.outline_points):
+            on_board = ((boxes[:, 0] >= self.board_box[0]) & (boxes[:, 1] >= self.board_box[1]) &
+                        (boxes[:, 2] <= self.board_box[2]) & (boxes[:, 3] <= self.board_box[3]))
+        else:
+            on_board = np.ones(len(xs), dtype=bool)
+
+        pad_pos = self._rotate(self.edge_pad_local, xs, ys, angles)
+        pad_pos_mm = pad_pos * mm_per_iu
+        module_pos = np.stack((xs, ys), axis=-1)[:, None, :]
+        pad2pad = np.hypot(*np.moveaxis(pad_pos - self.edge_partner_pos[None], -1, 0)) * mm_per_iu
+        module2module = np.hypot(*np.moveaxis(module_pos - self.edge_partner_module_pos[None], -1, 0)) * mm_per_iu
+
+        return {
+            'boxes': boxes,
+            'overlaps': overlaps,
+            'on_board': on_board,
+            'pad2pad': pad2pad,
+            'module2module': module2module,
+            'misaligned': pad2pad > module2module,
+            'crossing_count': self._crossing_counts(pad_pos_mm, self.edge_partner_pos * mm_per_iu),
+            'ratsnest_length': pad2pad.sum(axis=1),
+            'pad_pos': pad_pos_mm,
+        }
+
+    def get_overlapped_refs(self, result: dict, k: int) -> list[str]:
+        return [self.neighbor_refs[j] for j in np.flatnonzero(result['overlaps'][k])]
+
+    def get_alignment(self, result: dict, k: int) -> list[tuple]:
+        return [self.edges[e] for e in np.flatnonzero(result['misaligned'][k])]
+
+    def get_intersections(self, result: dict, k: int) -> list[tuple]:
+        if len(self.edges) < 2:
+            return []
+        pad_pos = result['pad_pos'][k:k + 1]
+        partner_pos = np.broadcast_to(self.edge_partner_pos * pcbnew.ToMM(1), pad_pos.shape)
+        crossings = self._intersect(pad_pos, partner_pos)[0]
+        return [(int(i), int(j), self.edges[i][4], self.edges[j][4]) for i, j in zip(*np.nonzero(crossings))]
+
+    def get_distance_info(self, result: dict, k: int) -> str:
+        module_connections = {}
+        for e, (pad_num, module_ref, pad_i_num, module_i_ref, net_name) in enumerate(self.edges):
+            if module_i_ref not in module_connections:
+                module_connections[module_i_ref] = {
+                    'distance': result['module2module'][k, e],
+                    'connections': []
+                }
+            module_connections[module_i_ref]['connections'].append(
+                f"the pad-to-pad distance between pad {pad_num} of {module_ref} and pad {pad_i_num} of {module_i_ref} in net {net_name} is {result['pad2pad'][k, e]:.2f} mm"
+            )
+
+        distance_info = ""
+        for idx, (module_ref, data) in enumerate(module_connections.items(), start=1):
+            distance_info += f"Connection {idx}: {self.module_ref} is connected to {module_ref}, "
+            distance_info += f"the module-to-module distance is {data['distance']:.2f} mm, "
+            distance_info += f"{', '.join(data['connections'])}" + ". "
+        return distance_info
+
+
+def score_placements(result: dict) -> np.ndarray:
+    """
+    Score evaluated candidates, lower is better. Overlaps and leaving the board dominate, then ratsnest crossings,
+    then pad-to-pad misalignments, and the total ratsnest length in mm breaks ties.
+    """
+    overlap_count = result['overlaps'].sum(axis=1)
+    off_board = ~result['on_board']
+    crossing_count = result['crossing_count']
+    misaligned_count = result['misaligned'].sum(axis=1)
+    return 1000.0 * (overlap_count + off_board) + 10.0 * crossing_count + misaligned_count + result['ratsnest_length']
+
+
+def best_placements(evaluator: PlacementEvaluator, xs, ys, angles, center: tuple, top_k: int, min_clearance: float = 0.2,
+                    chunk_size: int = 4096) -> np.ndarray:
+    """
+    Evaluate candidates in chunks of chunk_size and keep the top_k after each chunk, so memory is bounded by the chunk
+    and not by the number of candidates. Ties go to the candidates closer to center, then to the earlier ones.
+
+    Returns:
+        np.ndarray: Indices of the best candidates, best first.
+    """
+    best = np.empty(0, dtype=int)
+    best_scores = np.empty(0)
+    for start in range(0, len(xs), max(1, chunk_size)):
+        index = np.arange(start, min(start + chunk_size, len(xs)))
+        scores = score_placements(evaluator.evaluate(xs[index], ys[index], angles[index], min_clearance))
+        index = np.concatenate((best, index))
+        scores = np.concatenate((best_scores, scores))
+        displacement = np.hypot(xs[index] - center[0], ys[index] - center[1])
+        order = np.lexsort((index, displacement, scores))[:top_k]
+        best, best_scores = index[order], scores[order]
+    return best
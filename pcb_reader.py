@@ -0,0 +1,865 @@
+import re
+import math
+
+from functools import cached_property
+from pcb_spatial import *
+from pcb_lazy import lazy_import
+
+
+# Items hand out pcbnew vectors and boxes when KiCad is installed, so they mix with the rest of the tools, and the
+# pure Python equivalents below otherwise
+_kicad = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+# Top-level items kept by the reader, everything else is skipped without being parsed
+READ_ITEMS = {'footprint', 'module', 'net', 'segment', 'arc', 'via', 'zone',
+              'gr_line', 'gr_rect', 'gr_poly', 'gr_circle', 'gr_arc', 'gr_text'}
+
+_SCAN_RE = re.compile(r'[()]|"(?:[^"\\]|\\.)*"')
+_HEAD_RE = re.compile(r'\(\s*([^\s()"]+)')
+_TOKEN_RE = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_UNESCAPE_RE = re.compile(r'\\(.)')
+
+
+class VECTOR2I:
+    def __init__(self, x: int = 0, y: int = 0):
+        self.x = x
+        self.y = y
+
+    def __repr__(self) -> str:
+        return f"VECTOR2I({self.x}, {self.y})"
+
+
+class BOX2I:
+    """
+    Axis-aligned box in internal units with the subset of the pcbnew BOX2I interface used by the tools.
+    """
+
+    def __init__(self, origin: VECTOR2I = None, size: VECTOR2I = None):
+        self.x, self.y = (origin.x, origin.y) if origin is not None else (0, 0)
+        self.w, self.h = (size.x, size.y) if size is not None else (0, 0)
+
+    def SetOrigin(self, x: int, y: int) -> None:
+        self.x, self.y = x, y
+
+    def SetSize(self, w: int, h: int) -> None:
+        self.w, self.h = w, h
+
+    def GetX(self) -> int:
+        return self.x
+
+    def GetY(self) -> int:
+        return self.y
+
+    GetLeft = GetX
+    GetTop = GetY
+
+    def GetRight(self) -> int:
+        return self.x + self.w
+
+    def GetBottom(self) -> int:
+        return self.y + self.h
+
+    def GetWidth(self) -> int:
+        return self.w
+
+    def GetHeight(self) -> int:
+        return self.h
+
+    def GetOrigin(self) -> VECTOR2I:
+        return VECTOR2I(self.x, self.y)
+
+    GetPosition = GetOrigin
+
+    def GetSize(self) -> VECTOR2I:
+        return VECTOR2I(self.w, self.h)
+
+    def GetCenter(self) -> VECTOR2I:
+        return VECTOR2I(self.x + self.w // 2, self.y + self.h // 2)
+
+    def Merge(self, other: "BOX2I") -> "BOX2I":
+        right, bottom = max(self.GetRight(), other.GetRight()), max(self.GetBottom(), other.GetBottom())
+        self.x, self.y = min(self.x, other.x), min(self.y, other.y)
+        self.w, self.h = right - self.x, bottom - self.y
+        return self
+
+    def Inflate(self, dx: int, dy: int = None) -> "BOX2I":
+        dy = dx if dy is None else dy
+        self.x, self.y, self.w, self.h = self.x - dx, self.y - dy, self.w + 2 * dx, self.h + 2 * dy
+        return self
+
+    def Contains(self, other) -> bool:
+        if isinstance(other, BOX2I):
+            return self.Contains(other.GetOrigin()) and self.Contains(VECTOR2I(other.GetRight(), other.GetBottom()))
+        return self.x <= other.x <= self.GetRight() and self.y <= other.y <= self.GetBottom()
+
+    def Intersects(self, other: "BOX2I") -> bool:
+        return boxes_intersect((self.x, self.y, self.GetRight(), self.GetBottom()),
+                               (other.x, other.y, other.GetRight(), other.GetBottom()))
+
+    def __repr__(self) -> str:
+        return f"BOX2I({self.x}, {self.y}, {self.GetRight()}, {self.GetBottom()})"
+
+
+def ToMM(value):
+    if hasattr(value, 'x'):
+        return (value.x / 1e6, value.y / 1e6)
+    return value / 1e6
+
+
+def FromMM(value: float) -> int:
+    return int(round(value * 1e6))
+
+
+SHAPE_T_SEGMENT, SHAPE_T_RECT, SHAPE_T_ARC, SHAPE_T_CIRCLE, SHAPE_T_POLY = range(5)
+
+
+# Layer numbering of the KiCad 8 file format, used as layer ids when pcbnew is not installed
+LAYER_NAMES = (['F.Cu'] + [f'In{i}.Cu' for i in range(1, 31)] +
+               ['B.Cu', 'B.Adhes', 'F.Adhes', 'B.Paste', 'F.Paste', 'B.SilkS', 'F.SilkS', 'B.Mask', 'F.Mask',
+                'Dwgs.User', 'Cmts.User', 'Eco1.User', 'Eco2.User', 'Edge.Cuts', 'Margin', 'B.CrtYd', 'F.CrtYd',
+                'B.Fab', 'F.Fab'] + [f'User.{i}' for i in range(1, 10)])
+
+COPPER_STACK = ['F.Cu'] + [f'In{i}.Cu' for i in range(1, 31)] + ['B.Cu']
+
+_layer_ids = {}
+_layer_names = {}
+
+
+for _index, _name in enumerate(LAYER_NAMES):
+    globals()[_name.replace('.', '_')] = _index
+
+
+def layer_id(name: str) -> int:
+    layer = _layer_ids.get(name)
+    if layer is None:
+        layer = getattr(_kicad, name.replace('.', '_'), None)
+        if layer is None:
+            # Layers unknown to this KiCad version get ids above every real layer
+            layer = 1000 + len(_layer_ids)
+        _layer_ids[name] = layer
+        _layer_names.setdefault(layer, name)
+    return layer
+
+
+def layer_name(layer: int) -> str:
+    name = _layer_names.get(layer)
+    if name is None:
+        for candidate in LAYER_NAMES:
+            if layer_id(candidate) == layer:
+                return candidate
+    return name
+
+
+def parse_sexpr(text: str, start: int = 0, end: int = None) -> list:
+    """
+    Parse one S-expression of text[start:end] into nested lists of strings, quoted strings are unescaped.
+    """
+    stack = [[]]
+    for match in _TOKEN_RE.finditer(text, start, len(text) if end is None else end):
+        token = match.group()
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            node = stack.pop()
+            stack[-1].append(node)
+            if len(stack) == 1:
+                break
+        elif token[0] == '"':
+            stack[-1].append(_UNESCAPE_RE.sub(r'\1', token[1:-1]))
+        else:
+            stack[-1].append(token)
+    return stack[0][0] if stack[0] else []
+
+
+def scan_items(text: str, heads: set = READ_ITEMS) -> list[tuple]:
+    """
+    Find the (head, start, end) spans of the top-level items of a board file, only matching parentheses and strings so
+    skipped items cost a single regex scan.
+    """
+    spans = []
+    depth = 0
+    start = None
+    for match in _SCAN_RE.finditer(text):
+        token = match.group()
+        if token == '(':
+            depth += 1
+            if depth == 2:
+                start = match.start()
+        elif token == ')':
+            if depth == 2 and start is not None:
+                head = _HEAD_RE.match(text, start)
+                if head and head.group(1) in heads:
+                    spans.append((head.group(1), start, match.end()))
+                start = None
+            depth -= 1
+    return spans
+
+
+def find(node: list, head: str):
+    for child in node:
+        if isinstance(child, list) and child and child[0] == head:
+            return child
+    return None
+
+
+def find_all(node: list, head: str) -> list:
+    return [child for child in node if isinstance(child, list) and child and child[0] == head]
+
+
+def to_iu(value: str) -> int:
+    return FromMM(float(value))
+
+
+def get_xy(node: list, head: str):
+    child = find(node, head)
+    return (to_iu(child[1]), to_iu(child[2])) if child else None
+
+
+def vector(x: float, y: float):
+    return _kicad.VECTOR2I(int(round(x)), int(round(y)))
+
+
+def make_box(x0: float, y0: float, x1: float, y1: float):
+    bbox = _kicad.BOX2I()
+    bbox.SetOrigin(int(round(x0)), int(round(y0)))
+    bbox.SetSize(int(round(x1 - x0)), int(round(y1 - y0)))
+    return bbox
+
+
+def points_bbox(points, margin: int = 0):
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return make_box(min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+
+
+def point_in_polygon(x: float, y: float, polygon) -> bool:
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class Uuid:
+    def __init__(self, value: str):
+        self.value = value
+
+    def AsString(self) -> str:
+        return self.value
+
+
+class LibId:
+    def __init__(self, lib_id: str):
+        self.lib_id = lib_id
+
+    def GetLibItemName(self) -> str:
+        return self.lib_id.split(':', 1)[-1]
+
+    def GetLibNickname(self) -> str:
+        return self.lib_id.split(':', 1)[0] if ':' in self.lib_id else ""
+
+
+class LayerSet:
+    def __init__(self, layers: list[int]):
+        self.layers = layers
+
+    def Seq(self) -> list[int]:
+        return self.layers
+
+
+class PolyOutline:
+    def __init__(self, points: list[tuple]):
+        self.points = points
+
+    def PointCount(self) -> int:
+        return len(self.points)
+
+    def CPoint(self, i: int) -> VECTOR2I:
+        return vector(*self.points[i])
+
+
+class PolyShape:
+    def __init__(self, points: list[tuple]):
+        self.outline = PolyOutline(points)
+
+    def Outline(self, i: int) -> PolyOutline:
+        return self.outline
+
+
+class NetInfo:
+    def __init__(self, net_code: int, net_name: str):
+        self.net_code = net_code
+        self.net_name = net_name
+
+    def GetNetCode(self) -> int:
+        return self.net_code
+
+    def GetNetname(self) -> str:
+        return self.net_name
+
+
+class BoardItem:
+    """
+    Base of the lightweight board items. The S-expression of an item is only parsed when one of its fields is first read.
+    """
+
+    class_name = "BOARD_ITEM"
+
+    def __init__(self, board: "BOARD", span: tuple = None, node: list = None):
+        self.board = board
+        self._span = span
+        if node is not None:
+            self.node = node
+
+    @cached_property
+    def node(self) -> list:
+        return parse_sexpr(self.board.text, *self._span)
+
+    def GetClass(self) -> str:
+        return self.class_name
+
+    def GetBoard(self) -> "BOARD":
+        return self.board
+
+    @cached_property
+    def m_Uuid(self) -> Uuid:
+        uuid = find(self.node, 'uuid') or find(self.node, 'tstamp')
+        return Uuid(uuid[1] if uuid else f"{self.node[0]}@{self._span[0] if self._span else id(self)}")
+
+    @cached_property
+    def layer_names(self) -> list[str]:
+        layers = find(self.node, 'layers')
+        if layers:
+            return layers[1:]
+        layer = find(self.node, 'layer')
+        return [layer[1]] if layer else []
+
+    def GetLayer(self) -> int:
+        return layer_id(self.layer_names[0]) if self.layer_names else -1
+
+    def GetLayerName(self) -> str:
+        return self.layer_names[0] if self.layer_names else ""
+
+    def IsOnLayer(self, layer: int) -> bool:
+        name = layer_name(layer)
+        for pattern in self.layer_names:
+            if pattern == name:
+                return True
+            if pattern.startswith('*.') and name is not None and name.endswith(pattern[1:]):
+                return True
+            if pattern.startswith('F&B.') and name in ('F.' + pattern[4:], 'B.' + pattern[4:]):
+                return True
+        return False
+
+    @cached_property
+    def net(self) -> NetInfo:
+        return self.board.get_net(find(self.node, 'net'))
+
+    def GetNetCode(self) -> int:
+        return self.net.net_code
+
+    def GetNetname(self) -> str:
+        return self.net.net_name
+
+
+class PCB_SHAPE(BoardItem):
+    """
+    Graphic line, rectangle, polygon, circle or arc of the board or of a footprint, in board coordinates.
+    """
+
+    class_name = "PCB_SHAPE"
+
+    SHAPES = {'line': 'SHAPE_T_SEGMENT', 'rect': 'SHAPE_T_RECT', 'poly': 'SHAPE_T_POLY', 'circle': 'SHAPE_T_CIRCLE', 'arc': 'SHAPE_T_ARC'}
+    SHAPE_NAMES = {'line': "Line", 'rect': "Rect", 'poly': "Poly", 'circle': "Circle", 'arc': "Arc"}
+
+    def __init__(self, board: "BOARD", span: tuple = None, node: list = None, footprint: "FOOTPRINT" = None):
+        super().__init__(board, span, node)
+        self.footprint = footprint
+
+    def _to_board(self, points: list[tuple]) -> list[tuple]:
+        if self.footprint is None:
+            return points
+        return [(round(x), round(y)) for x, y in local_to_board(points, self.footprint.position, self.footprint.orientation)]
+
+    @cached_property
+    def kind(self) -> str:
+        return self.node[0].split('_', 1)[1]
+
+    @cached_property
+    def geometry(self) -> dict:
+        node = self.node
+        if self.kind == 'poly':
+            pts = find(node, 'pts')
+            return {'points': self._to_board([(to_iu(xy[1]), to_iu(xy[2])) for xy in find_all(pts, 'xy')] if pts else [])}
+        if self.kind == 'rect':
+            (x0, y0), (x1, y1) = get_xy(node, 'start'), get_xy(node, 'end')
+            return {'points': self._to_board([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])}
+        if self.kind == 'circle':
+            center, end = self._to_board([get_xy(node, 'center'), get_xy(node, 'end')])
+            return {'center': center, 'end': end, 'start': end}
+        if self.kind == 'arc' and find(node, 'mid') is None:
+            # Files before KiCad 6 store the arc center as start, one end point and the sweep angle
+            center, start = get_xy(node, 'start'), get_xy(node, 'end')
+            angle = float(find(node, 'angle')[1]) if find(node, 'angle') else 0.0
+            mid = local_to_board([(start[0] - center[0], start[1] - center[1])], center, -angle / 2)[0]
+            end = local_to_board([(start[0] - center[0], start[1] - center[1])], center, -angle)[0]
+            return {'start': self._to_board([start])[0], 'mid': self._to_board([mid])[0], 'end': self._to_board([end])[0]}
+        if self.kind == 'arc':
+            start, mid, end = self._to_board([get_xy(node, 'start'), get_xy(node, 'mid'), get_xy(node, 'end')])
+            return {'start': start, 'mid': mid, 'end': end}
+        start, end = self._to_board([get_xy(node, 'start'), get_xy(node, 'end')])
+        return {'start': start, 'end': end}
+
+    def GetShape(self) -> int:
+        return getattr(_kicad, self.SHAPES[self.kind]) if self.kind in self.SHAPES else -1
+
+    def GetShapeStr(self) -> str:
+        return self.SHAPE_NAMES.get(self.kind, self.kind)
+
+    def GetWidth(self) -> int:
+        stroke = find(self.node, 'stroke')
+        width = find(stroke, 'width') if stroke else find(self.node, 'width')
+        return to_iu(width[1]) if width else 0
+
+    def GetStart(self) -> VECTOR2I:
+        geometry = self.geometry
+        return vector(*geometry['start']) if 'start' in geometry else vector(*geometry['points'][0])
+
+    def GetEnd(self) -> VECTOR2I:
+        geometry = self.geometry
+        return vector(*geometry['end']) if 'end' in geometry else vector(*geometry['points'][2 % len(geometry['points'])])
+
+    def GetArcMid(self) -> VECTOR2I:
+        return vector(*self.geometry['mid'])
+
+    @cached_property
+    def arc_center(self) -> tuple:
+        geometry = self.geometry
+        if self.kind == 'circle':
+            return geometry['center']
+        (ax, ay), (bx, by), (cx, cy) = geometry['start'], geometry['mid'], geometry['end']
+        d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+        if d == 0:
+            return ((ax + cx) / 2, (ay + cy) / 2)
+        ux = ((ax * ax + ay * ay) * (by - cy) + (bx * bx + by * by) * (cy - ay) + (cx * cx + cy * cy) * (ay - by)) / d
+        uy = ((ax * ax + ay * ay) * (cx - bx) + (bx * bx + by * by) * (ax - cx) + (cx * cx + cy * cy) * (bx - ax)) / d
+        return (ux, uy)
+
+    def GetCenter(self) -> VECTOR2I:
+        if self.kind in ('circle', 'arc'):
+            return vector(*self.arc_center)
+        bbox = self.GetBoundingBox()
+        return bbox.GetCenter()
+
+    def GetRadius(self) -> int:
+        cx, cy = self.arc_center
+        sx, sy = self.geometry['start']
+        return int(round(math.hypot(sx - cx, sy - cy)))
+
+    def GetPosition(self) -> VECTOR2I:
+        return self.GetCenter() if self.kind == 'circle' else self.GetStart()
+
+    def GetRectCorners(self) -> list[VECTOR2I]:
+        return [vector(*point) for point in self.geometry['points']]
+
+    def GetPolyShape(self) -> PolyShape:
+        return PolyShape(self.geometry['points'])
+
+    def _outline_points(self) -> list[tuple]:
+        geometry = self.geometry
+        if 'points' in geometry:
+            return geometry['points']
+        if self.kind == 'circle':
+            (cx, cy), radius = self.arc_center, self.GetRadius()
+            return [(cx - radius, cy - radius), (cx + radius, cy + radius)]
+        if self.kind == 'arc':
+            (cx, cy), radius = self.arc_center, self.GetRadius()
+            points = [geometry['start'], geometry['end']]
+            start_angle = math.atan2(geometry['start'][1] - cy, geometry['start'][0] - cx)
+            mid_sweep = (math.atan2(geometry['mid'][1] - cy, geometry['mid'][0] - cx) - start_angle) % (2 * math.pi)
+            sweep = (math.atan2(geometry['end'][1] - cy, geometry['end'][0] - cx) - start_angle) % (2 * math.pi)
+            if mid_sweep > sweep:
+                sweep -= 2 * math.pi
+            # Extreme points of the circle lying on the arc
+            for quarter in range(4):
+                angle = quarter * math.pi / 2
+                offset = ((angle - start_angle) % (2 * math.pi)) if sweep >= 0 else ((start_angle - angle) % (2 * math.pi))
+                if offset <= abs(sweep):
+                    points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+            return points
+        return [geometry['start'], geometry['end']]
+
+    def GetBoundingBox(self, *args):
+        return points_bbox(self._outline_points(), self.GetWidth() // 2)
+
+
+class PCB_TEXT(BoardItem):
+    """
+    Board text, its bounding box is estimated from the font size since the reader has no font metrics.
+    """
+
+    class_name = "PCB_TEXT"
+
+    def GetText(self) -> str:
+        return self.node[1]
+
+    def GetPosition(self) -> VECTOR2I:
+        return vector(*get_xy(self.node, 'at'))
+
+    def GetBoundingBox(self, *args):
+        font_size = None
+        effects = find(self.node, 'effects')
+        font = find(effects, 'font') if effects else None
+        if font and find(font, 'size'):
+            font_size = find(font, 'size')
+        height = to_iu(font_size[1]) if font_size else FromMM(1.0)
+        width = to_iu(font_size[2]) if font_size else FromMM(1.0)
+        pos = self.GetPosition()
+        half_w = width * max(len(self.GetText()), 1) // 2
+        return make_box(pos.x - half_w, pos.y - height // 2, pos.x + half_w, pos.y + height // 2)
+
+
+class PAD(BoardItem):
+    class_name = "PAD"
+
+    def __init__(self, board: "BOARD", node: list, footprint: "FOOTPRINT"):
+        super().__init__(board, node=node)
+        self.footprint = footprint
+
+    def GetNumber(self) -> str:
+        return self.node[1]
+
+    def GetParent(self) -> "FOOTPRINT":
+        return self.footprint
+
+    def GetShapeName(self) -> str:
+        return self.node[3] if len(self.node) > 3 else ""
+
+    @cached_property
+    def placement(self) -> tuple:
+        at = find(self.node, 'at')
+        local = (to_iu(at[1]), to_iu(at[2]))
+        # Pad angles in the file are absolute, they already include the footprint orientation and are left out when 0
+        angle = float(at[3]) if len(at) > 3 else 0.0
+        x, y = local_to_board([local], self.footprint.position, self.footprint.orientation)[0]
+        return (round(x), round(y), angle)
+
+    @cached_property
+    def size(self) -> tuple:
+        size = find(self.node, 'size')
+        return (to_iu(size[1]), to_iu(size[2])) if size else (0, 0)
+
+    def GetPosition(self) -> VECTOR2I:
+        x, y, _ = self.placement
+        return vector(x, y)
+
+    def GetOrientationDegrees(self) -> float:
+        return self.placement[2]
+
+    def GetSize(self) -> VECTOR2I:
+        return vector(*self.size)
+
+    def _corners(self) -> list[tuple]:
+        x, y, angle = self.placement
+        w, h = self.size
+        return local_to_board([(-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)], (x, y), angle)
+
+    def GetBoundingBox(self, *args):
+        return points_bbox(self._corners())
+
+    def HitTest(self, point, accuracy: int = 0) -> bool:
+        x, y, angle = self.placement
+        w, h = self.size
+        (local_x, local_y), = board_to_local([(point.x, point.y)], (x, y), angle)
+        if self.GetShapeName() == 'circle':
+            return math.hypot(local_x, local_y) <= w / 2 + accuracy
+        return abs(local_x) <= w / 2 + accuracy and abs(local_y) <= h / 2 + accuracy
+
+
+class FOOTPRINT(BoardItem):
+    class_name = "FOOTPRINT"
+
+    @cached_property
+    def placement(self) -> tuple:
+        at = find(self.node, 'at')
+        angle = float(at[3]) if len(at) > 3 else 0.0
+        return (to_iu(at[1]), to_iu(at[2])), angle
+
+    @property
+    def position(self) -> tuple:
+        return self.placement[0]
+
+    @property
+    def orientation(self) -> float:
+        return self.placement[1]
+
+    @cached_property
+    def fields(self) -> dict:
+        fields = {}
+        for child in self.node:
+            if isinstance(child, list) and len(child) > 2:
+                if child[0] == 'property':
+                    fields[child[1].lower()] = child[2]
+                elif child[0] == 'fp_text' and child[1] in ('reference', 'value'):
+                    fields.setdefault(child[1], child[2])
+        return fields
+
+    def GetReference(self) -> str:
+        return self.fields.get('reference', "")
+
+    def GetValue(self) -> str:
+        return self.fields.get('value', "")
+
+    def GetFPID(self) -> LibId:
+        return LibId(self.node[1])
+
+    def GetPosition(self) -> VECTOR2I:
+        return vector(*self.position)
+
+    def GetOrientationDegrees(self) -> float:
+        return self.orientation
+
+    def IsLocked(self) -> bool:
+        locked = find(self.node, 'locked')
+        return 'locked' in self.node[1:] or (locked is not None and locked[1:2] != ['no'])
+
+    def GetLayer(self) -> int:
+        return layer_id(self.layer_names[0]) if self.layer_names else layer_id('F.Cu')
+
+    @cached_property
+    def pads(self) -> list[PAD]:
+        return [PAD(self.board, child, self) for child in find_all(self.node, 'pad')]
+
+    def Pads(self) -> list[PAD]:
+        return self.pads
+
+    @cached_property
+    def graphics(self) -> list[PCB_SHAPE]:
+        return [PCB_SHAPE(self.board, node=child, footprint=self) for child in self.node
+                if isinstance(child, list) and child and child[0] in ('fp_line', 'fp_rect', 'fp_poly', 'fp_circle', 'fp_arc')]
+
+    def GraphicalItems(self) -> list[PCB_SHAPE]:
+        return self.graphics
+
+    def GetBoundingBox(self, *args):
+        boxes = [item.GetBoundingBox() for item in self.pads + self.graphics]
+        if not boxes:
+            x, y = self.position
+            return make_box(x, y, x, y)
+        bbox = boxes[0]
+        for box in boxes[1:]:
+            bbox.Merge(box)
+        return bbox
+
+
+class PCB_TRACK(BoardItem):
+    class_name = "PCB_TRACK"
+
+    def GetStart(self) -> VECTOR2I:
+        return vector(*get_xy(self.node, 'start'))
+
+    def GetEnd(self) -> VECTOR2I:
+        return vector(*get_xy(self.node, 'end'))
+
+    def GetPosition(self) -> VECTOR2I:
+        return self.GetStart()
+
+    def GetWidth(self, *args) -> int:
+        width = find(self.node, 'width')
+        return to_iu(width[1]) if width else 0
+
+    def GetBoundingBox(self, *args):
+        start, end = self.GetStart(), self.GetEnd()
+        return points_bbox([(start.x, start.y), (end.x, end.y)], self.GetWidth() // 2)
+
+
+class PCB_ARC(PCB_TRACK):
+    class_name = "PCB_ARC"
+
+    def GetMid(self) -> VECTOR2I:
+        return vector(*get_xy(self.node, 'mid'))
+
+
+class PCB_VIA(PCB_TRACK):
+    class_name = "PCB_VIA"
+
+    def GetPosition(self) -> VECTOR2I:
+        return vector(*get_xy(self.node, 'at'))
+
+    GetStart = GetPosition
+    GetEnd = GetPosition
+
+    def GetWidth(self, *args) -> int:
+        size = find(self.node, 'size')
+        return to_iu(size[1]) if size else 0
+
+    def GetDrillValue(self) -> int:
+        drill = find(self.node, 'drill')
+        return to_iu(drill[1]) if drill else 0
+
+    def IsOnLayer(self, layer: int) -> bool:
+        # Vias connect every copper layer between their two end layers, listed from F.Cu down to B.Cu
+        stack = COPPER_STACK
+        ends = [stack.index(name) for name in self.layer_names if name in stack]
+        if len(ends) < 2:
+            return super().IsOnLayer(layer)
+        return layer_name(layer) in stack[min(ends):max(ends) + 1]
+
+
+class ZONE(BoardItem):
+    class_name = "ZONE"
+
+    @cached_property
+    def filled_polygons(self) -> dict:
+        polygons = {}
+        default_layer = self.layer_names[0] if self.layer_names else ""
+        for filled in find_all(self.node, 'filled_polygon'):
+            layer = find(filled, 'layer')
+            pts = find(filled, 'pts')
+            points = [(to_iu(xy[1]), to_iu(xy[2])) for xy in find_all(pts, 'xy')] if pts else []
+            polygons.setdefault(layer_id(layer[1] if layer else default_layer), []).append(points)
+        return polygons
+
+    @cached_property
+    def outline_points(self) -> list[tuple]:
+        polygon = find(self.node, 'polygon')
+        pts = find(polygon, 'pts') if polygon else None
+        return [(to_iu(xy[1]), to_iu(xy[2])) for xy in find_all(pts, 'xy')] if pts else []
+
+    def Outline(self) -> PolyShape:
+        return PolyShape(self.outline_points)
+
+    def GetIsRuleArea(self) -> bool:
+        return find(self.node, 'keepout') is not None
+
+    def IsFilled(self) -> bool:
+        return bool(self.filled_polygons)
+
+    def GetLayerSet(self) -> LayerSet:
+        return LayerSet([layer_id(name) for name in self.layer_names])
+
+    def HitTestFilledArea(self, layer: int, point, accuracy: int = 0) -> bool:
+        return any(point_in_polygon(point.x, point.y, polygon) for polygon in self.filled_polygons.get(layer, []))
+
+    @cached_property
+    def net(self) -> NetInfo:
+        net = find(self.node, 'net')
+        if net is None or (len(net) == 2 and net[1] == '0' and find(self.node, 'net_name')):
+            net_name = find(self.node, 'net_name')
+            return self.board.get_net(['net', net_name[1]] if net_name else None)
+        return self.board.get_net(net)
+
+
+class BOARD:
+    """
+    Read-only board parsed from a .kicad_pcb file without pcbnew, exposing the subset of the pcbnew BOARD interface used
+    by the analysis and check tools. Items are located in one scan of the file and each item is parsed on first use.
+    """
+
+    SHAPE_HEADS = {'gr_line', 'gr_rect', 'gr_poly', 'gr_circle', 'gr_arc'}
+    TRACK_TYPES = {'segment': PCB_TRACK, 'arc': PCB_ARC, 'via': PCB_VIA}
+
+    def __init__(self, text: str, file_name: str = ""):
+        self.text = text
+        self.file_name = file_name
+        self.net_names = {0: ""}
+        self.net_codes = {"": 0}
+        self.footprints = []
+        self.tracks = []
+        self.drawings = []
+        self.zones = []
+
+        for head, start, end in scan_items(text):
+            span = (start, end)
+            if head in ('footprint', 'module'):
+                self.footprints.append(FOOTPRINT(self, span))
+            elif head in self.TRACK_TYPES:
+                self.tracks.append(self.TRACK_TYPES[head](self, span))
+            elif head in self.SHAPE_HEADS:
+                self.drawings.append(PCB_SHAPE(self, span))
+            elif head == 'gr_text':
+                self.drawings.append(PCB_TEXT(self, span))
+            elif head == 'zone':
+                self.zones.append(ZONE(self, span))
+            elif head == 'net':
+                node = parse_sexpr(text, start, end)
+                if len(node) > 2:
+                    self.net_names[int(node[1])] = node[2]
+                    self.net_codes[node[2]] = int(node[1])
+
+    def get_net(self, node) -> NetInfo:
+        """
+        Resolve a (net code name), (net code) or (net "name") node. Nets only known by name get new codes.
+        """
+        if node is None or len(node) < 2:
+            return NetInfo(0, "")
+        if len(node) > 2:
+            return NetInfo(int(node[1]), node[2])
+        value = node[1]
+        if value in self.net_codes:
+            return NetInfo(self.net_codes[value], value)
+        if value.lstrip('-').isdigit():
+            return NetInfo(int(value), self.net_names.get(int(value), ""))
+        net_code = max(self.net_names) + 1
+        self.net_names[net_code] = value
+        self.net_codes[value] = net_code
+        return NetInfo(net_code, value)
+
+    def GetFileName(self) -> str:
+        return self.file_name
+
+    def GetFootprints(self) -> list[FOOTPRINT]:
+        return self.footprints
+
+    def GetTracks(self) -> list[PCB_TRACK]:
+        return self.tracks
+
+    def GetDrawings(self) -> list[BoardItem]:
+        return self.drawings
+
+    def Zones(self) -> list[ZONE]:
+        return self.zones
+
+    def GetNetsByName(self) -> dict:
+        # Nets used by items but missing from the net list are registered while items are read
+        for module in self.footprints:
+            for pad in module.Pads():
+                pad.GetNetCode()
+        return {net_name: NetInfo(net_code, net_name) for net_code, net_name in self.net_names.items()}
+
+    def GetNetCount(self) -> int:
+        return len(self.GetNetsByName())
+
+    def FindFootprintByReference(self, module_ref: str):
+        for module in self.footprints:
+            if module.GetReference() == module_ref:
+                return module
+        return None
+
+    def ComputeBoundingBox(self, board_edges_only: bool = False):
+        items = [item for item in self.drawings if not board_edges_only or item.GetLayerName() == 'Edge.Cuts']
+        if not board_edges_only:
+            items += self.footprints + self.tracks
+        bbox = None
+        for item in items:
+            item_bbox = item.GetBoundingBox()
+            if bbox is None:
+                bbox = item_bbox
+            else:
+                bbox.Merge(item_bbox)
+        return bbox if bbox is not None else make_box(0, 0, 0, 0)
+
+
+def read_board(file_path: str) -> BOARD:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return BOARD(text, file_path)
+
+
+def LoadBoard(file_path: str) -> BOARD:
+    return read_board(file_path)
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+import uuid
+import shutil
+import asyncio
+
+from typing import Optional
+from collections import OrderedDict
+from pcb_session import *
+from pcb_executor import get_board_executor
+from pcb_utility import load_const_section
+from pcb_trace import span, tool_span
+from pcb_lazy import lazy_import
+from routing import *
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+# FreeRouting logs lines like "Auto-router pass #3 on board 'x' was completed in 1.20 seconds"
+PASS_RE = re.compile(r'pass #?(\d+)', re.IGNORECASE)
+
+
+async def prepare_routing(file_path: str, dsn_file: str, keep_connections: Optional[list] = None, max_passes: Optional[int] = None,
+                          use_cache: bool = True, nets: Optional[list[str]] = None) -> dict:
+    """
+    Board worker step of a routing job: look the board up in the routing cache, and export the DSN on a miss.
+
+    Returns:
+        dict: {'stamp', 'key', 'cached'}, the stamp of the board file the job starts from, its routing key and the
+        cached SES copied next to the DSN, or None on a miss.
+    """
+    if board_cache.in_transaction(file_path):
+        raise RuntimeError("Commit or roll back the open transaction before routing")
+    board = load_board(file_path)
+    if not board:
+        raise RuntimeError(f"Could not load board from {file_path}")
+    stamp = get_file_stamp(resolve_board_path(file_path))
+
+    cache = get_routing_cache() if use_cache else None
+    key = get_routing_key(board, keep_connections, max_passes, nets) if cache is not None else None
+    cached_file = cache.get(key) if cache is not None else None
+    if cached_file is not None:
+        # Copied so eviction by another job cannot take the file away before it is imported
+        ses_file = os.path.join(os.path.dirname(dsn_file), "cached.ses")
+        shutil.copyfile(cached_file, ses_file)
+        return {'stamp': stamp, 'key': key, 'cached': ses_file}
+
+    export_dsn(board, dsn_file, keep_connections, nets)
+    return {'stamp': stamp, 'key': key, 'cached': None}
+
+
+async def score_routing_ses(file_path: str, ses_file: str) -> dict:
+    """
+    Board worker step of a routing job: import one routing result into a private copy of the board file, so the
+    session board is left alone, and count its unrouted connections and vias.
+    """
+    board = pcbnew.LoadBoard(resolve_board_path(file_path))
+    with span("import_ses"):
+        pcbnew.ImportSpecctraSES(board, str(ses_file))
+    return count_routing_result(board)
+
+
+async def import_routing_ses(file_path: str, ses_file: str, stamp, key: Optional[str] = None, keep_connections: Optional[list] = None,
+                             max_passes: Optional[int] = None, nets: Optional[list[str]] = None) -> str:
+    """
+    Board worker step of a routing job: import the chosen routing result into the board, unless the board changed since
+    the job started, and store it in the routing cache.
+    """
+    cache = get_routing_cache() if key is not None else None
+    if cache is not None:
+        cache.put(key, ses_file)
+    if board_cache.in_transaction(file_path) or get_file_stamp(resolve_board_path(file_path)) != stamp:
+        return f"Error: The board changed while routing, the result is kept at {ses_file}"
+
+    board = load_board(file_path)
+    with span("import_ses"):
+        pcbnew.ImportSpecctraSES(board, str(ses_file))
+    save_board(file_path, board)
+    if cache is not None:
+        cache_routing_result(cache, board, ses_file, None, keep_connections, max_passes, nets)
+    return f"SUCCESS: Imported {ses_file}"
+
+
+class RoutingRun:
+    """
+    One router process of a routing job.
+    """
+
+    def __init__(self, seed: int, ses_file: str):
+        self.seed = seed
+        self.ses_file = ses_file
+        self.status = "queued"
+        self.started = None
+        self.seconds = None
+        self.passes = 0
+        self.last_line = ""
+        self.returncode = None
+        self.result = None
+        self.error = None
+
+
+class RoutingJob:
+    def __init__(self, job_id: str, file_path: str, work_dir: str, seeds: list[int], jar_path: str, command: Optional[list[str]],
+                 max_parallel: int, max_passes: Optional[int], timeout: float, keep_connections: Optional[list],
+                 nets: Optional[list[str]], use_cache: bool):
+        self.id = job_id
+        self.file_path = file_path
+        self.work_dir = work_dir
+        self.dsn_file = os.path.join(work_dir, "board.dsn")
+        self.runs = [RoutingRun(seed, os.path.join(work_dir, f"seed_{seed}.ses")) for seed in seeds]
+        self.jar_path = jar_path
+        self.command = command
+        self.max_parallel = max_parallel
+        self.max_passes = max_passes
+        self.timeout = timeout
+        self.keep_connections = keep_connections
+        self.nets = nets
+        self.use_cache = use_cache
+        self.status = "queued"
+        self.message = ""
+        self.stamp = None
+        self.key = None
+        self.best = None
+        self.created = time.monotonic()
+        self.finished = None
+        self.task = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+
+class RoutingJobManager:
+    """
+    Runs FreeRouting in the background of the server. A job exports the DSN once, routes it with several seeds in
+    parallel router processes with a timeout each, ranks the results by unrouted connections and then by vias, and imports
+    the best one into the board. Jobs can be polled for progress and cancelled until their result is being imported.
+
+    Args:
+        config (dict): ROUTING settings, see ROUTING_DEFAULTS.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.jobs = OrderedDict()
+
+    def submit(self, file_path: str, seeds: Optional[list[int]] = None, jar_path: Optional[str] = None, max_parallel: Optional[int] = None,
+               max_passes: Optional[int] = None, timeout: Optional[float] = None, keep_connections: Optional[list] = None,
+               nets: Optional[list[str]] = None, use_cache: bool = True) -> RoutingJob:
+        config = self.config
+        job_id = uuid.uuid4().hex[:12]
+        work_dir = os.path.join(os.path.dirname(resolve_board_path(file_path)), config['work_dir'], job_id)
+        os.makedirs(work_dir, exist_ok=True)
+
+        seeds = list(dict.fromkeys(seeds if seeds else config['seeds']))
+        job = RoutingJob(job_id, file_path, work_dir, seeds, jar_path or config['jar_path'], config['command'],
+                         max(1, max_parallel or config['max_parallel']), max_passes if max_passes is not None else config['max_passes'],
+                         timeout or config['timeout_seconds'], [tuple(pad) for pad in keep_connections] if keep_connections else None,
+                         list(nets) if nets else None, use_cache)
+        self.jobs[job_id] = job
+        self._evict()
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[RoutingJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> str:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return f"Error: Unknown routing job {job_id}"
+        if job.done:
+            return f"Error: Routing job {job_id} is already {job.status}"
+        if job.status == "importing":
+            return f"Error: The result of routing job {job_id} is already being imported"
+        job.task.cancel()
+        return f"SUCCESS: Routing job {job_id} cancelled."
+
+    async def _run(self, job: RoutingJob) -> None:
+        executor = get_board_executor()
+        with tool_span("routing_job"):
+            try:
+                job.status = "exporting"
+                prepared = await executor.run(job.file_path, prepare_routing, job.file_path, job.dsn_file, job.keep_connections,
+                                              job.max_passes, job.use_cache, job.nets, readonly=True)
+                job.stamp, job.key = prepared['stamp'], prepared['key']
+
+                if prepared['cached'] is not None:
+                    for run in job.runs:
+                        run.status = "skipped"
+                    job.status = "importing"
+                    job.message = await executor.run(job.file_path, import_routing_ses, job.file_path, prepared['cached'], job.stamp)
+                    if job.message.startswith("SUCCESS"):
+                        job.message += ", reused from the routing cache"
+                    job.status = "done" if job.message.startswith("SUCCESS") else "failed"
+                    return
+
+                job.status = "routing"
+                semaphore = asyncio.Semaphore(job.max_parallel)
+                tasks = [asyncio.ensure_future(self._route(job, run, semaphore)) for run in job.runs]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    # A failed or cancelled run must not leave the other router processes running
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    for run in job.runs:
+                        if run.status == "queued":
+                            run.status = "cancelled"
+
+                finished = [run for run in job.runs if run.result is not None]
+                if not finished:
+                    raise RuntimeError("No seed finished routing")
+                job.best = min(finished, key=lambda run: (run.result['unrouted'], run.result['vias'], run.seed))
+
+                job.status = "importing"
+                job.message = await executor.run(job.file_path, import_routing_ses, job.file_path, job.best.ses_file, job.stamp,
+                                                 job.key, job.keep_connections, job.max_passes, job.nets)
+                job.status = "done" if job.message.startswith("SUCCESS") else "failed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                job.message = "Cancelled"
+            except Exception as e:
+                job.status = "failed"
+                job.message = f"Error: {str(e)}"
+            finally:
+                job.finished = time.monotonic()
+
+    async def _route(self, job: RoutingJob, run: RoutingRun, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            cmd = freerouting_command(job.jar_path, job.dsn_file, run.ses_file, run.seed, job.max_passes, job.command)
+            run.status = "running"
+            run.started = time.monotonic()
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(*cmd, cwd=job.work_dir, stdin=asyncio.subprocess.DEVNULL,
+                                                            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+                with span("freerouting"):
+                    await asyncio.wait_for(self._follow(run, proc), job.timeout)
+            except asyncio.TimeoutError:
+                run.status = "timeout"
+                run.error = f"Stopped after {job.timeout:g} s"
+            except asyncio.CancelledError:
+                run.status = "cancelled"
+                raise
+            except Exception as e:
+                run.status = "failed"
+                run.error = f"Could not start the router: {str(e)}" if proc is None else str(e)
+            finally:
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                run.seconds = time.monotonic() - run.started
+
+        if run.status != "running":
+            return
+        run.returncode = proc.returncode
+        if proc.returncode != 0 or not os.path.exists(run.ses_file):
+            run.status = "failed"
+            run.error = f"Exit code {proc.returncode}: {run.last_line}"
+            return
+
+        run.status = "scoring"
+        try:
+            run.result = await get_board_executor().run(job.file_path, score_routing_ses, job.file_path, run.ses_file, readonly=True)
+            run.status = "done"
+        except Exception as e:
+            run.status = "failed"
+            run.error = str(e)
+
+    @staticmethod
+    async def _follow(run: RoutingRun, proc) -> None:
+        async for line in proc.stdout:
+            text = line.decode(errors='replace').strip()
+            if not text:
+                continue
+            run.last_line = text[-200:]
+            match = PASS_RE.search(text)
+            if match:
+                run.passes = max(run.passes, int(match.group(1)))
+        await proc.wait()
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(self.jobs) - self.config['max_jobs'])]:
+            job = self.jobs.pop(job_id)
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+
+
+def format_routing_job(job: RoutingJob) -> str:
+    """
+    Progress report of a routing job, one line per seed.
+    """
+    elapsed = (job.finished or time.monotonic()) - job.created
+    msg = f"Routing Job: {job.id}, Board: {job.file_path}, Status: {job.status}, Elapsed: {elapsed:.1f} s\n"
+    for run in job.runs:
+        seconds = run.seconds if run.seconds is not None else (time.monotonic() - run.started if run.started else 0.0)
+        info = f"  Seed {run.seed}: {run.status}, {seconds:.1f} s"
+        if run.passes:
+            info += f", pass {run.passes}"
+        if run.result is not None:
+            info += f", unrouted {run.result['unrouted']}, vias {run.result['vias']}"
+        if run.error:
+            info += f", {run.error}"
+        elif run.status == "running" and run.last_line:
+            info += f", last output: {run.last_line}"
+        msg += info + "\n"
+    if job.best is not None:
+        msg += f"Best: seed {job.best.seed} with {job.best.result['unrouted']} unrouted connections and {job.best.result['vias']} vias\n"
+    if job.message:
+        msg += job.message + "\n"
+    return msg
+
+
+_routing_jobs = None
+
+
+def get_routing_jobs() -> RoutingJobManager:
+    global _routing_jobs
+    if _routing_jobs is None:
+        _routing_jobs = RoutingJobManager(load_const_section('ROUTING', ROUTING_DEFAULTS))
+    return _routing_jobs
@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import os
+import time
+import itertools
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from pcb_reader import read_board
+from pcb_lazy import lazy_import
+from pcb_trace import span
+
+
+# pcbnew takes seconds to import, so it is only loaded by the first tool that needs it. Read-only tools still work
+# without KiCad through the standalone board reader.
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+BOARD_CACHE_MAX_ENTRIES = 8
+BOARD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+BOARD_MEMORY_FACTOR = 10
+
+# Numbers the unsaved mutations of all sessions of this process, so two dirty states of a board are never confused
+_revisions = itertools.count(1)
+
+
+def resolve_board_path(file_path: str) -> str:
+    return os.path.normcase(os.path.realpath(file_path))
+
+
+_board_keys = {}
+
+
+def get_board_key(board) -> str:
+    """
+    Return the resolved path a loaded board belongs to, used to key data derived from the board.
+    """
+    file_name = board.GetFileName() if board else ""
+    path = _board_keys.get(file_name)
+    if path is None:
+        path = resolve_board_path(file_name) if file_name else ""
+        _board_keys[file_name] = path
+    return path
+
+
+def get_file_stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class BoardSession:
+    """
+    A loaded board together with the file stamp it was loaded from and its unsaved mutation state.
+    """
+
+    def __init__(self, path: str, board: pcbnew.BOARD, stamp):
+        self.path = path
+        self.board = board
+        self.stamp = stamp
+        self.size_bytes = (stamp[1] if stamp else 0) * BOARD_MEMORY_FACTOR
+        self.dirty = False
+        self.dirty_since = None
+        self.pending_ops = 0
+        self.revision = None
+        self.in_transaction = False
+        self.flush_ops = None
+        self.flush_seconds = None
+
+
+class BoardSessionCache:
+    """
+    LRU cache of loaded boards shared by all tools, keyed by the resolved file path and validated against the file mtime and size.
+
+    Mutations are written through immediately unless a transaction is open on the board, in which case they stay on the
+    in-memory board until the transaction is committed or an auto-flush limit is reached.
+
+    Args:
+        max_entries (int): Maximum number of boards kept in memory.
+        max_bytes (int): Approximate memory cap, estimated as file size times BOARD_MEMORY_FACTOR.
+    """
+
+    def __init__(self, max_entries: int = BOARD_CACHE_MAX_ENTRIES, max_bytes: int = BOARD_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._readonly = OrderedDict()
+        self._aborted = set()
+        self._pinned = {}
+        self._release_hooks = []
+        self._lock = threading.RLock()
+
+    def add_release_hook(self, hook) -> None:
+        """
+        Register a callback taking the board path, called whenever a cached board is reloaded, replaced or dropped, so data derived from it can be released.
+        """
+        self._release_hooks.append(hook)
+
+    def _release(self, path: str) -> None:
+        for hook in self._release_hooks:
+            hook(path)
+
+    def load(self, file_path: str) -> pcbnew.BOARD:
+        path = resolve_board_path(file_path)
+        stamp = get_file_stamp(path)
+
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is not None:
+                # Unsaved mutations win over the file until they are committed or rolled back
+                if session.stamp == stamp or session.dirty or session.in_transaction:
+                    self._sessions.move_to_end(path)
+                    return session.board
+                # The file changed outside the server
+                del self._sessions[path]
+                self._release(path)
+
+            with span("load_board"):
+                board = pcbnew.LoadBoard(path)
+            if not board:
+                return board
+
+            self._sessions[path] = BoardSession(path, board, stamp)
+            self._evict()
+            return board
+
+    def load_readonly(self, file_path: str):
+        """
+        Board for tools that never mutate it. A board already loaded through pcbnew is shared, otherwise the file is parsed
+        by the standalone reader, which is much cheaper than a pcbnew load and works without KiCad installed.
+        """
+        path = resolve_board_path(file_path)
+        stamp = get_file_stamp(path)
+
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is not None and (session.stamp == stamp or session.dirty or session.in_transaction):
+                self._sessions.move_to_end(path)
+                return session.board
+
+            cached = self._readonly.get(path)
+            if cached is not None:
+                if cached[0] == stamp:
+                    self._readonly.move_to_end(path)
+                    return cached[1]
+                del self._readonly[path]
+                self._release(path)
+
+            if stamp is None:
+                return None
+            with span("read_board"):
+                board = read_board(path)
+            self._readonly[path] = (stamp, board)
+            while len(self._readonly) > self.max_entries:
+                evicted, _ = self._readonly.popitem(last=False)
+                # Data derived from the board would keep it alive, unless it now belongs to the session of the same file
+                if evicted not in self._sessions:
+                    self._release(evicted)
+            return board
+
+    def save(self, file_path: str, board: pcbnew.BOARD, changed: bool = True) -> bool:
+        """
+        Record a mutation of the board and write it out according to the current flush policy.
+
+        Returns:
+            bool: True if the board was written to disk.
+        """
+
+        path = resolve_board_path(file_path)
+
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is None or session.board is not board:
+                if session is not None:
+                    self._release(path)
+                session = BoardSession(path, board, get_file_stamp(path))
+                self._sessions[path] = session
+            self._sessions.move_to_end(path)
+
+            if changed:
+                if not session.dirty:
+                    session.dirty_since = time.monotonic()
+                session.dirty = True
+                session.pending_ops += 1
+                session.revision = next(_revisions)
+
+            if session.in_transaction and not self._flush_due(session):
+                return False
+
+            written = self._flush(session)
+            self._evict()
+            return written
+
+    def flush(self, file_path: str) -> bool:
+        path = resolve_board_path(file_path)
+
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is None:
+                return False
+            return self._flush(session)
+
+    def begin(self, file_path: str, flush_ops: Optional[int] = None, flush_seconds: Optional[float] = None) -> pcbnew.BOARD:
+        path = resolve_board_path(file_path)
+
+        with self._lock:
+            board = self.load(path)
+            if not board:
+                return board
+            session = self._sessions[path]
+            session.in_transaction = True
+            session.flush_ops = flush_ops
+            session.flush_seconds = flush_seconds
+            self._aborted.discard(path)
+            return board
+
+    def commit(self, file_path: str) -> int:
+        """
+        Write the pending mutations of an open transaction and close it.
+
+        Returns:
+            int: Number of mutations written, 0 if the board was clean.
+
+        Raises:
+            RuntimeError: If no transaction is open or it was aborted by a failed mutation.
+        """
+
+        path = resolve_board_path(file_path)
+
+        with self._lock:
+            if path in self._aborted:
+                self._aborted.discard(path)
+                raise RuntimeError("transaction was aborted by a failed mutation and its changes were rolled back")
+            session = self._sessions.get(path)
+            if session is None or not session.in_transaction:
+                raise RuntimeError("no open transaction")
+            pending_ops = session.pending_ops if session.dirty else 0
+            self._flush(session)
+            session.in_transaction = False
+            session.flush_ops = None
+            session.flush_seconds = None
+            self._evict()
+            return pending_ops
+
+    def rollback(self, file_path: str) -> int:
+        """
+        Discard the unsaved mutations of an open transaction, the board is reloaded from disk on next use.
+
+        Returns:
+            int: Number of discarded mutations.
+
+        Raises:
+            RuntimeError: If no transaction is open.
+        """
+
+        path = resolve_board_path(file_path)
+
+        with self._lock:
+            if path in self._aborted:
+                self._aborted.discard(path)
+                return 0
+            session = self._sessions.get(path)
+            if session is None or not session.in_transaction:
+                raise RuntimeError("no open transaction")
+            pending_ops = session.pending_ops if session.dirty else 0
+            del self._sessions[path]
+            self._release(path)
+            return pending_ops
+
+    def pin(self, file_path: str) -> None:
+        """
+        Keep a board from being evicted while a tool call on another worker thread is using it.
+        """
+        path = resolve_board_path(file_path)
+        with self._lock:
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+
+    def unpin(self, file_path: str) -> None:
+        path = resolve_board_path(file_path)
+        with self._lock:
+            count = self._pinned.get(path, 0) - 1
+            if count > 0:
+                self._pinned[path] = count
+            else:
+                self._pinned.pop(path, None)
+
+    def in_transaction(self, file_path: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(resolve_board_path(file_path))
+            return session is not None and session.in_transaction
+
+    def last_mutation(self, path: str) -> Optional[int]:
+        """
+        Number of the last recorded mutation of a board, None if it has none. Cheap enough for every cache lookup, path
+        must already be resolved like the keys of get_board_key.
+        """
+        session = self._sessions.get(path)
+        return session.revision if session is not None else None
+
+    def get_revision(self, file_path: str) -> list:
+        """
+        Identify the state of the board a tool call sees: the file stamp, plus the process and mutation number of unsaved
+        changes. The board is unchanged as long as its revision is the same.
+        """
+        path = resolve_board_path(file_path)
+        with self._lock:
+            session = self._sessions.get(path)
+            stamp = session.stamp if session is not None and session.dirty else get_file_stamp(path)
+            revision = [os.getpid(), session.revision] if session is not None and session.dirty else None
+            return [list(stamp) if stamp else None, revision]
+
+    def invalidate(self, file_path: str = None) -> None:
+        with self._lock:
+            if file_path is None:
+                for path in set(self._sessions) | set(self._readonly):
+                    self._release(path)
+                self._sessions.clear()
+                self._readonly.clear()
+                return
+            path = resolve_board_path(file_path)
+            self._readonly.pop(path, None)
+            session = self._sessions.pop(path, None)
+            if session is not None:
+                self._release(path)
+                if session.in_transaction:
+                    self._aborted.add(path)
+
+    def _flush_due(self, session: BoardSession) -> bool:
+        if session.flush_ops is not None and session.pending_ops >= session.flush_ops:
+            return True
+        if session.flush_seconds is not None and session.dirty and time.monotonic() - session.dirty_since >= session.flush_seconds:
+            return True
+        return False
+
+    def _flush(self, session: BoardSession) -> bool:
+        if not session.dirty:
+            return False
+        with span("save_board"):
+            session.board.Save(session.path)
+        session.stamp = get_file_stamp(session.path)
+        session.dirty = False
+        session.dirty_since = None
+        session.pending_ops = 0
+        return True
+
+    def _evict(self) -> None:
+        total_bytes = sum(session.size_bytes for session in self._sessions.values())
+        for path in list(self._sessions):
+            if len(self._sessions) <= 1 or (len(self._sessions) <= self.max_entries and total_bytes <= self.max_bytes):
+                break
+            session = self._sessions[path]
+            # Never drop uncommitted transaction state or a board in use
+            if session.in_transaction or path in self._pinned:
+                continue
+            self._flush(session)
+            del self._sessions[path]
+            self._release(path)
+            total_bytes -= session.size_bytes
+
+
+board_cache = BoardSessionCache()
+
+
+def load_board(file_path: str) -> pcbnew.BOARD:
+    return board_cache.load(file_path)
+
+
+def load_board_readonly(file_path: str):
+    return board_cache.load_readonly(file_path)
+
+
+def save_board(file_path: str, board: pcbnew.BOARD, changed: bool = True) -> bool:
+    return board_cache.save(file_path, board, changed)
+
+
+def get_board_revision(file_path: str) -> list:
+    return board_cache.get_revision(file_path)
+
+
+def invalidate_board(file_path: str = None) -> None:
+    board_cache.invalidate(file_path)
+
+
+@contextmanager
+def pinned_board(file_path: str):
+    board_cache.pin(file_path)
+    try:
+        yield
+    finally:
+        board_cache.unpin(file_path)
+
+
+@contextmanager
+def board_transaction(file_path: str):
+    """
+    Group the mutations of one tool call into a single save. Nested use joins the already open transaction.
+
+    Raises:
+        RuntimeError: On leaving the block, if a failed mutation inside it aborted the transaction and rolled the
+            board back to its saved state.
+    """
+
+    if board_cache.in_transaction(file_path):
+        yield
+        return
+
+    if not board_cache.begin(file_path):
+        yield
+        return
+
+    try:
+        yield
+    except BaseException:
+        board_cache.rollback(file_path)
+        raise
+    board_cache.commit(file_path)
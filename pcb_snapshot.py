@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+
+from typing import Optional
+from pcb_utility import CONST_PATH, load_const_section
+
+
+SNAPSHOT_DEFAULTS = {
+    "dir": ".pcb_env_snapshots",
+    "max_entries": 64
+}
+
+# Sections whose rows are identified by a name column, the other row sections are identified by their content
+SNAPSHOT_KEY_COLUMNS = {
+    'modules': 'ref',
+    'nets': 'name',
+}
+
+
+def hash_row(row) -> str:
+    return hashlib.blake2b(json.dumps(row, separators=(',', ':')).encode(), digest_size=8).hexdigest()
+
+
+def index_pcb_env(env: dict) -> dict:
+    """
+    Hash every object of a collected environment.
+
+    Returns:
+        dict: {section: {key: [hash, row]}}. Tracks and vias have no stable name, so their key is their own hash,
+        numbered to keep identical objects apart.
+    """
+    index = {}
+    if 'board' in env:
+        index['board'] = {'board': [hash_row(env['board']), env['board']]}
+    for section, table in env.items():
+        if not isinstance(table, dict) or 'rows' not in table:
+            continue
+        key_column = table['columns'].index(SNAPSHOT_KEY_COLUMNS[section]) if section in SNAPSHOT_KEY_COLUMNS else None
+        entries = {}
+        for row in table['rows']:
+            row_hash = hash_row(row)
+            if key_column is not None:
+                key = str(row[key_column])
+            else:
+                count = 0
+                while f"{row_hash}#{count}" in entries:
+                    count += 1
+                key = f"{row_hash}#{count}"
+            entries[key] = [row_hash, row]
+        index[section] = entries
+    return index
+
+
+def get_snapshot_token(board_key: str, params: dict, index: dict) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps([board_key, params], sort_keys=True).encode())
+    for section in sorted(index):
+        for key in sorted(index[section]):
+            digest.update(f"{section}:{key}:{index[section][key][0]};".encode())
+    return digest.hexdigest()
+
+
+def diff_pcb_env(env: dict, index: dict, old_index: dict) -> dict:
+    """
+    Reduce a collected environment to the objects that were added or changed since the old snapshot, plus the removed ones.
+    Named objects are removed by key, tracks and vias by their old row.
+    """
+    diff = {'units': env['units']}
+    for section, entries in index.items():
+        old_entries = old_index.get(section, {})
+        if section == 'board':
+            if entries['board'][0] != old_entries.get('board', [None])[0]:
+                diff['board'] = env['board']
+            continue
+
+        rows = [row for key, (row_hash, row) in entries.items() if old_entries.get(key, [None])[0] != row_hash]
+        removed_keys = [key for key in old_entries if key not in entries]
+        if section in SNAPSHOT_KEY_COLUMNS:
+            removed = removed_keys
+        else:
+            removed = [old_entries[key][1] for key in removed_keys]
+        if rows or removed:
+            diff[section] = {'columns': env[section]['columns'], 'rows': rows, 'removed': removed}
+    return diff
+
+
+class SnapshotStore:
+    """
+    On-disk store of get_pcb_env snapshots, so a token is valid on every board worker. Only the newest max_entries
+    snapshots are kept.
+    """
+
+    def __init__(self, snapshot_dir: str, max_entries: int):
+        self.snapshot_dir = snapshot_dir
+        self.max_entries = max_entries
+
+    def _snapshot_path(self, token: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{token}.json")
+
+    def load(self, token: str) -> Optional[dict]:
+        if not token.isalnum():
+            return None
+        try:
+            with open(self._snapshot_path(token), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, token: str, snapshot: dict, replace: bool = False) -> None:
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(token)
+        if not replace and os.path.exists(path):
+            os.utime(path)
+            return
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+        self._evict()
+
+    def touch(self, token: str) -> None:
+        try:
+            os.utime(self._snapshot_path(token))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.snapshot_dir):
+            if name.endswith('.json'):
+                try:
+                    entries.append((os.stat(os.path.join(self.snapshot_dir, name)).st_mtime, name))
+                except OSError:
+                    continue
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(os.path.join(self.snapshot_dir, name))
+            except OSError:
+                pass
+
+
+def get_snapshot_store() -> SnapshotStore:
+    config = load_const_section('PCB_ENV_SNAPSHOTS', SNAPSHOT_DEFAULTS)
+    snapshot_dir = config['dir']
+    if not os.path.isabs(snapshot_dir):
+        snapshot_dir = os.path.join(os.path.dirname(CONST_PATH), snapshot_dir)
+    return SnapshotStore(snapshot_dir, config['max_entries'])
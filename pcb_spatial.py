@@ -0,0 +1,269 @@
+import math
+
+from pcb_lazy import lazy_import
+
+
+np = lazy_import('numpy')
+
+
+def rotation_terms(angle_degrees: float) -> tuple:
+    """
+    Return (cos, sin) of the angle, exact for multiples of 90 degrees so axis-aligned rotations stay on the integer grid.
+    """
+    quarter = angle_degrees / 90
+    if quarter == int(quarter):
+        return ((1, 0), (0, 1), (-1, 0), (0, -1))[int(quarter) % 4]
+    angle = math.radians(angle_degrees)
+    return (math.cos(angle), math.sin(angle))
+
+
+def local_to_board(points, origin: tuple, angle_degrees: float) -> list[tuple]:
+    """
+    Map footprint-local points to board coordinates using the KiCad rotation convention (y axis down, positive angles counterclockwise on screen).
+    """
+    cos, sin = rotation_terms(angle_degrees)
+    ox, oy = origin
+    return [(ox + x * cos + y * sin, oy - x * sin + y * cos) for x, y in points]
+
+
+def board_to_local(points, origin: tuple, angle_degrees: float) -> list[tuple]:
+    cos, sin = rotation_terms(angle_degrees)
+    ox, oy = origin
+    return [((x - ox) * cos - (y - oy) * sin, (x - ox) * sin + (y - oy) * cos) for x, y in points]
+
+
+def points_box(points, margin: int = 0):
+    if not points:
+        return None
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return (round(min(xs)) - margin, round(min(ys)) - margin, round(max(xs)) + margin, round(max(ys)) + margin)
+
+
+def boxes_intersect(box1: tuple, box2: tuple) -> bool:
+    return box1[0] <= box2[2] and box2[0] <= box1[2] and box1[1] <= box2[3] and box2[1] <= box1[3]
+
+
+def inflate_box(box: tuple, margin: int) -> tuple:
+    return (box[0] - margin, box[1] - margin, box[2] + margin, box[3] + margin)
+
+
+def suggest_cell_size(boxes) -> float:
+    sizes = [max(box[2] - box[0], box[3] - box[1]) for box in boxes]
+    if not sizes or sum(sizes) <= 0:
+        return 1
+    return 2 * sum(sizes) / len(sizes)
+
+
+class SpatialGrid:
+    """
+    Uniform grid over axis-aligned boxes (x0, y0, x1, y1) in internal units, used to find overlapping courtyards
+    without testing every pair of modules.
+
+    Args:
+        cell_size (float): Edge length of a grid cell. A good value is about twice the typical box size.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size if cell_size > 0 else 1
+        self._cells = {}
+        self._boxes = {}
+
+    @classmethod
+    def from_boxes(cls, boxes: dict, cell_size: float = None):
+        if cell_size is None:
+            cell_size = suggest_cell_size(boxes.values())
+        grid = cls(cell_size)
+        for key, box in boxes.items():
+            grid.insert(key, box)
+        return grid
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key) -> bool:
+        return key in self._boxes
+
+    def get(self, key):
+        return self._boxes.get(key)
+
+    def keys(self):
+        return self._boxes.keys()
+
+    def _cells_of(self, box: tuple):
+        size = self.cell_size
+        for cell_x in range(math.floor(box[0] / size), math.floor(box[2] / size) + 1):
+            for cell_y in range(math.floor(box[1] / size), math.floor(box[3] / size) + 1):
+                yield (cell_x, cell_y)
+
+    def insert(self, key, box: tuple) -> None:
+        if key in self._boxes:
+            self.remove(key)
+        self._boxes[key] = box
+        for cell in self._cells_of(box):
+            self._cells.setdefault(cell, []).append(key)
+
+    def remove(self, key) -> None:
+        box = self._boxes.pop(key, None)
+        if box is None:
+            return
+        for cell in self._cells_of(box):
+            keys = self._cells[cell]
+            keys.remove(key)
+            if not keys:
+                del self._cells[cell]
+
+    def query(self, box: tuple, margin: int = 0) -> set:
+        """
+        Return the keys of all boxes intersecting the given box inflated by margin.
+        """
+
+        box = inflate_box(box, margin) if margin else box
+        found = set()
+        for cell in self._cells_of(box):
+            for key in self._cells.get(cell, ()):
+                if key not in found and boxes_intersect(self._boxes[key], box):
+                    found.add(key)
+        return found
+
+
+def orientation(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    cross = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return (cross > 0) - (cross < 0)
+
+
+def segments_intersect(x1: float, y1: float, x2: float, y2: float, x3: float, y3: float, x4: float, y4: float) -> bool:
+    """
+    Return True if the two closed segments share at least one point, including touching ends and collinear overlaps.
+    """
+    o1 = orientation(x1, y1, x2, y2, x3, y3)
+    o2 = orientation(x1, y1, x2, y2, x4, y4)
+    o3 = orientation(x3, y3, x4, y4, x1, y1)
+    o4 = orientation(x3, y3, x4, y4, x2, y2)
+
+    if o1 != o2 and o3 != o4:
+        return True
+
+    def on_segment(ax, ay, bx, by, cx, cy):
+        return min(ax, bx) <= cx <= max(ax, bx) and min(ay, by) <= cy <= max(ay, by)
+
+    return ((o1 == 0 and on_segment(x1, y1, x2, y2, x3, y3)) or
+            (o2 == 0 and on_segment(x1, y1, x2, y2, x4, y4)) or
+            (o3 == 0 and on_segment(x3, y3, x4, y4, x1, y1)) or
+            (o4 == 0 and on_segment(x3, y3, x4, y4, x2, y2)))
+
+
+def find_segment_intersections(segments: list) -> list[tuple]:
+    """
+    Find intersecting pairs among (x1, y1, x2, y2, net) segments of different nets. Segments are bucketed in a
+    SpatialGrid by their bounding boxes, so only segments sharing a grid cell are tested.
+
+    Returns:
+        list[tuple]: (i, j, net_i, net_j) for every intersecting pair, ordered by i then j.
+    """
+    boxes = {}
+    for i, (x1, y1, x2, y2, _) in enumerate(segments):
+        boxes[i] = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+    grid = SpatialGrid.from_boxes(boxes)
+
+    intersecting_pairs = []
+    for i, seg1 in enumerate(segments):
+        for j in sorted(grid.query(boxes[i])):
+            seg2 = segments[j]
+            if j <= i or seg1[4] == seg2[4]:
+                continue
+            if segments_intersect(seg1[0], seg1[1], seg1[2], seg1[3], seg2[0], seg2[1], seg2[2], seg2[3]):
+                intersecting_pairs.append((i, j, seg1[4], seg2[4]))
+
+    return intersecting_pairs
+
+
+def outline_segments(polylines: list, origin: tuple, angle_degrees: float):
+    """
+    Map the local courtyard polylines of a footprint to board coordinates as an (n, 4) array of segments (x0, y0, x1, y1).
+    """
+    segments = [(*p0, *p1) for polyline in polylines for p0, p1 in zip(polyline, polyline[1:])]
+    if not segments:
+        return np.empty((0, 4))
+    local = np.asarray(segments, dtype=float)
+    cos, sin = rotation_terms(angle_degrees)
+    xs, ys = local[:, 0::2], local[:, 1::2]
+    board = np.empty_like(local)
+    board[:, 0::2] = origin[0] + xs * cos + ys * sin
+    board[:, 1::2] = origin[1] - xs * sin + ys * cos
+    return board
+
+
+def outline_rect(segments):
+    """
+    Return the (x0, y0, x1, y1) box of an outline made only of axis-aligned segments on its own bounding box, which is
+    the common rectangular courtyard, or None for any other outline.
+    """
+    if not len(segments):
+        return None
+    xs, ys = segments[:, 0::2], segments[:, 1::2]
+    x0, y0, x1, y1 = xs.min(), ys.min(), xs.max(), ys.max()
+    vertical = (xs[:, 0] == xs[:, 1]) & ((xs[:, 0] == x0) | (xs[:, 0] == x1))
+    horizontal = (ys[:, 0] == ys[:, 1]) & ((ys[:, 0] == y0) | (ys[:, 0] == y1))
+    if not (vertical | horizontal).all():
+        return None
+    return (float(x0), float(y0), float(x1), float(y1))
+
+
+def rect_distance(rect1: tuple, rect2: tuple) -> float:
+    dx = max(rect1[0] - rect2[2], rect2[0] - rect1[2], 0)
+    dy = max(rect1[1] - rect2[3], rect2[1] - rect1[3], 0)
+    return math.hypot(dx, dy)
+
+
+def points_in_outline(points, segments) -> bool:
+    """
+    Return True if any of the (m, 2) points lies inside the closed outline formed by the segments, by even-odd ray
+    casting. The segments may come in any order as long as they form closed loops.
+    """
+    x0, y0, x1, y1 = (segments[:, i][None, :] for i in range(4))
+    px, py = points[:, 0][:, None], points[:, 1][:, None]
+    straddles = (y0 > py) != (y1 > py)
+    dy = np.where(y1 != y0, y1 - y0, 1)
+    crossings = straddles & (px < (x1 - x0) * (py - y0) / dy + x0)
+    return bool((crossings.sum(axis=1) % 2 == 1).any())
+
+
+def point_segment_distances(points, segments):
+    """
+    Return the (m, n) distances between m points and n segments.
+    """
+    start = segments[:, :2][None, :, :]
+    direction = segments[:, 2:][None, :, :] - start
+    length2 = (direction ** 2).sum(axis=2)
+    offset = points[:, None, :] - start
+    t = np.clip((offset * direction).sum(axis=2) / np.where(length2 > 0, length2, 1), 0, 1)
+    return np.hypot(*(offset - t[:, :, None] * direction).transpose(2, 0, 1))
+
+
+def outline_distance(segments1, segments2) -> float:
+    """
+    Exact distance between two courtyard outlines given as segment arrays, 0 if they cross or one contains the other.
+    """
+    if not len(segments1) or not len(segments2):
+        return math.inf
+
+    ax0, ay0, ax1, ay1 = (segments1[:, i][:, None] for i in range(4))
+    bx0, by0, bx1, by1 = (segments2[:, i][None, :] for i in range(4))
+    adx, ady, bdx, bdy = ax1 - ax0, ay1 - ay0, bx1 - bx0, by1 - by0
+
+    # Proper crossings, touching and collinear cases come out as a zero point-to-segment distance below
+    side_b0 = adx * (by0 - ay0) - ady * (bx0 - ax0)
+    side_b1 = adx * (by1 - ay0) - ady * (bx1 - ax0)
+    side_a0 = bdx * (ay0 - by0) - bdy * (ax0 - bx0)
+    side_a1 = bdx * (ay1 - by0) - bdy * (ax1 - bx0)
+    if ((side_b0 * side_b1 < 0) & (side_a0 * side_a1 < 0)).any():
+        return 0.0
+
+    points1 = segments1[:, :2]
+    points2 = segments2[:, :2]
+    if points_in_outline(points1, segments2) or points_in_outline(points2, segments1):
+        return 0.0
+
+    return float(min(point_segment_distances(np.concatenate((points1, segments1[:, 2:])), segments2).min(),
+                     point_segment_distances(np.concatenate((points2, segments2[:, 2:])), segments1).min()))
@@ -0,0 +1,185 @@
+import math
+import uuid
+import random
+import argparse
+
+from pcb_spatial import *
+
+
+SYNTH_LAYERS = [
+    (0, "F.Cu", "signal"), (31, "B.Cu", "signal"),
+    (32, "B.Adhes", "user", "B.Adhesive"), (33, "F.Adhes", "user", "F.Adhesive"),
+    (34, "B.Paste", "user"), (35, "F.Paste", "user"),
+    (36, "B.SilkS", "user", "B.Silkscreen"), (37, "F.SilkS", "user", "F.Silkscreen"),
+    (38, "B.Mask", "user"), (39, "F.Mask", "user"),
+    (40, "Dwgs.User", "user", "User.Drawings"), (41, "Cmts.User", "user", "User.Comments"),
+    (42, "Eco1.User", "user", "User.Eco1"), (43, "Eco2.User", "user", "User.Eco2"),
+    (44, "Edge.Cuts", "user"), (45, "Margin", "user"),
+    (46, "B.CrtYd", "user", "B.Courtyard"), (47, "F.CrtYd", "user", "F.Courtyard"),
+    (48, "B.Fab", "user"), (49, "F.Fab", "user"),
+] + [(49 + i, f"User.{i}", "user") for i in range(1, 10)]
+
+PAD_PITCH = 1.27
+PAD_SIZE = (1.6, 0.6)
+PAD_OFFSET = 2.4
+COURTYARD_MARGIN = 0.5
+
+
+def footprint_pads(pad_count: int) -> list[tuple]:
+    """
+    Local pad positions of a two-row package with pad_count pads, numbered counterclockwise like an SOIC.
+    """
+    if pad_count == 1:
+        return [(0.0, 0.0)]
+    rows = math.ceil(pad_count / 2)
+    top = -(rows - 1) * PAD_PITCH / 2
+    left = [(-PAD_OFFSET, top + i * PAD_PITCH) for i in range(rows)]
+    right = [(PAD_OFFSET, top + i * PAD_PITCH) for i in reversed(range(rows))]
+    return (left + right)[:pad_count]
+
+
+def footprint_courtyard(pad_count: int) -> tuple:
+    """
+    Half width and half height of the courtyard of a package with pad_count pads.
+    """
+    rows = math.ceil(pad_count / 2)
+    half_w = PAD_OFFSET + PAD_SIZE[0] / 2 + COURTYARD_MARGIN if pad_count > 1 else PAD_SIZE[0] / 2 + COURTYARD_MARGIN
+    half_h = (rows - 1) * PAD_PITCH / 2 + PAD_SIZE[1] / 2 + COURTYARD_MARGIN
+    return round(half_w, 4), round(half_h, 4)
+
+
+def generate_board(footprints: int = 100, pads: int = 8, fanout: int = 4, tracks: int = 200, vias: int = 50,
+                   density: float = 0.3, seed: int = 0) -> str:
+    """
+    Generate the text of a two-layer KiCad 8 board for benchmarks: SMD packages on a jittered grid, a GND net on the
+    last pad of every package, signal nets joining fanout pads each, straight track segments between pads of the same
+    net and vias on the tracks. The same arguments always give the same board.
+
+    Args:
+        footprints (int): Number of footprints.
+        pads (int): Number of pads per footprint.
+        fanout (int): Number of pads per signal net.
+        tracks (int): Number of track segments.
+        vias (int): Number of vias.
+        density (float): Courtyard area / board area, lower values spread the footprints out.
+        seed (int): Seed of the random layout.
+    """
+    rng = random.Random(seed)
+
+    def new_uuid():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def num(value):
+        return f"{value:.4f}".rstrip('0').rstrip('.')
+
+    half_w, half_h = footprint_courtyard(pads)
+    cell = math.sqrt(4 * half_w * half_h / density)
+    columns = max(1, math.ceil(math.sqrt(footprints)))
+    rows = max(1, math.ceil(footprints / columns))
+    margin = 2.0
+
+    # Footprint positions, rotations and absolute pad positions
+    local_pads = footprint_pads(pads)
+    placements = []
+    pad_positions = []
+    for index in range(footprints):
+        x = margin + (index % columns + 0.5) * cell + rng.uniform(-0.25, 0.25) * cell
+        y = margin + (index // columns + 0.5) * cell + rng.uniform(-0.25, 0.25) * cell
+        angle = rng.choice((0, 90, 180, 270))
+        placements.append((round(x, 4), round(y, 4), angle))
+        pad_positions.append(local_to_board(local_pads, (round(x, 4), round(y, 4)), angle))
+
+    # The last pad of every package goes to GND, the others are shuffled into signal nets of fanout pads
+    net_names = ["", "GND"]
+    pad_nets = {}
+    signal_pads = []
+    for index in range(footprints):
+        for number in range(1, pads + 1):
+            if number == pads and pads > 1:
+                pad_nets[(index, number)] = 1
+            else:
+                signal_pads.append((index, number))
+    rng.shuffle(signal_pads)
+    fanout = max(2, fanout)
+    for start in range(0, len(signal_pads), fanout):
+        net_names.append(f"N{len(net_names) - 1}")
+        for pad in signal_pads[start:start + fanout]:
+            pad_nets[pad] = len(net_names) - 1
+
+    net_members = {}
+    for pad, net_code in pad_nets.items():
+        net_members.setdefault(net_code, []).append(pad)
+    routable_nets = sorted(net_code for net_code, members in net_members.items() if len(members) > 1)
+
+    lines = ["(kicad_pcb", "\t(version 20240108)", '\t(generator "pcb_synth")', '\t(generator_version "8.0")',
+             "\t(general (thickness 1.6) (legacy_teardrops no))", '\t(paper "A4")', "\t(layers"]
+    for layer in SYNTH_LAYERS:
+        lines.append(f'\t\t({layer[0]} "{layer[1]}" {layer[2]}' + (f' "{layer[3]}"' if len(layer) > 3 else "") + ")")
+    lines.append("\t)")
+    lines.append("\t(setup (pad_to_mask_clearance 0) (allow_soldermask_bridges_in_footprints no))")
+    for net_code, net_name in enumerate(net_names):
+        lines.append(f'\t(net {net_code} "{net_name}")')
+
+    for index, (x, y, angle) in enumerate(placements):
+        ref = f"U{index + 1}"
+        at_angle = f" {angle}" if angle else ""
+        lines.append(f'\t(footprint "Synth:SYNTH-{pads}"')
+        lines.append('\t\t(layer "F.Cu")')
+        lines.append(f'\t\t(uuid "{new_uuid()}")')
+        lines.append(f"\t\t(at {num(x)} {num(y)}{at_angle})")
+        lines.append(f'\t\t(property "Reference" "{ref}" (at 0 {num(-half_h - 1)} {angle}) (layer "F.SilkS") (uuid "{new_uuid()}") (effects (font (size 1 1) (thickness 0.15))))')
+        lines.append(f'\t\t(property "Value" "SYNTH-{pads}" (at 0 {num(half_h + 1)} {angle}) (layer "F.Fab") (uuid "{new_uuid()}") (effects (font (size 1 1) (thickness 0.15))))')
+        lines.append(f'\t\t(fp_rect (start {num(-half_w)} {num(-half_h)}) (end {num(half_w)} {num(half_h)}) (stroke (width 0.05) (type solid)) (fill none) (layer "F.CrtYd") (uuid "{new_uuid()}"))')
+        for number, (pad_x, pad_y) in enumerate(local_pads, 1):
+            net_code = pad_nets[(index, number)]
+            lines.append(f'\t\t(pad "{number}" smd rect (at {num(pad_x)} {num(pad_y)}{at_angle}) (size {num(PAD_SIZE[0])} {num(PAD_SIZE[1])}) '
+                         f'(layers "F.Cu" "F.Paste" "F.Mask") (net {net_code} "{net_names[net_code]}") (uuid "{new_uuid()}"))')
+        lines.append("\t)")
+
+    board_w = 2 * margin + columns * cell
+    board_h = 2 * margin + rows * cell
+    lines.append(f'\t(gr_rect (start 0 0) (end {num(board_w)} {num(board_h)}) (stroke (width 0.1) (type default)) (fill none) (layer "Edge.Cuts") (uuid "{new_uuid()}"))')
+
+    segments = []
+    for _ in range(tracks if routable_nets else 0):
+        net_code = rng.choice(routable_nets)
+        (index1, number1), (index2, number2) = rng.sample(net_members[net_code], 2)
+        start = pad_positions[index1][number1 - 1]
+        end = pad_positions[index2][number2 - 1]
+        segments.append((start, end, net_code))
+        lines.append(f'\t(segment (start {num(start[0])} {num(start[1])}) (end {num(end[0])} {num(end[1])}) (width 0.25) (layer "F.Cu") (net {net_code}) (uuid "{new_uuid()}"))')
+
+    for _ in range(vias if segments else 0):
+        start, end, net_code = rng.choice(segments)
+        t = rng.random()
+        x, y = start[0] + (end[0] - start[0]) * t, start[1] + (end[1] - start[1]) * t
+        lines.append(f'\t(via (at {num(x)} {num(y)}) (size 0.6) (drill 0.3) (layers "F.Cu" "B.Cu") (net {net_code}) (uuid "{new_uuid()}"))')
+
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+def write_board(file_path: str, **kwargs) -> str:
+    """
+    Write a generated board to file_path, see generate_board for the arguments.
+    """
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(generate_board(**kwargs))
+    return file_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic KiCad board for benchmarks.")
+    parser.add_argument("file_path", help="Output .kicad_pcb file.")
+    parser.add_argument("--footprints", type=int, default=100, help="Number of footprints.")
+    parser.add_argument("--pads", type=int, default=8, help="Number of pads per footprint.")
+    parser.add_argument("--fanout", type=int, default=4, help="Number of pads per signal net.")
+    parser.add_argument("--tracks", type=int, default=200, help="Number of track segments.")
+    parser.add_argument("--vias", type=int, default=50, help="Number of vias.")
+    parser.add_argument("--density", type=float, default=0.3, help="Courtyard area / board area.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_board(args.file_path, footprints=args.footprints, pads=args.pads, fanout=args.fanout, tracks=args.tracks,
+                vias=args.vias, density=args.density, seed=args.seed)
+    print(f"SUCCESS: Wrote {args.footprints} footprints to {args.file_path}")
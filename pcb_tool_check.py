@@ -1,9 +1,57 @@
-import pcbnew
+from __future__ import annotations
+
+import threading
 
 from typing import Optional
 from pcb_utility import *
+from pcb_session import *
+from pcb_connectivity import *
+from pcb_placement import *
+from pcb_lazy import lazy_import
+from pcb_trace import traced
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+np = lazy_import('numpy')
+
+
+def is_label_drawing(item) -> bool:
+    return item.GetClass() in ("PCB_SHAPE", "PCB_TEXT") and item.GetLayer() in [pcbnew.User_1, pcbnew.User_2, pcbnew.User_3, pcbnew.User_4]
+
+
+def format_onboard_module_violation(module, module_courtyard) -> str:
+    ref = module.GetReference()
+    pos = module.GetPosition()
+    size = module_courtyard.GetSize()
+    return f"On-Board Issue: {ref} is out of board bounds. Size: {pcbnew.ToMM(size.x):.2f} mm x {pcbnew.ToMM(size.y):.2f} mm, Position: ({pcbnew.ToMM(pos.x):.2f} mm, {pcbnew.ToMM(pos.y):.2f} mm)"
+
+
+def format_onboard_drawing_violation(item, item_bbox) -> str:
+    pos = item.GetPosition()
+    size = item_bbox.GetSize()
+    if item.GetClass() == "PCB_SHAPE":
+        item_type = f"Shape ({item.GetShapeStr()})"
+    elif item.GetClass() == "PCB_TEXT":
+        item_type = "Text"
+    else:
+        item_type = "Drawing"
+    return f"On-Board Issue: {item_type} is out of board bounds. Size: {pcbnew.ToMM(size.x):.2f} mm x {pcbnew.ToMM(size.y):.2f} mm, Position: ({pcbnew.ToMM(pos.x):.2f} mm, {pcbnew.ToMM(pos.y):.2f} mm)"
+
+
+def format_clearance_violation(mod1, bbox1, mod2, bbox2) -> str:
+    ref1 = mod1.GetReference()
+    ref2 = mod2.GetReference()
 
+    pos1 = mod1.GetPosition()
+    pos2 = mod2.GetPosition()
 
+    size1 = bbox1.GetSize()
+    size2 = bbox2.GetSize()
+
+    return f"Clearance Issue: {ref1} and {ref2} too close. {ref1}: Size: {pcbnew.ToMM(size1.x):.2f} mm x {pcbnew.ToMM(size1.y):.2f} mm, Position: ({pcbnew.ToMM(pos1.x):.2f} mm, {pcbnew.ToMM(pos1.y):.2f} mm). {ref2}: Size: {pcbnew.ToMM(size2.x):.2f} mm x {pcbnew.ToMM(size2.y):.2f} mm, Position: ({pcbnew.ToMM(pos2.x):.2f} mm, {pcbnew.ToMM(pos2.y):.2f} mm)"
+
+
+@traced()
 async def check_board_onboard_violations(board: pcbnew.BOARD) -> list[str]:
     """
     Check if any modules or labeling areas are out of the board boundaries.
@@ -14,28 +62,14 @@ async def check_board_onboard_violations(board: pcbnew.BOARD) -> list[str]:
 
         for module in board.GetFootprints():
             module_courtyard = await get_footprint_courtyard(module)
-            if not board_courtyard.Contains(module_courtyard):
-                ref = module.GetReference()
-                pos = module.GetPosition()
-                size = module_courtyard.GetSize()
-                violation_info = f"On-Board Issue: {ref} is out of board bounds. Size: {pcbnew.ToMM(size.x):.2f} mm x {pcbnew.ToMM(size.y):.2f} mm, Position: ({pcbnew.ToMM(pos.x):.2f} mm, {pcbnew.ToMM(pos.y):.2f} mm)"
-                onboard_violations.append(violation_info)
+            if module_courtyard is not None and not board_courtyard.Contains(module_courtyard):
+                onboard_violations.append(format_onboard_module_violation(module, module_courtyard))
 
         for item in board.GetDrawings():
-            if isinstance(item, (pcbnew.PCB_SHAPE, pcbnew.PCB_TEXT)):
-                if item.GetLayer() in [pcbnew.User_1, pcbnew.User_2, pcbnew.User_3, pcbnew.User_4]:
-                    item_bbox = item.GetBoundingBox()
-                    if not board_courtyard.Contains(item_bbox):
-                        pos = item.GetPosition()
-                        size = item_bbox.GetSize()
-                        if isinstance(item, pcbnew.PCB_SHAPE):
-                            item_type = f"Shape ({item.GetShapeStr()})"
-                        elif isinstance(item, pcbnew.PCB_TEXT):
-                            item_type = "Text"
-                        else:
-                            item_type = "Drawing"
-                        violation_info = f"On-Board Issue: {item_type} is out of board bounds. Size: {pcbnew.ToMM(size.x):.2f} mm x {pcbnew.ToMM(size.y):.2f} mm, Position: ({pcbnew.ToMM(pos.x):.2f} mm, {pcbnew.ToMM(pos.y):.2f} mm)"
-                        onboard_violations.append(violation_info)
+            if is_label_drawing(item):
+                item_bbox = item.GetBoundingBox()
+                if not board_courtyard.Contains(item_bbox):
+                    onboard_violations.append(format_onboard_drawing_violation(item, item_bbox))
         return onboard_violations
     
     except AttributeError as e:
@@ -44,36 +78,26 @@ async def check_board_onboard_violations(board: pcbnew.BOARD) -> list[str]:
         return [f"Error: Failed to check on-board violations - {str(e)}\n"]
 
 
+@traced()
 async def check_board_clearance_violations(board: pcbnew.BOARD, min_clearance: float) -> list[str]:
     """
-    Check if any modules are put too close so that they violate the clearance rules.
+    Check if any modules are put too close so that they violate the clearance rules. Pairs found by their courtyard boxes
+    are confirmed on the true courtyard outlines, so rotated or L-shaped courtyards are not reported when only their
+    boxes overlap.
     """
     try:
         clearance_violations = []
         min_clearance = min_clearance if min_clearance is not None else 0.2
 
-        modules = list(board.GetFootprints())
-        for i, mod1 in enumerate(modules):
-
-            bbox1 = await get_footprint_courtyard(mod1)
-            expanded_bbox1 = pcbnew.BOX2I(bbox1.GetPosition(), bbox1.GetSize())
-            expanded_bbox1.Inflate(pcbnew.FromMM(min_clearance))
-
-            for mod2 in modules[i+1:]:
-                bbox2 = await get_footprint_courtyard(mod2)
+        courtyard_grid, courtyards = await build_courtyard_index(board)
+        clearance = pcbnew.FromMM(min_clearance)
+        for i, (mod1, bbox1) in enumerate(courtyards):
 
-                if expanded_bbox1.Intersects(bbox2):
-                    ref1 = mod1.GetReference()
-                    ref2 = mod2.GetReference()
-                    
-                    pos1 = mod1.GetPosition()
-                    pos2 = mod2.GetPosition()
-                    
-                    size1 = bbox1.GetSize()
-                    size2 = bbox2.GetSize()
-
-                    violation_info = f"Clearance Issue: {ref1} and {ref2} too close. {ref1}: Size: {pcbnew.ToMM(size1.x):.2f} mm x {pcbnew.ToMM(size1.y):.2f} mm, Position: ({pcbnew.ToMM(pos1.x):.2f} mm, {pcbnew.ToMM(pos1.y):.2f} mm). {ref2}: Size: {pcbnew.ToMM(size2.x):.2f} mm x {pcbnew.ToMM(size2.y):.2f} mm, Position: ({pcbnew.ToMM(pos2.x):.2f} mm, {pcbnew.ToMM(pos2.y):.2f} mm)"
-                    clearance_violations.append(violation_info)
+            for j in sorted(courtyard_grid.query(box_to_tuple(bbox1), clearance)):
+                if j > i:
+                    mod2, bbox2 = courtyards[j]
+                    if await courtyards_too_close(mod1, mod2, clearance):
+                        clearance_violations.append(format_clearance_violation(mod1, bbox1, mod2, bbox2))
         return clearance_violations
     
     except AttributeError as e:
@@ -82,9 +106,168 @@ async def check_board_clearance_violations(board: pcbnew.BOARD, min_clearance: f
         return [f"Error: Failed to check clearance violations - {str(e)}\n"]
 
 
-async def calculate_power_density(board):
+class DesignRuleState:
     """
-    Calculate the power density of the PCB board by calculating the footprint area ratio (footprint area / effective area) and the effective area ratio (effective area / board area).
+    On-board and clearance violations of one loaded board, kept between design rule checks.
+
+    Each check compares the position, orientation and courtyard graphics of every module with the previous check and only recomputes the
+    courtyard, the on-board status and the clearances of the modules that changed, finding their neighbours in a
+    persistent courtyard grid and confirming them on the true courtyard outlines. The cost of a check after a single move no longer grows with the number of modules.
+
+    Args:
+        board (pcbnew.BOARD): The loaded board.
+        clearance (int): Minimum clearance between courtyards in internal units.
+    """
+
+    def __init__(self, board, clearance: int):
+        self.board = board
+        self.clearance = clearance
+        self.board_box = None
+        self.grid = None
+        self.module_states = {}
+        self.courtyards = {}
+        self.order = {}
+        self.onboard = {}
+        self.drawings = {}
+        self.clearances = {}
+        self.pairs = {}
+        self.checked = False
+        self.lock = threading.Lock()
+
+    def violations(self) -> dict:
+        """
+        Returns:
+            dict: {key: message} of all current violations, on-board issues of modules and drawings first, then
+            clearance issues, each in footprint order like a full check.
+        """
+        violations = {}
+        for key in sorted(self.onboard, key=lambda key: self.order[key[1]]):
+            violations[key] = self.onboard[key]
+        violations.update(self.drawings)
+        for key in sorted(self.clearances, key=lambda key: (self.order[key[1]], self.order[key[2]])):
+            violations[key] = self.clearances[key]
+        return violations
+
+    def _drop_module(self, key: str) -> None:
+        if self.grid is not None:
+            self.grid.remove(key)
+        self.courtyards.pop(key, None)
+        self.onboard.pop(('onboard', key), None)
+        for pair in self.pairs.pop(key, set()):
+            self.clearances.pop(pair, None)
+            other = pair[2] if pair[1] == key else pair[1]
+            self.pairs.get(other, set()).discard(pair)
+
+    @traced("design_rule_check")
+    async def check(self) -> dict:
+        """
+        Bring the violations up to date with the board.
+
+        Returns:
+            dict: {'violations': {key: message}, 'previous': {key: message} or None on the first check,
+            'rechecked': number of modules whose courtyard and clearances were recomputed, 'modules': number of modules}.
+        """
+        with self.lock:
+            previous = self.violations() if self.checked else None
+            board = self.board
+
+            board_courtyard = await get_board_courtyard(board)
+            board_box = box_to_tuple(board_courtyard) if board_courtyard is not None else None
+            board_changed = board_box != self.board_box
+            self.board_box = board_box
+
+            modules = {}
+            changed = []
+            for index, module in enumerate(board.GetFootprints()):
+                key = module.m_Uuid.AsString()
+                pos = module.GetPosition()
+                # The signature catches courtyard edits that leave the position alone, like init_module
+                state = (pos.x, pos.y, get_cached_footprint_signature(module))
+                modules[key] = module
+                self.order[key] = index
+                if self.module_states.get(key) != state:
+                    self.module_states[key] = state
+                    changed.append(key)
+
+            for key in [key for key in self.module_states if key not in modules]:
+                self._drop_module(key)
+                del self.module_states[key]
+                del self.order[key]
+
+            for key in changed:
+                self._drop_module(key)
+                courtyard = await get_footprint_courtyard(modules[key])
+                if courtyard is not None:
+                    self.courtyards[key] = courtyard
+
+            if self.grid is None:
+                self.grid = SpatialGrid.from_boxes({key: box_to_tuple(courtyard) for key, courtyard in self.courtyards.items()})
+            else:
+                for key in changed:
+                    if key in self.courtyards:
+                        self.grid.insert(key, box_to_tuple(self.courtyards[key]))
+
+            # Modules off the board, all of them when the board outline changed
+            for key in (self.courtyards if board_changed else changed):
+                if key not in self.courtyards:
+                    continue
+                self.onboard.pop(('onboard', key), None)
+                if board_courtyard is not None and not board_courtyard.Contains(self.courtyards[key]):
+                    self.onboard[('onboard', key)] = format_onboard_module_violation(modules[key], self.courtyards[key])
+
+            # Drawings are few and can be added by any tool, so they are always rechecked
+            self.drawings = {}
+            if board_courtyard is not None:
+                for item in board.GetDrawings():
+                    if is_label_drawing(item):
+                        item_bbox = item.GetBoundingBox()
+                        if not board_courtyard.Contains(item_bbox):
+                            self.drawings[('drawing', item.m_Uuid.AsString())] = format_onboard_drawing_violation(item, item_bbox)
+
+            for key in changed:
+                if key not in self.courtyards:
+                    continue
+                for other in self.grid.query(box_to_tuple(self.courtyards[key]), self.clearance):
+                    if other == key:
+                        continue
+                    first, second = sorted((key, other), key=lambda module_key: self.order[module_key])
+                    pair = ('clearance', first, second)
+                    if pair not in self.clearances and await courtyards_too_close(modules[first], modules[second], self.clearance):
+                        self.clearances[pair] = format_clearance_violation(modules[first], self.courtyards[first], modules[second], self.courtyards[second])
+                        self.pairs.setdefault(first, set()).add(pair)
+                        self.pairs.setdefault(second, set()).add(pair)
+
+            self.checked = True
+            return {'violations': self.violations(), 'previous': previous, 'rechecked': len(changed), 'modules': len(modules)}
+
+
+_design_rule_states = {}
+
+
+def _release_design_rule_state(path: str) -> None:
+    _design_rule_states.pop(path, None)
+
+board_cache.add_release_hook(_release_design_rule_state)
+
+
+def get_design_rule_state(board: pcbnew.BOARD, min_clearance: Optional[float] = None, reset: bool = False) -> DesignRuleState:
+    """
+    Return the persistent design rule state of a board, started over when the board was reloaded, the clearance changed or
+    reset is set.
+    """
+    clearance = pcbnew.FromMM(min_clearance if min_clearance is not None else 0.2)
+    path = get_board_key(board)
+    state = _design_rule_states.get(path)
+    if reset or state is None or state.board is not board or state.clearance != clearance:
+        state = DesignRuleState(board, clearance)
+        _design_rule_states[path] = state
+    return state
+
+
+@traced()
+async def measure_power_density(board) -> dict:
+    """
+    Measure the footprint area, the board area and the power density (footprint area / board area) in mm² and percent.
     """
     footprint_arae = 0.0
     for module in board.GetFootprints():
@@ -98,6 +281,17 @@ async def calculate_power_density(board):
     board_area = board_size_x * board_size_y
 
     power_density = (footprint_arae / board_area) * 100 if board_area > 0 else 0
+
+    return {'footprint_area': footprint_arae, 'board_area': board_area, 'power_density': power_density}
+
+
+async def calculate_power_density(board):
+    """
+    Calculate the power density of the PCB board by calculating the footprint area ratio (footprint area / effective area) and the effective area ratio (effective area / board area).
+    """
+    density = await measure_power_density(board)
+    footprint_arae, board_area, power_density = density['footprint_area'], density['board_area'], density['power_density']
+
     if power_density < 40:
         power_density_info = "Warning: modules are placed too loosely, please adjust the model close to each other!"
     else:
@@ -108,21 +302,24 @@ async def calculate_power_density(board):
     return msg
 
 
-async def check_module_clearance(board: pcbnew.BOARD, mod1: pcbnew.FOOTPRINT, min_clearance: Optional[float] = None) -> list[str]:
-    
-    modules = list(board.GetFootprints())
+async def check_module_clearance(board: pcbnew.BOARD, mod1: pcbnew.FOOTPRINT, min_clearance: Optional[float] = None, courtyard_index=None) -> list[str]:
+    """
+    Find the modules overlapping with the inflated courtyard of mod1. A prebuilt courtyard index can be passed to check several candidate placements of mod1 against the same board.
+    """
+    min_clearance = min_clearance if min_clearance is not None else 0.2
+    if courtyard_index is None:
+        courtyard_index = await build_courtyard_index(board)
+    courtyard_grid, courtyards = courtyard_index
+
     bbox1 = await get_footprint_courtyard(mod1)
-    expanded_bbox1 = pcbnew.BOX2I(bbox1.GetPosition(), bbox1.GetSize())
-    expanded_bbox1.Inflate(pcbnew.FromMM(min_clearance))
+    ref1 = mod1.GetReference()
 
+    clearance = pcbnew.FromMM(min_clearance)
     overlapped_modules = []
-    for mod2 in modules:
-        if mod2.GetReference() == mod1.GetReference():
-            continue
-        bbox2 = await get_footprint_courtyard(mod2)
+    for j in sorted(courtyard_grid.query(box_to_tuple(bbox1), clearance)):
+        mod2 = courtyards[j][0]
         ref2 = mod2.GetReference()
-
-        if expanded_bbox1.Intersects(bbox2):
+        if ref2 != ref1 and await courtyards_too_close(mod1, mod2, clearance):
             overlapped_modules.append(ref2)
 
     return overlapped_modules
@@ -136,40 +333,38 @@ async def check_pad2pad_connection(board: pcbnew.BOARD, mod1: pcbnew.FOOTPRINT)
     segments = []
     module_connections = {}
     
+    connectivity = get_board_connectivity(board)
     for pad in mod1.Pads():
         net_name = pad.GetNetname()
         if net_name != "" and net_name != "GND":
             pad_pos_x, pad_pos_y = pcbnew.ToMM(pad.GetPosition())
-            net = board.FindNet(net_name)
-            net_code = net.GetNetCode()
-            for module_i in board.GetFootprints():
+            net_code = pad.GetNetCode()
+            for module_i, pad_i in connectivity.net_pads.get(net_code, []):
                 if module_i.GetReference() != mod1.GetReference() and module_i.IsLocked() == False:
                     module_i_ref = module_i.GetReference()
 
-                    for pad_i in module_i.Pads():
-                        if pad_i.GetNetCode() == net_code:
-                            module_i_pos_x, module_i_pos_y = pcbnew.ToMM(module_i.GetPosition())
-                            module2module_distance = ((module_pos_x - module_i_pos_x) ** 2 + (module_pos_y - module_i_pos_y) ** 2) ** 0.5
-
-                            if module_i_ref not in module_connections:
-                                module_connections[module_i_ref] = {
-                                    'distance': module2module_distance,
-                                    'connections': []
-                                }
-                            
-                            pad_i_pos_x, pad_i_pos_y = pcbnew.ToMM(pad_i.GetPosition())
-                            pad2pad_distance = ((pad_pos_x - pad_i_pos_x) ** 2 + (pad_pos_y - pad_i_pos_y) ** 2) ** 0.5
-
-                            pad_num = pad.GetNumber()
-                            pad_i_num = pad_i.GetNumber()
-                            
-                            module_connections[module_i_ref]['connections'].append(
-                                f"the pad-to-pad distance between pad {pad_num} of {mod1.GetReference()} and pad {pad_i_num} of {module_i_ref} in net {net_name} is {pad2pad_distance:.2f} mm"
-                            )
-                            if pad2pad_distance > module2module_distance:
-                                alignment.append((pad_num, mod1.GetReference(), pad_i_num, module_i_ref, net_name))
-
-                            segments.append((pad_pos_x, pad_pos_y, pad_i_pos_x, pad_i_pos_y, net_name))
+                    module_i_pos_x, module_i_pos_y = pcbnew.ToMM(module_i.GetPosition())
+                    module2module_distance = ((module_pos_x - module_i_pos_x) ** 2 + (module_pos_y - module_i_pos_y) ** 2) ** 0.5
+
+                    if module_i_ref not in module_connections:
+                        module_connections[module_i_ref] = {
+                            'distance': module2module_distance,
+                            'connections': []
+                        }
+                    
+                    pad_i_pos_x, pad_i_pos_y = pcbnew.ToMM(pad_i.GetPosition())
+                    pad2pad_distance = ((pad_pos_x - pad_i_pos_x) ** 2 + (pad_pos_y - pad_i_pos_y) ** 2) ** 0.5
+
+                    pad_num = pad.GetNumber()
+                    pad_i_num = pad_i.GetNumber()
+                    
+                    module_connections[module_i_ref]['connections'].append(
+                        f"the pad-to-pad distance between pad {pad_num} of {mod1.GetReference()} and pad {pad_i_num} of {module_i_ref} in net {net_name} is {pad2pad_distance:.2f} mm"
+                    )
+                    if pad2pad_distance > module2module_distance:
+                        alignment.append((pad_num, mod1.GetReference(), pad_i_num, module_i_ref, net_name))
+
+                    segments.append((pad_pos_x, pad_pos_y, pad_i_pos_x, pad_i_pos_y, net_name))
     
     for idx, (module_ref, data) in enumerate(module_connections.items(), start=1):
         distance_info += f"Connection {idx}: {mod1.GetReference()} is connected to {module_ref}, "
@@ -181,81 +376,159 @@ async def check_pad2pad_connection(board: pcbnew.BOARD, mod1: pcbnew.FOOTPRINT)
     return alignment, intersect, distance_info
 
 
-async def check_module_status_by_angles(file_path: str, board: pcbnew.BOARD, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, angle: Optional[float] = None, min_clearance: Optional[float] = None) -> str:
+@traced()
+async def check_module_placements(board: pcbnew.BOARD, module_refs: list[str], min_clearance: Optional[float] = None) -> str:
+    """
+    Report the clearance and pad-to-pad connection status of a group of modules that were placed together.
+    """
+    min_clearance = min_clearance if min_clearance is not None else 0.2
 
     msg = ""
-    min_clearance = min_clearance if min_clearance is not None else 0.2
-    
-    mod1 = board.FindFootprintByReference(module_ref)
+    intersections = set()
+    courtyard_index = await build_courtyard_index(board)
+    for module_ref in module_refs:
+        mod1 = board.FindFootprintByReference(module_ref)
 
-    for angle in [0, 90, 180, 270]:
-        mod1.SetOrientationDegrees(angle)
-        
-        overlapped_modules = await check_module_clearance(board, mod1, min_clearance)
+        overlapped_modules = await check_module_clearance(board, mod1, min_clearance, courtyard_index)
         alignment, intersect, distance_info = await check_pad2pad_connection(board, mod1)
+        for seg1_idx, seg2_idx, net1, net2 in intersect:
+            intersections.add(tuple(sorted((net1, net2))))
 
         if overlapped_modules:
-            msg += f"ERROR: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} overlap with {', '.join(overlapped_modules)}.\n"
-        else :
-            if alignment:
-                msg += f"WARNING: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets the clearance requirements, but the possible pad-to-pad misalignments should be checked: "
-                for pad1, mod1_ref, pad2, mod2_ref, net in alignment:
-                    alignment_msgs = [f"the pad {pad1} of {mod1_ref} and pad {pad2} of {mod2_ref} in net {net}" for pad1, mod1_ref, pad2, mod2_ref, net in alignment]
-                msg += ', '.join(alignment_msgs) + ". "
-                msg += distance_info + "\n"
-                continue
-            if intersect:
-                msg += f"WARNING: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets the clearance requirements, but there are pin-to-pin connections intersections: "
-                for seg1_idx, seg2_idx, net1, net2 in intersect:
-                    intersection_msg = f"the net {net1} and net {net2}"
-                    msg += ', '.join([intersection_msg]) + ". "
-                    msg += distance_info + "\n"
-                continue
-            else:
-                msg += f"INFO: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets all clearance requirements, and there is no pin-to-pin misalignment or intersection. {distance_info}\n"
-
+            msg += f"ERROR: {module_ref} overlaps with {', '.join(overlapped_modules)}.\n"
+        elif alignment:
+            alignment_msgs = [f"the pad {pad1} of {mod1_ref} and pad {pad2} of {mod2_ref} in net {net}" for pad1, mod1_ref, pad2, mod2_ref, net in alignment]
+            msg += f"WARNING: {module_ref} meets the clearance requirements, but the possible pad-to-pad misalignments should be checked: {', '.join(alignment_msgs)}. {distance_info}\n"
+        else:
+            msg += f"INFO: {module_ref} meets all clearance requirements, and there is no pin-to-pin misalignment. {distance_info}\n"
 
-    for seg1_idx, seg2_idx, net1, net2 in intersect:
-        msg += f"Warning: There are pin-to-pin connections intersecting for net {net1} and net {net2} in module {module_ref}, please consider adjusting the position or angle of the module\n"
+    for net1, net2 in sorted(intersections):
+        msg += f"Warning: There are pin-to-pin connections intersecting for net {net1} and net {net2}, please consider adjusting the position or angle of the modules\n"
 
     return msg
 
 
-async def check_module_status_by_positions(file_path: str, board: pcbnew.BOARD, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, angle: Optional[float] = None, min_clearance: Optional[float] = None) -> str:
+@traced()
+async def check_module_status_by_angles(file_path: str, board: pcbnew.BOARD, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, angle: Optional[float] = None, min_clearance: Optional[float] = None, angles: Optional[list[float]] = None) -> str:
 
     msg = ""
     min_clearance = min_clearance if min_clearance is not None else 0.2
+    angles = angles if angles is not None else [0, 90, 180, 270]
     
     mod1 = board.FindFootprintByReference(module_ref)
+    pos = mod1.GetPosition()
+    current_angle = mod1.GetOrientationDegrees()
 
-    for angle in [0, 90, 180, 270]:
-        mod1.SetOrientationDegrees(angle)
-        
-        overlapped_modules = await check_module_clearance(board, mod1, min_clearance)
-        alignment, intersect, distance_info = await check_pad2pad_connection(board, mod1)
+    # Evaluate every angle plus the current one in one batch, without rotating the module on the board
+    evaluator = await PlacementEvaluator.from_board(board, mod1)
+    result = evaluator.evaluate(pos.x, pos.y, list(angles) + [current_angle], min_clearance)
+
+    for k, angle in enumerate(angles):
+        overlapped_modules = evaluator.get_overlapped_refs(result, k)
+        alignment = evaluator.get_alignment(result, k)
+        intersect = evaluator.get_intersections(result, k)
+        distance_info = evaluator.get_distance_info(result, k)
 
         if overlapped_modules:
-            msg += f"ERROR: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} overlap with {', '.join(overlapped_modules)}.\n"
+            msg += f"ERROR: when the angle of {module_ref} is {angle:g} degrees, {module_ref} overlap with {', '.join(overlapped_modules)}.\n"
         else :
             if alignment:
-                msg += f"WARNING: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets the clearance requirements, but the possible pad-to-pad misalignments should be checked: "
-                for pad1, mod1_ref, pad2, mod2_ref, net in alignment:
-                    alignment_msgs = [f"the pad {pad1} of {mod1_ref} and pad {pad2} of {mod2_ref} in net {net}" for pad1, mod1_ref, pad2, mod2_ref, net in alignment]
+                msg += f"WARNING: when the angle of {module_ref} is {angle:g} degrees, {module_ref} meets the clearance requirements, but the possible pad-to-pad misalignments should be checked: "
+                alignment_msgs = [f"the pad {pad1} of {mod1_ref} and pad {pad2} of {mod2_ref} in net {net}" for pad1, mod1_ref, pad2, mod2_ref, net in alignment]
                 msg += ', '.join(alignment_msgs) + ". "
                 msg += distance_info + "\n"
                 continue
             if intersect:
-                msg += f"WARNING: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets the clearance requirements, but there are pin-to-pin connections intersections: "
+                msg += f"WARNING: when the angle of {module_ref} is {angle:g} degrees, {module_ref} meets the clearance requirements, but there are pin-to-pin connections intersections: "
                 for seg1_idx, seg2_idx, net1, net2 in intersect:
                     intersection_msg = f"the net {net1} and net {net2}"
                     msg += ', '.join([intersection_msg]) + ". "
                     msg += distance_info + "\n"
                 continue
             else:
-                msg += f"INFO: when the angle of {module_ref} is {angle} degrees, {mod1.GetReference()} meets all clearance requirements, and there is no pin-to-pin misalignment or intersection. {distance_info}\n"
-
+                msg += f"INFO: when the angle of {module_ref} is {angle:g} degrees, {module_ref} meets all clearance requirements, and there is no pin-to-pin misalignment or intersection. {distance_info}\n"
 
-    for seg1_idx, seg2_idx, net1, net2 in intersect:
+    for seg1_idx, seg2_idx, net1, net2 in evaluator.get_intersections(result, len(angles)):
         msg += f"Warning: There are pin-to-pin connections intersecting for net {net1} and net {net2} in module {module_ref}, please consider adjusting the position or angle of the module\n"
 
+    return msg
+
+
+@traced()
+async def check_module_status_by_positions(file_path: str, board: pcbnew.BOARD, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None, angle: Optional[float] = None, min_clearance: Optional[float] = None,
+                                           search_radius: Optional[float] = None, step: Optional[float] = None, angles: Optional[list[float]] = None, top_k: Optional[int] = None) -> str:
+    """
+    Search a square grid of candidate positions around a center for the best placement of a module, without moving it.
+
+    The (x, y, angle) candidates are evaluated in batches and scored on clearance violations, staying inside the board edge,
+    ratsnest crossings, pad-to-pad misalignments and ratsnest length. The top_k candidates are reported, best first. Searches
+    of more candidates than the PLACEMENT_SEARCH setting in pcb_const.json allows are refused.
+
+    Args:
+        pos_x (Optional[float]): Horizontal center of the search in mm. If None, uses the current position.
+        pos_y (Optional[float]): Vertical center of the search in mm. If None, uses the current position.
+        angle (Optional[float]): Only evaluate this angle in degrees. If None, evaluates angles.
+        search_radius (Optional[float]): Half width of the searched square in mm. If None, uses 5 mm.
+        step (Optional[float]): Grid step in mm. If None, uses 1 mm.
+        angles (Optional[list[float]]): Angles in degrees to evaluate at each position. If None, uses 0, 90, 180 and 270.
+        top_k (Optional[int]): Number of candidates to report. If None, reports 5.
+    """
+
+    msg = ""
+    min_clearance = min_clearance if min_clearance is not None else 0.2
+    search_radius = search_radius if search_radius is not None else 5.0
+    step = step if step is not None else 1.0
+    top_k = top_k if top_k is not None else 5
+    if angle is not None:
+        angles = [angle]
+    angles = angles if angles is not None else [0, 90, 180, 270]
+
+    if step <= 0 or search_radius < 0:
+        return "Error: step must be positive and search_radius must not be negative.\n"
+
+    mod1 = board.FindFootprintByReference(module_ref)
+    if not mod1:
+        return f"Error: Module {module_ref} not found.\n"
+    pos = mod1.GetPosition()
+    center_x = pcbnew.FromMM(pos_x) if pos_x is not None else pos.x
+    center_y = pcbnew.FromMM(pos_y) if pos_y is not None else pos.y
+
+    config = load_const_section('PLACEMENT_SEARCH', PLACEMENT_SEARCH_DEFAULTS)
+    steps = int(search_radius / step)
+    candidate_count = (2 * steps + 1) ** 2 * len(angles)
+    if candidate_count > config['max_candidates']:
+        return (f"Error: The search would evaluate {candidate_count} candidate placements, more than the limit of {config['max_candidates']}. "
+                f"Increase step, or reduce search_radius or the number of angles.\n")
+
+    offsets = np.arange(-steps, steps + 1) * pcbnew.FromMM(step)
+    grid_x, grid_y, grid_angle = np.meshgrid(center_x + offsets, center_y + offsets, np.asarray(angles, dtype=float), indexing='ij')
+    xs, ys, candidate_angles = grid_x.ravel(), grid_y.ravel(), grid_angle.ravel()
+
+    evaluator = await PlacementEvaluator.from_board(board, mod1)
+    # Prefer candidates closer to the center when scores tie
+    best = best_placements(evaluator, xs, ys, candidate_angles, (center_x, center_y), top_k, min_clearance, config['chunk_size'])
+    xs, ys, candidate_angles = xs[best], ys[best], candidate_angles[best]
+    result = evaluator.evaluate(xs, ys, candidate_angles, min_clearance)
+    scores = score_placements(result)
+
+    msg += f"INFO: Evaluated {candidate_count} candidate placements of {module_ref} within {search_radius:g} mm of ({pcbnew.ToMM(center_x):.2f} mm, {pcbnew.ToMM(center_y):.2f} mm), best {len(best)} listed first.\n"
+    for k in range(len(best)):
+        overlapped_modules = evaluator.get_overlapped_refs(result, k)
+        alignment = evaluator.get_alignment(result, k)
+        intersect = evaluator.get_intersections(result, k)
+
+        msg += f"Candidate {k + 1}: position ({pcbnew.ToMM(xs[k]):.2f} mm, {pcbnew.ToMM(ys[k]):.2f} mm), angle {candidate_angles[k]:g} degrees, score {scores[k]:.2f}, ratsnest length {result['ratsnest_length'][k]:.2f} mm. "
+        if overlapped_modules:
+            msg += f"ERROR: {module_ref} overlap with {', '.join(overlapped_modules)}. "
+        if not result['on_board'][k]:
+            msg += f"ERROR: {module_ref} is outside the board edge. "
+        if alignment:
+            alignment_msgs = [f"the pad {pad1} of {mod1_ref} and pad {pad2} of {mod2_ref} in net {net}" for pad1, mod1_ref, pad2, mod2_ref, net in alignment]
+            msg += f"WARNING: possible pad-to-pad misalignments: {', '.join(alignment_msgs)}. "
+        if intersect:
+            msg += f"WARNING: pin-to-pin connections intersect for {', '.join(f'net {net1} and net {net2}' for _, _, net1, net2 in intersect)}. "
+        if not (overlapped_modules or alignment or intersect) and result['on_board'][k]:
+            msg += f"INFO: meets all clearance requirements, and there is no pin-to-pin misalignment or intersection. "
+        msg += "\n"
+
     return msg
\ No newline at end of file
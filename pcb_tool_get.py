@@ -1,93 +1,44 @@
+from __future__ import annotations
+
 import os
 import re
-import requests
-import pcbnew
-import xml.etree.ElementTree as ET
+import json
 
 from logging import root
 from typing import Optional
-from bs4 import BeautifulSoup
-from pcb_utility import *
+from fnmatch import fnmatchcase
 from pcb_utility import *
+from pcb_session import *
+from pcb_connectivity import *
+from pcb_datasheet import *
+from pcb_snapshot import *
+from pcb_lazy import lazy_import
+from pcb_trace import span, traced
 
 
-async def spider_datasheet_info(url: str):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        infos = []
-        links = soup.find_all('a', attrs={
-            'class': 'no-children',
-            'data-navtitle': re.compile(r'(description|pin|layout guidelines)', re.IGNORECASE)
-        })
-        
-        for link in links:
-            href = link.get('href', '')
-            section_title = link.get('data-navtitle', '')
-
-            full_url = url if not href.startswith('http') else href
-            if not href.startswith('http'):
-                full_url = f"https:{href}" if href.startswith('/') else f"{url.rstrip('/')}/{href}"
-
-            detail_response = requests.get(full_url, headers=headers, timeout=10)
-            detail_response.raise_for_status()
-            detail_soup = BeautifulSoup(detail_response.text, 'html.parser')
-            content_div = detail_soup.find('div', {'class': 'subsection'})
-
-            if content_div:
-                all_subsections = detail_soup.find_all('div', {'class': 'subsection'})
-                target_div = None
-                
-                for subsection in all_subsections:
-                    header = subsection.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-                    
-                    if header and section_title.lower() in header.get_text().lower():
-                        target_div = subsection
-                        break
-                
-                if target_div:
-                    paragraphs_data = []
-                    lists_data = []
-                    tables_data = []
-                    for p in target_div.find_all('p'):
-                        text_info = p.get_text(separator=' ', strip=True)
-                        text_info = re.sub(r'\s+', ' ', text_info)
-                        text_info = text_info.strip()
-                        if text_info:
-                            paragraphs_data.append(text_info)
-                    for li in target_div.find_all('li'):
-                        text_info = li.get_text(separator=' ', strip=True)
-                        text_info = re.sub(r'\s+', ' ', text_info)
-                        text_info = text_info.strip()
-                        if text_info:
-                            lists_data.append(text_info)
-                    for table in content_div.find_all('table'):
-                        table_info = await extract_table(table)
-                        if table_info:
-                            tables_data.append(table_info)
-                    info = {
-                        'section': section_title,
-                        'paragraphs': paragraphs_data,
-                        'lists': lists_data,
-                        'tables': tables_data
-                    }
-                    infos.append(info)
-
-        return infos
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+ET = lazy_import('xml.etree.ElementTree')
 
-    except Exception as e:
-        print(f"Error reading page: {str(e)}")
-        import traceback
-        traceback.print_exc()
+
+@traced()
+async def get_ic_modules(file_path: str) -> Optional[list[tuple]]:
+    """
+    List the (reference, IC module) of all modules with a reference starting with 'U', or None if the board cannot be loaded.
+    """
+    board = load_board_readonly(file_path)
+    if not board:
         return None
 
+    ic_refs = []
+    for module in board.GetFootprints():
+        ref = module.GetReference()
+        if ref.startswith('U'):
+            value = module.GetValue()
+            ic_refs.append((ref, re.sub(r'[A-Za-z]+$', '', value)))
+    return ic_refs
 
+
+@traced()
 async def ana_board_env(board: pcbnew.BOARD) -> str:
     try:
         board_courtyard = await get_board_courtyard(board)
@@ -116,6 +67,7 @@ Module Bounding Box - Center: ({center_x:.2f} mm, {center_y:.2f} mm), Size: {wid
         return f"Error: Failed to get board info - {str(e)}"
 
 
+@traced()
 async def ana_module_env(board: pcbnew.BOARD) -> str:
     try:
         module_info = []
@@ -153,24 +105,23 @@ async def ana_module_env(board: pcbnew.BOARD) -> str:
         return [f"Error: Failed to get module info - {str(e)}\n"]
 
 
+@traced()
 async def ana_net_env(board) -> str:
     try:
         net_info = []
-        for net in board.GetNetsByName().values():
-            net_code_i = net.GetNetCode()
-            if net_code_i != 0:
-                net_name_i = net.GetNetname()
-                connected_pads = []
-                for module in board.GetFootprints():
-                    for pad in module.Pads():
-                        if pad.GetNetCode() == net_code_i:
-                            module_ref = module.GetReference()
-                            pad_num = pad.GetNumber()
-                            connected_pads.append(f"{module_ref}.{pad_num}")
-            
-                pads_str = ", ".join(connected_pads) if connected_pads else "No pads"
-                net_info_i = f"Net - Code: {net_code_i}, Name: {net_name_i}, Connected Pads: {pads_str}\n"
-                net_info.append((net_code_i, net_info_i))
+        connectivity = get_board_connectivity(board)
+        routing_status = connectivity.get_routing_status()
+        for net_code_i, net_name_i in connectivity.net_names.items():
+            connected_pads = []
+            for module, pad in connectivity.net_pads.get(net_code_i, []):
+                module_ref = module.GetReference()
+                pad_num = pad.GetNumber()
+                connected_pads.append(f"{module_ref}.{pad_num}")
+        
+            pads_str = ", ".join(connected_pads) if connected_pads else "No pads"
+            routed_i, total_i = routing_status.get(net_code_i, (0, 0))
+            net_info_i = f"Net - Code: {net_code_i}, Name: {net_name_i}, Connected Pads: {pads_str}, Routed Connections: {routed_i}/{total_i}\n"
+            net_info.append((net_code_i, net_info_i))
 
         if not net_info:
             return ["Net Information:\nNo valid net found\n"]
@@ -186,11 +137,12 @@ async def ana_net_env(board) -> str:
         return [f"Error: Failed to get net info - {str(e)}\n"]
 
 
+@traced()
 async def ana_track_env(board: pcbnew.BOARD) -> str:
     try:
         track_info = []
         for track in board.GetTracks():
-            if isinstance(track, pcbnew.PCB_TRACK) and not isinstance(track, pcbnew.PCB_VIA):
+            if track.GetClass() != "PCB_VIA":
                 if track.GetNetname() == "":
                     net_i = "None"
                 else:
@@ -216,11 +168,12 @@ async def ana_track_env(board: pcbnew.BOARD) -> str:
         return [f"Error: Failed to get track info - {str(e)}\n"]
 
 
+@traced()
 async def ana_via_env(board: pcbnew.BOARD) -> str:
     try:
         via_info = []
         for via in board.GetTracks():
-            if isinstance(via, pcbnew.PCB_VIA):
+            if via.GetClass() == "PCB_VIA":
                 net_i = via.GetNetname()
                 pos_x_i, pos_y_i = pcbnew.ToMM(via.GetPosition().x), pcbnew.ToMM(via.GetPosition().y)
                 diameter_i = pcbnew.ToMM(via.GetWidth(pcbnew.F_Cu))
@@ -242,9 +195,205 @@ async def ana_via_env(board: pcbnew.BOARD) -> str:
         return [f"Error: Failed to get via info - {str(e)}\n"]
 
 
+PCB_ENV_SECTIONS = ['board', 'modules', 'nets', 'tracks', 'vias']
+
+PCB_ENV_COLUMNS = {
+    'modules': ['ref', 'footprint', 'x', 'y', 'angle', 'width', 'height', 'pads'],
+    'nets': ['code', 'name', 'pads', 'routed', 'total'],
+    'tracks': ['net', 'start_x', 'start_y', 'end_x', 'end_y', 'width', 'layer'],
+    'vias': ['net', 'x', 'y', 'diameter', 'drill'],
+}
+
+
+def match_patterns(name: str, patterns) -> bool:
+    return patterns is None or any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+@traced()
+async def collect_pcb_env(board: pcbnew.BOARD, sections: Optional[list[str]] = None, nets: Optional[list[str]] = None,
+                          refs: Optional[list[str]] = None, precision: int = 2) -> dict:
+    """
+    Collect the board environment as columnar tables in a single pass over footprints and a single pass over tracks.
+
+    Args:
+        sections (Optional[list[str]]): Sections out of PCB_ENV_SECTIONS to collect. If None, collects all.
+        nets (Optional[list[str]]): Net names or glob patterns. Nets, tracks, vias and listed pads are restricted to them, and
+            modules without a pad on them are left out.
+        refs (Optional[list[str]]): Module references or glob patterns. Modules and listed pads are restricted to them.
+        precision (int): Decimal places of lengths in mm and angles in degrees.
+
+    Returns:
+        dict: {'units': ..., 'board': {...}, section: {'columns': [...], 'rows': [[...], ...]}} for the requested sections.
+    """
+    sections = [section for section in PCB_ENV_SECTIONS if sections is None or section in sections]
+
+    def mm(value):
+        return round(pcbnew.ToMM(value), precision)
+
+    env = {'units': 'mm'}
+
+    if 'board' in sections:
+        board_courtyard = await get_board_courtyard(board)
+        bounding_box = board.ComputeBoundingBox()
+        env['board'] = {
+            'courtyard': None if not board_courtyard else {
+                'center': [mm(board_courtyard.GetCenter().x), mm(board_courtyard.GetCenter().y)],
+                'size': [mm(board_courtyard.GetWidth()), mm(board_courtyard.GetHeight())]
+            },
+            'bounding_box': {
+                'center': [mm(bounding_box.GetCenter().x), mm(bounding_box.GetCenter().y)],
+                'size': [mm(bounding_box.GetWidth()), mm(bounding_box.GetHeight())]
+            }
+        }
+
+    modules = []
+    net_pads = {}
+    if 'modules' in sections or 'nets' in sections:
+        for module in board.GetFootprints():
+            module_ref = module.GetReference()
+            ref_match = match_patterns(module_ref, refs)
+
+            pads = []
+            for pad in module.Pads():
+                net_name = pad.GetNetname()
+                if net_name == "" or not match_patterns(net_name, nets):
+                    continue
+                net_pads.setdefault(net_name, []).append(f"{module_ref}.{pad.GetNumber()}")
+                if ref_match:
+                    pads.append([pad.GetNumber(), net_name])
+
+            if 'modules' in sections and ref_match and (nets is None or pads):
+                pos = module.GetPosition()
+                width, height = await get_footprint_size(module)
+                modules.append([module_ref, str(module.GetFPID().GetLibItemName()), mm(pos.x), mm(pos.y),
+                                round(module.GetOrientationDegrees(), precision),
+                                None if width is None else round(width, precision),
+                                None if height is None else round(height, precision), pads])
+        modules.sort(key=lambda row: row[0])
+
+    if 'modules' in sections:
+        env['modules'] = {'columns': PCB_ENV_COLUMNS['modules'], 'rows': modules}
+
+    if 'nets' in sections:
+        connectivity = get_board_connectivity(board)
+        routing_status = connectivity.get_routing_status()
+        rows = []
+        for net_code, net_name in sorted(connectivity.net_names.items()):
+            if not match_patterns(net_name, nets):
+                continue
+            routed, total = routing_status.get(net_code, (0, 0))
+            rows.append([net_code, net_name, net_pads.get(net_name, []), routed, total])
+        env['nets'] = {'columns': PCB_ENV_COLUMNS['nets'], 'rows': rows}
+
+    if 'tracks' in sections or 'vias' in sections:
+        tracks = []
+        vias = []
+        for item in board.GetTracks():
+            net_name = item.GetNetname()
+            if not match_patterns(net_name, nets):
+                continue
+            if item.GetClass() == "PCB_VIA":
+                pos = item.GetPosition()
+                vias.append([net_name, mm(pos.x), mm(pos.y), mm(item.GetWidth(pcbnew.F_Cu)), mm(item.GetDrillValue())])
+            else:
+                start, end = item.GetStart(), item.GetEnd()
+                tracks.append([net_name or "None", mm(start.x), mm(start.y), mm(end.x), mm(end.y), mm(item.GetWidth()), item.GetLayerName()])
+        if 'tracks' in sections:
+            env['tracks'] = {'columns': PCB_ENV_COLUMNS['tracks'], 'rows': sorted(tracks, key=lambda row: row[0])}
+        if 'vias' in sections:
+            env['vias'] = {'columns': PCB_ENV_COLUMNS['vias'], 'rows': sorted(vias, key=lambda row: row[0])}
+
+    return env
+
+
+def format_pcb_env(env: dict, format: str) -> str:
+    """
+    Render a collected environment as compact JSON, or as tab-separated tables with one header line per section.
+    """
+    if format == "json":
+        return json.dumps(env, separators=(',', ':'))
+
+    def cell(value):
+        if isinstance(value, list):
+            return " ".join(":".join(str(v) for v in item) if isinstance(item, list) else str(item) for item in value)
+        return "" if value is None else str(value)
+
+    lines = [f"{key}\t{env[key]}" for key in ('units', 'token', 'since', 'unchanged', 'since_error') if key in env]
+    if 'board' in env:
+        courtyard = env['board']['courtyard']
+        bounding_box = env['board']['bounding_box']
+        lines.append("# board\ncenter_x\tcenter_y\twidth\theight\tkind")
+        if courtyard:
+            lines.append("\t".join(cell(v) for v in courtyard['center'] + courtyard['size'] + ['courtyard']))
+        lines.append("\t".join(cell(v) for v in bounding_box['center'] + bounding_box['size'] + ['bounding_box']))
+    for section in PCB_ENV_SECTIONS[1:]:
+        if section in env:
+            lines.append(f"# {section}")
+            lines.append("\t".join(env[section]['columns']))
+            lines.extend("\t".join(cell(value) for value in row) for row in env[section]['rows'])
+            if env[section].get('removed'):
+                lines.append(f"# {section} removed")
+                lines.extend("\t".join(cell(value) for value in row) if isinstance(row, list) else row for row in env[section]['removed'])
+    return "\n".join(lines) + "\n"
+
+
+@traced()
+async def reuse_pcb_env_snapshot(board: pcbnew.BOARD, params: dict, since: Optional[str], revision: list) -> Optional[dict]:
+    """
+    Answer a call with an earlier token without collecting the environment, if the board revision is still the one the
+    token was taken at.
+
+    Returns:
+        Optional[dict]: The unchanged result, or None if the environment has to be collected.
+    """
+    if since is None:
+        return None
+    store = get_snapshot_store()
+    old_snapshot = store.load(since)
+    if old_snapshot is None or old_snapshot['board'] != get_board_key(board) or old_snapshot['params'] != params:
+        return None
+    if old_snapshot.get('revision') != revision:
+        return None
+    store.touch(since)
+    return {'units': 'mm', 'since': since, 'unchanged': True, 'token': since}
+
+
+@traced()
+async def snapshot_pcb_env(board: pcbnew.BOARD, env: dict, params: dict, since: Optional[str] = None, revision: Optional[list] = None) -> dict:
+    """
+    Attach a snapshot token to a collected environment, and reduce it to the changes since an earlier token.
+
+    Args:
+        params (dict): The sections, filters and precision env was collected with, a token only matches the same params.
+        since (Optional[str]): Token of an earlier call. If None or unknown, the full environment is returned.
+        revision (Optional[list]): Board revision env was collected at, see get_board_revision.
+    """
+    board_key = get_board_key(board)
+    index = index_pcb_env(env)
+    token = get_snapshot_token(board_key, params, index)
+    store = get_snapshot_store()
+    old_snapshot = store.load(since) if since is not None else None
+    # The same content at a new revision keeps its token, record the revision so the next call can skip collecting
+    store.save(token, {'board': board_key, 'params': params, 'revision': revision, 'index': index},
+               replace=token == since and old_snapshot is not None and old_snapshot.get('revision') != revision)
+
+    result = env
+    if since is not None:
+        if old_snapshot is None or old_snapshot['board'] != board_key or old_snapshot['params'] != params:
+            env['since_error'] = "Unknown or expired token, or different sections, filters or precision, the full environment is returned"
+        else:
+            result = diff_pcb_env(env, index, old_snapshot['index'])
+            result['since'] = since
+            result['unchanged'] = token == since
+
+    result['token'] = token
+    return result
+
+
+@traced()
 async def export_pcb_image(file_path: str) -> str:
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         bounding_box = board.ComputeBoundingBox()
 
         bbox_x = pcbnew.ToMM(bounding_box.GetX())
@@ -255,28 +404,29 @@ async def export_pcb_image(file_path: str) -> str:
         base_name = file_path.rsplit('.', 1)[0] + '.svg'
         output_dir = os.path.dirname(base_name)
 
-        plot_controller = pcbnew.PLOT_CONTROLLER(board)
-        plot_options = plot_controller.GetPlotOptions()
-        plot_options.SetOutputDirectory(output_dir)
-        plot_options.SetPlotFrameRef(False)
-        plot_options.SetPlotValue(True)
-        plot_options.SetPlotReference(True)
-        plot_options.SetPlotMode(True)
-        plot_options.SetColorSettings(pcbnew.GetSettingsManager().GetColorSettings("KiCad Default"))
-
-        layers_to_plot = [pcbnew.F_Cu, pcbnew.F_SilkS, pcbnew.F_Mask, pcbnew.Edge_Cuts]
-        plot_controller.OpenPlotfile("", pcbnew.PLOT_FORMAT_SVG, "")
+        with span("plot_svg"):
+            plot_controller = pcbnew.PLOT_CONTROLLER(board)
+            plot_options = plot_controller.GetPlotOptions()
+            plot_options.SetOutputDirectory(output_dir)
+            plot_options.SetPlotFrameRef(False)
+            plot_options.SetPlotValue(True)
+            plot_options.SetPlotReference(True)
+            plot_options.SetPlotMode(True)
+            plot_options.SetColorSettings(pcbnew.GetSettingsManager().GetColorSettings("KiCad Default"))
+
+            layers_to_plot = [pcbnew.F_Cu, pcbnew.F_SilkS, pcbnew.F_Mask, pcbnew.Edge_Cuts]
+            plot_controller.OpenPlotfile("", pcbnew.PLOT_FORMAT_SVG, "")
         
-        for layer in layers_to_plot:
-            try:
-                plot_controller.SetLayer(layer)
-                plot_controller.SetColorMode(True)
-                plot_controller.PlotLayer()
-            except Exception as e:
-                print(f"Warning: Error plotting layer {layer}: {str(e)}")
-                continue
+            for layer in layers_to_plot:
+                try:
+                    plot_controller.SetLayer(layer)
+                    plot_controller.SetColorMode(True)
+                    plot_controller.PlotLayer()
+                except Exception as e:
+                    print(f"Warning: Error plotting layer {layer}: {str(e)}")
+                    continue
         
-        plot_controller.ClosePlot()
+            plot_controller.ClosePlot()
 
         tree = ET.parse(base_name)
         root = tree.getroot()
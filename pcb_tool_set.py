@@ -1,13 +1,21 @@
-import pcbnew
+from __future__ import annotations
+
 import json
 
 from typing import Optional
 from pcb_utility import *
+from pcb_session import *
+from pcb_lazy import lazy_import
+from pcb_trace import span, traced
+
 
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
 
+
+@traced()
 async def init_module(file_path: str) -> str:
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         if not board:
             return f"Error: Could not load board from {file_path}"
         
@@ -34,31 +42,40 @@ async def init_module(file_path: str) -> str:
 
             module.SetLocked(True)
 
-        board.Save(file_path)
+        invalidate_footprint_geometry(board=board)
+        save_board(file_path, board)
         return "SUCCESSfully initialized modules to center courtyard at origin."
 
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to initialize new PCB board - {str(e)}"
 
 
+@traced()
 async def set_module_position(file_path: str, board: pcbnew.BOARD, module_ref: str, pos_x: Optional[float] = None, pos_y: Optional[float] = None) -> str:
     try:
         module = board.FindFootprintByReference(module_ref)
-        module.SetLocked(False)
 
         if not module:
             print(f"Error: Could not find module with reference {module_ref}")
             return "Error: Could not find module"
+
+        changed = module.IsLocked()
+        module.SetLocked(False)
         
-        current_pos_x = pcbnew.ToMM(module.GetPosition())[0]
-        current_pos_y = pcbnew.ToMM(module.GetPosition())[1]
+        current_pos = module.GetPosition()
+        current_pos_x = pcbnew.ToMM(current_pos)[0]
+        current_pos_y = pcbnew.ToMM(current_pos)[1]
 
         if pos_x is None:
             pos_x = current_pos_x
         if pos_y is None:
             pos_y = current_pos_y
 
-        module.SetPosition(pcbnew.VECTOR2I(pcbnew.FromMM(pos_x), pcbnew.FromMM(pos_y)))
+        new_pos = pcbnew.VECTOR2I(pcbnew.FromMM(pos_x), pcbnew.FromMM(pos_y))
+        changed = changed or new_pos.x != current_pos.x or new_pos.y != current_pos.y
+        module.SetPosition(new_pos)
+        invalidate_footprint_geometry(module)
 
         pos_x = pcbnew.ToMM(module.GetPosition())[0]
         pos_y = pcbnew.ToMM(module.GetPosition())[1]
@@ -77,7 +94,7 @@ async def set_module_position(file_path: str, board: pcbnew.BOARD, module_ref: s
                 pad_pos_y_list.append(pad_pos_y)    
                 pad_net_list.append(net)
 
-        board.Save(file_path)
+        save_board(file_path, board, changed)
         msg = f"SUCCESS: The new position of {module_ref} is set to ({pos_x:.2f} mm, {pos_y:.2f} mm). "
         for num, px, py, net in zip(pad_num_list, pad_pos_x_list, pad_pos_y_list, pad_net_list):
             msg += f"Pad {num} for net {net} is at ({px:.2f} mm, {py:.2f} mm); "
@@ -85,18 +102,23 @@ async def set_module_position(file_path: str, board: pcbnew.BOARD, module_ref: s
         return msg
 
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board or module object - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to set module position - {str(e)}"
     
+@traced()
 async def set_module_angle(file_path: str, board: pcbnew.BOARD, module_ref: str, angle: Optional[float] = None) -> str:
     try:
         module = board.FindFootprintByReference(module_ref)
-        module.SetLocked(False)
 
         if not module:
             print(f"Error: Could not find module with reference {module_ref}")
             return "Error: Could not find module"
+
+        changed = module.IsLocked()
+        module.SetLocked(False)
         
         current_angle = module.GetOrientationDegrees()
 
@@ -104,19 +126,77 @@ async def set_module_angle(file_path: str, board: pcbnew.BOARD, module_ref: str,
             angle = current_angle
 
         module.SetOrientationDegrees(angle)
+        invalidate_footprint_geometry(module)
 
         angle_degrees = module.GetOrientationDegrees()
+        changed = changed or angle_degrees != current_angle
 
-        board.Save(file_path)
+        save_board(file_path, board, changed)
         msg = f"SUCCESS: The new angle of {module_ref} is set to {angle_degrees} degrees.\n"
         return msg
 
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board or module object - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to set module angle - {str(e)}"
     
 
+@traced()
+async def set_module_placements(file_path: str, board: pcbnew.BOARD, module_refs: list[str], pos_x: Optional[list[Optional[float]]] = None,
+                                pos_y: Optional[list[Optional[float]]] = None, angle: Optional[list[Optional[float]]] = None) -> str:
+    """
+    Move and rotate several modules and save the board once.
+    """
+    try:
+        count = len(module_refs)
+        for name, values in (("pos_x", pos_x), ("pos_y", pos_y), ("angle", angle)):
+            if values is not None and len(values) != count:
+                return f"Error: {name} has {len(values)} entries but {count} module references were given"
+
+        modules = []
+        for module_ref in module_refs:
+            module = board.FindFootprintByReference(module_ref)
+            if not module:
+                print(f"Error: Could not find module with reference {module_ref}")
+                return f"Error: Could not find module {module_ref}"
+            modules.append(module)
+
+        changed = False
+        msg = "SUCCESS: The new placements are set. "
+        for i, (module_ref, module) in enumerate(zip(module_refs, modules)):
+            changed = changed or module.IsLocked()
+            module.SetLocked(False)
+
+            current_pos = module.GetPosition()
+            current_angle = module.GetOrientationDegrees()
+            new_pos_x = pos_x[i] if pos_x is not None and pos_x[i] is not None else pcbnew.ToMM(current_pos.x)
+            new_pos_y = pos_y[i] if pos_y is not None and pos_y[i] is not None else pcbnew.ToMM(current_pos.y)
+            new_angle = angle[i] if angle is not None and angle[i] is not None else current_angle
+
+            new_pos = pcbnew.VECTOR2I(pcbnew.FromMM(new_pos_x), pcbnew.FromMM(new_pos_y))
+            module.SetPosition(new_pos)
+            module.SetOrientationDegrees(new_angle)
+            invalidate_footprint_geometry(module)
+
+            angle_degrees = module.GetOrientationDegrees()
+            changed = changed or new_pos.x != current_pos.x or new_pos.y != current_pos.y or angle_degrees != current_angle
+            msg += f"{module_ref}: ({new_pos_x:.2f} mm, {new_pos_y:.2f} mm), {angle_degrees} degrees; "
+
+        save_board(file_path, board, changed)
+        msg += "\n"
+        return msg
+
+    except AttributeError as e:
+        invalidate_board(file_path)
+        return f"Error: Invalid board or module object - {str(e)}"
+    except Exception as e:
+        invalidate_board(file_path)
+        return f"Error: Failed to set module placements - {str(e)}"
+
+
+@traced()
 async def set_net_track(file_path: str, board: pcbnew.BOARD, net_name: str,
                         start_x: list[float], start_y: list[float], end_x: list[float], end_y: list[float], width: list[float]) -> str:
     """
@@ -141,22 +221,25 @@ async def set_net_track(file_path: str, board: pcbnew.BOARD, net_name: str,
             board.Add(new_track)
 
         pcbnew.Refresh()
-        board.Save(file_path)
+        save_board(file_path, board)
         msg = f"SUCCESS: Creating tracks for net '{net_name}'"
         return msg
 
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board object or missing method - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to create net traces - {str(e)}"
 
 
+@traced()
 async def label_shape_by_layer(file_path: str, func: str, center_x: float, center_y: float, size_x: float, size_y: float) -> str:
     """
     Label a rectangular shape by its function on a specific user layer.
     """
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         if not board:
             return f"Error: Could not load PCB from {file_path}"
         
@@ -184,22 +267,25 @@ async def label_shape_by_layer(file_path: str, func: str, center_x: float, cente
         board.Add(rect_shape)
 
         pcbnew.Refresh()
-        board.Save(file_path)
+        save_board(file_path, board)
         msg = f"SUCCESS: Labeling a rectangular shape '{func}' on layer '{layer_name}' at center ({center_x:.2f} mm, {center_y:.2f} mm) with size {size_x:.2f} mm x {size_y:.2f} mm."
         return msg
     
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board object or missing method - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to label area - {str(e)}"
 
 
+@traced()
 async def label_zone_by_name(file_path: str, func: str, center_x: float, center_y: float, size_x: float, size_y: float) -> str:
     """
     Label a rectangular zone by its function by a specific name.
     """
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         if not board:
             return f"Error: Could not load PCB from {file_path}"
 
@@ -215,24 +301,27 @@ async def label_zone_by_name(file_path: str, func: str, center_x: float, center_
         board.Add(zone)
 
         pcbnew.Refresh()
-        board.Save(file_path)
+        save_board(file_path, board)
 
         name = zone.GetZoneName()
         msg = f"SUCCESS: Labeling a rectangular zone '{name}' on layer 'User.1' at center ({center_x:.2f} mm, {center_y:.2f} mm) with size {size_x:.2f} mm x {size_y:.2f} mm."
         return msg
     
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board object or missing method - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to label zone - {str(e)}"
 
 
+@traced()
 async def set_board_cut(file_path: str) -> str:
     """
     Set the PCB board edge at the edge cut layer.
     """
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         if not board:
             return f"Error: Could not load board from {file_path}"
         
@@ -256,25 +345,32 @@ async def set_board_cut(file_path: str) -> str:
         rect_shape.SetLayer(pcbnew.Edge_Cuts)
         board.Add(rect_shape)
 
-        board.Save(file_path)
+        save_board(file_path, board)
         msg = f"SUCCESS: Setting board cut edge. New Board Center: ({center_x:.2f} mm, {center_y:.2f} mm), New Board Size: {size_x:.2f} mm x {size_y:.2f} mm"
         return msg
 
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board object or missing method - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to set board size - {str(e)}"
 
 
+@traced()
 async def set_board_GND(file_path: str) -> str:
     """
     Set the GND zone at the B_Cu layer.
     """
     try:
-        board = pcbnew.LoadBoard(file_path)
+        board = load_board(file_path)
         if not board:
             return f"Error: Could not load board from {file_path}"
         
+        gnd_net = board.FindNet("GND")
+        if not gnd_net:
+            return "Error: GND net not found in board"
+
         for zone in board.Zones():
             if isinstance(zone, pcbnew.ZONE):
                 board.Delete(zone)
@@ -293,20 +389,19 @@ async def set_board_GND(file_path: str) -> str:
         outline.Append(pcbnew.FromMM(center_x + size_x / 2), pcbnew.FromMM(center_y - size_y / 2))
         outline.Append(pcbnew.FromMM(center_x + size_x / 2), pcbnew.FromMM(center_y + size_y / 2))
         outline.Append(pcbnew.FromMM(center_x - size_x / 2), pcbnew.FromMM(center_y + size_y / 2))
-        gnd_net = board.FindNet("GND")
-        if gnd_net:
-            zone.SetNet(gnd_net)
-        else:
-            return "Error: GND net not found in board"
+        zone.SetNet(gnd_net)
         board.Add(zone)
-        filler = pcbnew.ZONE_FILLER(board)
-        filler.Fill(board.Zones())
+        with span("zone_fill"):
+            filler = pcbnew.ZONE_FILLER(board)
+            filler.Fill(board.Zones())
 
-        board.Save(file_path)
+        save_board(file_path, board)
         msg = f"SUCCESS: Setting board GND zone."
         return msg
 
     except AttributeError as e:
+        invalidate_board(file_path)
         return f"Error: Invalid board object or missing method - {str(e)}"
     except Exception as e:
+        invalidate_board(file_path)
         return f"Error: Failed to set board size - {str(e)}"
\ No newline at end of file
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+import contextvars
+
+from contextlib import nullcontext
+
+
+TRACE_DEFAULTS = {
+    "enabled": False,
+    "trace_file": None
+}
+
+# Upper bounds of the histogram buckets in ms, the last bucket takes everything slower
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+_current_tool = contextvars.ContextVar('pcb_trace_tool', default=None)
+_collector = contextvars.ContextVar('pcb_trace_collector', default=None)
+_no_span = nullcontext()
+
+
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        ms = seconds * 1e3
+        for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile in seconds as the upper bound of the histogram bucket it falls in, capped by the maximum.
+        """
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                bound = HISTOGRAM_BUCKETS_MS[index] / 1e3 if index < len(HISTOGRAM_BUCKETS_MS) else self.max_seconds
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def as_dict(self) -> dict:
+        bounds = [str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ['inf']
+        return {'count': self.count, 'total_ms': self.total_seconds * 1e3, 'max_ms': self.max_seconds * 1e3,
+                'p50_ms': self.quantile(0.5) * 1e3, 'p95_ms': self.quantile(0.95) * 1e3,
+                'histogram_ms': {bound: count for bound, count in zip(bounds, self.buckets) if count}}
+
+
+class Tracer:
+    """
+    Aggregates span timings per tool into call counts and histograms, and optionally appends every span to a JSON-lines
+    trace file. Spans finished in a board worker process are collected there and merged here when the call returns.
+
+    Args:
+        enabled (bool): Record spans. When off, span() and traced() cost a single attribute check.
+        trace_file (str): JSON-lines file every finished span is appended to, or None.
+    """
+
+    def __init__(self, enabled: bool = False, trace_file: str = None):
+        self.enabled = enabled
+        self.trace_file = trace_file
+        self.stats = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, trace_file: str = None) -> None:
+        with self._lock:
+            if self._file is not None and trace_file != self.trace_file:
+                self._file.close()
+                self._file = None
+            self.trace_file = trace_file
+            self.enabled = enabled
+
+    def record(self, tool: str, span: str, start: float, seconds: float, pid: int = None) -> None:
+        collector = _collector.get()
+        if collector is not None:
+            collector.append((tool, span, start, seconds, pid if pid is not None else os.getpid()))
+            return
+
+        with self._lock:
+            self.stats.setdefault(tool, {}).setdefault(span, SpanStats()).record(seconds)
+            if self.trace_file is not None:
+                if self._file is None:
+                    self._file = open(self.trace_file, 'a', encoding='utf-8')
+                event = {'ts': start, 'tool': tool, 'span': span, 'ms': round(seconds * 1e3, 3), 'pid': pid if pid is not None else os.getpid()}
+                self._file.write(json.dumps(event) + "\n")
+                self._file.flush()
+
+    def merge(self, events: list) -> None:
+        for event in events:
+            self.record(*event)
+
+    def get_stats(self, tool: str = None) -> dict:
+        """
+        Returns:
+            dict: {tool: {span: SpanStats}} of all tools or the given one.
+        """
+        with self._lock:
+            return {name: dict(spans) for name, spans in self.stats.items() if tool is None or name == tool}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = {}
+
+
+tracer = Tracer()
+
+
+def configure_tracing(enabled: bool = None, trace_file: str = None) -> Tracer:
+    """
+    Turn tracing on or off. If enabled is None, uses the TRACE setting in pcb_const.json.
+    """
+    if enabled is None:
+        from pcb_utility import load_const_section
+        config = load_const_section("TRACE", TRACE_DEFAULTS)
+        enabled, trace_file = config['enabled'], config['trace_file']
+    tracer.configure(enabled, trace_file)
+    return tracer
+
+
+class _Span:
+    __slots__ = ('name', 'start', 'wall_start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        tracer.record(_current_tool.get() or "-", self.name, self.wall_start, time.perf_counter() - self.start)
+        return False
+
+
+class _ToolSpan(_Span):
+    __slots__ = ('token',)
+
+    def __enter__(self):
+        self.token = _current_tool.set(self.name)
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        tracer.record(self.name, "total", self.wall_start, time.perf_counter() - self.start)
+        _current_tool.reset(self.token)
+        return False
+
+
+def current_tool(default: str = None) -> str:
+    return _current_tool.get() or default
+
+
+def span(name: str):
+    """
+    Context manager timing one phase of the current tool call, e.g. with span("zone_fill"): ...
+    """
+    if not tracer.enabled:
+        return _no_span
+    return _Span(name)
+
+
+def tool_span(tool: str):
+    """
+    Context manager timing a whole tool call as its "total" span, the spans opened inside are counted under the tool.
+    """
+    if not tracer.enabled:
+        return _no_span
+    return _ToolSpan(tool)
+
+
+def traced_tool(func):
+    """
+    Decorator timing an async tool that does not run through board_tool as one tool call.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with tool_span(func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def traced(name: str = None):
+    """
+    Decorator timing every call of a sync or async function as a span named after the function.
+    """
+    def decorate(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with _Span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+class collect_spans:
+    """
+    Context manager for board workers: run a tool call with tracing switched as in the server, and keep its spans in a
+    list that is sent back with the result instead of recording them in this process.
+
+    Args:
+        tool (str): Tool the spans are counted under, or None when tracing is off in the server.
+    """
+
+    def __init__(self, tool: str = None):
+        self.tool = tool
+        self.enabled = tool is not None
+        self.events = None
+
+    def __enter__(self) -> 'collect_spans':
+        tracer.enabled = self.enabled
+        if self.enabled:
+            self.events = []
+            self._tokens = (_collector.set(self.events), _current_tool.set(self.tool))
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            _collector.reset(self._tokens[0])
+            _current_tool.reset(self._tokens[1])
+        return False
+
+
+def format_tool_timing(stats: dict) -> str:
+    """
+    Render per-tool span statistics as one table per tool, with the histogram of the whole tool call.
+    """
+    msg = ""
+    for tool, spans in sorted(stats.items()):
+        total = spans.get("total")
+        msg += f"Tool: {tool}, Calls: {total.count if total else 0}\n"
+        msg += f"  {'Span':<28} {'Count':>6} {'Total (ms)':>11} {'Mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'Max (ms)':>9}\n"
+        for name, span_stats in sorted(spans.items(), key=lambda item: (item[0] != "total", -item[1].total_seconds)):
+            mean = span_stats.total_seconds / span_stats.count if span_stats.count else 0.0
+            msg += (f"  {name:<28} {span_stats.count:>6} {span_stats.total_seconds * 1e3:>11.1f} {mean * 1e3:>10.2f} "
+                    f"{span_stats.quantile(0.5) * 1e3:>9.2f} {span_stats.quantile(0.95) * 1e3:>9.2f} {span_stats.max_seconds * 1e3:>9.2f}\n")
+        if total:
+            histogram = total.as_dict()['histogram_ms']
+            msg += "  Histogram: " + ", ".join(f"<= {bound} ms: {count}" if bound != 'inf' else f"> {HISTOGRAM_BUCKETS_MS[-1]} ms: {count}"
+                                                for bound, count in histogram.items()) + "\n"
+    return msg
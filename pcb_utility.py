@@ -1,20 +1,196 @@
+from __future__ import annotations
+
+import os
 import re
-import pcbnew
+import json
+import math
 
+from pcb_spatial import *
+from pcb_session import *
+from pcb_lazy import lazy_import
 
-async def get_footprint_courtyard(module):
-    courtyard_bbox = None
 
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+CONST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pcb_const.json')
+
+
+def load_const_section(name: str, defaults: dict) -> dict:
+    """
+    Read one section of pcb_const.json on top of its defaults.
+    """
+    config = dict(defaults)
+    try:
+        with open(CONST_PATH, 'r') as f:
+            config.update(json.load(f).get(name, {}))
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+_footprint_geometry = {}
+
+
+def _release_footprint_geometry(path: str) -> None:
+    _footprint_geometry.pop(path, None)
+
+board_cache.add_release_hook(_release_footprint_geometry)
+
+
+def get_footprint_signature(module) -> tuple:
+    """
+    Orientation and courtyard graphics of a module relative to its position, what its cached outline is valid for. A
+    graphic moved inside the footprint changes it, a move of the whole footprint does not.
+    """
+    pos = module.GetPosition()
+    items = []
     for graphic in module.GraphicalItems():
         if graphic.GetLayer() in (pcbnew.F_CrtYd, pcbnew.B_CrtYd):
-            graphic_bbox = graphic.GetBoundingBox()
+            start, end = graphic.GetStart(), graphic.GetEnd()
+            items.append((graphic.GetShape(), start.x - pos.x, start.y - pos.y, end.x - pos.x, end.y - pos.y, graphic.GetWidth()))
+    return (module.GetOrientationDegrees(), hash(tuple(items)))
 
-            if courtyard_bbox is None:
-                courtyard_bbox = graphic_bbox
-            else:
-                courtyard_bbox.Merge(graphic_bbox)
+def _footprint_geometry_entry(module) -> dict:
+    """
+    Cached geometry of a module. Its signature is only taken again after the board recorded a new mutation, and the
+    entry is cleared if the courtyard graphics changed, so edits that forget invalidate_footprint_geometry never serve a
+    stale outline past their save.
+    """
+    path = get_board_key(module.GetBoard())
+    entry = _footprint_geometry.setdefault(path, {}).setdefault(module.m_Uuid.AsString(), {})
+    mutation = board_cache.last_mutation(path)
+    if 'signature' not in entry or entry['mutation'] != mutation:
+        signature = get_footprint_signature(module)
+        if entry.get('signature') != signature:
+            entry.clear()
+            entry['signature'] = signature
+        entry['mutation'] = mutation
+    return entry
 
-    return courtyard_bbox
+def get_cached_footprint_signature(module) -> tuple:
+    return _footprint_geometry_entry(module)['signature']
+
+def invalidate_footprint_geometry(module=None, board=None) -> None:
+    """
+    Drop cached courtyard geometry of one module, or of every module of a board if only the board is given.
+    """
+    if module is not None:
+        _footprint_geometry.get(get_board_key(module.GetBoard()), {}).pop(module.m_Uuid.AsString(), None)
+    elif board is not None:
+        _release_footprint_geometry(get_board_key(board))
+
+def make_box(box: tuple):
+    bbox = pcbnew.BOX2I()
+    bbox.SetOrigin(box[0], box[1])
+    bbox.SetSize(box[2] - box[0], box[3] - box[1])
+    return bbox
+
+def get_graphic_points(graphic) -> list[tuple]:
+    shape = graphic.GetShape()
+    if shape == pcbnew.SHAPE_T_SEGMENT:
+        points = [graphic.GetStart(), graphic.GetEnd()]
+    elif shape == pcbnew.SHAPE_T_RECT:
+        points = list(graphic.GetRectCorners())
+        points.append(points[0])
+    elif shape == pcbnew.SHAPE_T_POLY:
+        outline = graphic.GetPolyShape().Outline(0)
+        points = [outline.CPoint(i) for i in range(outline.PointCount())]
+        points.append(points[0])
+    elif shape in (pcbnew.SHAPE_T_CIRCLE, pcbnew.SHAPE_T_ARC):
+        center = graphic.GetCenter()
+        radius = graphic.GetRadius()
+        if shape == pcbnew.SHAPE_T_CIRCLE:
+            start_angle, sweep = 0.0, 2 * math.pi
+        else:
+            start, mid, end = graphic.GetStart(), graphic.GetArcMid(), graphic.GetEnd()
+            start_angle = math.atan2(start.y - center.y, start.x - center.x)
+            mid_sweep = (math.atan2(mid.y - center.y, mid.x - center.x) - start_angle) % (2 * math.pi)
+            sweep = (math.atan2(end.y - center.y, end.x - center.x) - start_angle) % (2 * math.pi)
+            if mid_sweep > sweep:
+                sweep -= 2 * math.pi
+        # Circumscribed polygon so the outline never falls inside the true curve
+        steps = max(int(abs(sweep) / (math.pi / 8)), 2)
+        radius = radius / math.cos(sweep / steps / 2)
+        return [(center.x + radius * math.cos(start_angle + sweep * i / steps), center.y + radius * math.sin(start_angle + sweep * i / steps)) for i in range(steps + 1)]
+    else:
+        bbox = graphic.GetBoundingBox()
+        return [(bbox.GetLeft(), bbox.GetTop()), (bbox.GetRight(), bbox.GetTop()), (bbox.GetRight(), bbox.GetBottom()), (bbox.GetLeft(), bbox.GetBottom()), (bbox.GetLeft(), bbox.GetTop())]
+
+    return [(point.x, point.y) for point in points]
+
+async def get_footprint_outline(module):
+    """
+    Return the courtyard outline of a module in its local frame (origin at the footprint position, orientation 0) as
+    (polylines, margin), where margin is half of the widest courtyard line. The outline is computed once per footprint
+    and reused until its courtyard graphics change, the footprint geometry is invalidated or the board is reloaded.
+    """
+    return _footprint_outline(module, _footprint_geometry_entry(module))
+
+def _footprint_outline(module, entry: dict):
+    outline = entry.get('outline')
+    if outline is None:
+        pos = module.GetPosition()
+        angle_degrees = module.GetOrientationDegrees()
+        polylines = []
+        margin = 0
+        for graphic in module.GraphicalItems():
+            if graphic.GetLayer() in (pcbnew.F_CrtYd, pcbnew.B_CrtYd):
+                polylines.append(board_to_local(get_graphic_points(graphic), (pos.x, pos.y), angle_degrees))
+                margin = max(margin, graphic.GetWidth() // 2)
+        outline = (polylines, margin)
+        entry['outline'] = outline
+
+    return outline
+
+def courtyard_box_at(outline, pos_x: int, pos_y: int, angle_degrees: float):
+    polylines, margin = outline
+    points = local_to_board([point for polyline in polylines for point in polyline], (pos_x, pos_y), angle_degrees)
+    return points_box(points, margin)
+
+async def get_footprint_courtyard(module):
+    entry = _footprint_geometry_entry(module)
+    pos = module.GetPosition()
+    state = (pos.x, pos.y, module.GetOrientationDegrees())
+
+    if entry.get('state') != state:
+        outline = _footprint_outline(module, entry)
+        entry['bbox'] = courtyard_box_at(outline, *state)
+        entry['state'] = state
+
+    courtyard_bbox = entry['bbox']
+    return make_box(courtyard_bbox) if courtyard_bbox is not None else None
+
+async def get_footprint_segments(module):
+    """
+    Return the courtyard outline of a module in board coordinates as (segments, margin, rect): an (n, 4) array of
+    segments, half the widest courtyard line, and the outline box if the outline is an axis-aligned rectangle. Cached
+    until the module moves.
+    """
+    entry = _footprint_geometry_entry(module)
+    pos = module.GetPosition()
+    state = (pos.x, pos.y, module.GetOrientationDegrees())
+
+    if entry.get('segments_state') != state:
+        polylines, margin = _footprint_outline(module, entry)
+        segments = outline_segments(polylines, (pos.x, pos.y), state[2])
+        entry['segments'] = (segments, margin, outline_rect(segments))
+        entry['segments_state'] = state
+
+    return entry['segments']
+
+async def courtyards_too_close(mod1, mod2, clearance: int) -> bool:
+    """
+    Narrow phase of the clearance checks: compare the true courtyard outlines of two modules whose inflated courtyard
+    boxes already overlap. Half the courtyard line width is counted on both sides, as in the courtyard boxes.
+    """
+    segments1, margin1, rect1 = await get_footprint_segments(mod1)
+    segments2, margin2, rect2 = await get_footprint_segments(mod2)
+    if rect1 is not None and rect2 is not None:
+        distance = rect_distance(rect1, rect2)
+    else:
+        distance = outline_distance(segments1, segments2)
+    return distance - margin1 - margin2 < clearance
 
 async def get_footprint_size(module):
     courtyard_bbox = await get_footprint_courtyard(module)
@@ -53,7 +229,26 @@ async def get_board_size(board):
     return w, h
 
 
-async def extract_table(table):
+def box_to_tuple(bbox) -> tuple:
+    return (bbox.GetX(), bbox.GetY(), bbox.GetRight(), bbox.GetBottom())
+
+async def build_courtyard_index(board):
+    """
+    Compute every module courtyard once and index them in a spatial grid keyed by footprint order.
+    """
+    courtyards = []
+    boxes = {}
+    for module in board.GetFootprints():
+        courtyard_bbox = await get_footprint_courtyard(module)
+        if courtyard_bbox is None:
+            continue
+        boxes[len(courtyards)] = box_to_tuple(courtyard_bbox)
+        courtyards.append((module, courtyard_bbox))
+
+    return SpatialGrid.from_boxes(boxes), courtyards
+
+
+def extract_table_data(table):
     data = {
         'headers': [],
         'rows': []
@@ -77,33 +272,11 @@ async def extract_table(table):
     
     return data if (data['headers'] or data['rows']) else None
 
+async def extract_table(table):
+    return extract_table_data(table)
+
 async def check_segments_intersect(segments):
+    if len(segments) < 2:
+        return []
 
-    def ccw(ax, ay, bx, by, cx, cy):
-        return (cy - ay) * (bx - ax) > (by - ay) * (cx - ax)
-    
-    def check_two_segments(x1, y1, x2, y2, x3, y3, x4, y4):
-        return (ccw(x1, y1, x3, y3, x4, y4) != ccw(x2, y2, x3, y3, x4, y4) and
-                ccw(x1, y1, x2, y2, x3, y3) != ccw(x1, y1, x2, y2, x4, y4))
-    
-    n = len(segments)
-    intersecting_pairs = []
-    
-    if n < 2:
-        return intersecting_pairs
-    
-    for i in range(n):
-        for j in range(i + 1, n):
-            seg1 = segments[i]
-            seg2 = segments[j]
-            
-            if seg1[4] == seg2[4]:
-                continue
-            
-            x1, y1, x2, y2 = seg1[0], seg1[1], seg1[2], seg1[3]
-            x3, y3, x4, y4 = seg2[0], seg2[1], seg2[2], seg2[3]
-            
-            if check_two_segments(x1, y1, x2, y2, x3, y3, x4, y4):
-                intersecting_pairs.append((i, j, seg1[4], seg2[4]))
-    
-    return intersecting_pairs
\ No newline at end of file
+    return find_segment_intersections(segments)
@@ -1,79 +1,365 @@
+from __future__ import annotations
+
+import os
+import re
+import json
+import shutil
+import hashlib
 import subprocess
-import pcbnew
 
+from typing import Optional
 from pathlib import Path
+from pcb_session import *
+from pcb_utility import CONST_PATH, load_const_section
+from pcb_connectivity import BoardConnectivity
+from pcb_lazy import lazy_import
+from pcb_trace import span
+
+
+pcbnew = lazy_import('pcbnew', fallback='pcb_reader')
+
+
+ROUTING_DEFAULTS = {
+    "jar_path": "freerouting-2.1.0.jar",
+    "command": None,
+    "seeds": [1, 2, 3, 4],
+    "max_parallel": 4,
+    "max_passes": None,
+    "timeout_seconds": 900,
+    "work_dir": ".routing_jobs",
+    "max_jobs": 16
+}
+
+# KiCad sets " as the string quote of its DSN files
+DSN_TOKEN_RE = re.compile(r'"[^"]*"|[^\s()]+')
+DSN_NET_RE = re.compile(r'\(net\s')
+DSN_WIRE_RE = re.compile(r'\((wire|via)\s')
+DSN_TYPE_RE = re.compile(r'\(type\s+\w+\)')
+
+ROUTING_CACHE_DEFAULTS = {
+    "enabled": True,
+    "dir": ".routing_cache",
+    "max_bytes": 268435456
+}
+
+
+def freerouting_command(jar_path: str, dsn_file: str, ses_file: str, seed: int = 2, max_passes: Optional[int] = None,
+                        command: Optional[list[str]] = None) -> list[str]:
+    """
+    Command line of one FreeRouting run. command replaces "java -jar jar_path", e.g. to run another router build or a stub.
+    """
+    cmd = list(command) if command else ["java", "-jar", str(Path(jar_path).resolve())]
+    cmd += ["-de", str(dsn_file), "-do", str(ses_file), "-random_seed", str(seed)]
+    if max_passes is not None:
+        cmd += ["-mp", str(max_passes)]
+    return cmd
+
+
+def _dsn_element_end(text: str, start: int) -> int:
+    """
+    Index just past the DSN element opening at text[start], skipping parentheses in quoted tokens.
+    """
+    depth = 0
+    in_quote = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_quote:
+            in_quote = char != '"'
+        elif char == '"':
+            in_quote = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    raise ValueError("Unbalanced DSN element")
+
+
+def _dsn_children(text: str, start: int, end: int):
+    """
+    Yield (start, end) of the direct child elements of the DSN element spanning text[start:end].
+    """
+    index = start + 1
+    while True:
+        index = text.find('(', index, end - 1)
+        if index < 0:
+            return
+        child_end = _dsn_element_end(text, index)
+        yield index, child_end
+        index = child_end
+
+
+def filter_dsn(text: str, pins: set[str], nets: set[str], protect: bool = True) -> str:
+    """
+    Reduce a Specctra DSN to a subset of the connections to route. Pins of the selected nets and the selected pins stay in
+    their nets, the other pins are taken out of the network so the router leaves them alone.
+
+    Args:
+        text (str): DSN exported by KiCad.
+        pins (set[str]): Pin ids to keep, "<reference>-<pad number>" as in the DSN.
+        nets (set[str]): Net names whose pins are all kept.
+        protect (bool): Mark the existing wires and vias as protected, so the router routes around them instead of
+            ripping them up.
+    """
+    edits = []
+
+    network = re.search(r'\(network\s', text)
+    if network:
+        for net_start, net_end in _dsn_children(text, network.start(), _dsn_element_end(text, network.start())):
+            if not DSN_NET_RE.match(text, net_start):
+                continue
+            net_name = DSN_TOKEN_RE.search(text, net_start + 4, net_end).group().strip('"')
+            if net_name in nets:
+                continue
+            for pins_start, pins_end in _dsn_children(text, net_start, net_end):
+                if text.startswith('(pins', pins_start):
+                    kept = [token for token in DSN_TOKEN_RE.findall(text, pins_start + 5, pins_end - 1) if token.strip('"') in pins]
+                    edits.append((pins_start, pins_end, "(pins" + "".join(f" {token}" for token in kept) + ")"))
+
+    wiring = re.search(r'\(wiring\s', text)
+    if protect and wiring:
+        for item_start, item_end in _dsn_children(text, wiring.start(), _dsn_element_end(text, wiring.start())):
+            if not DSN_WIRE_RE.match(text, item_start):
+                continue
+            wire_type = DSN_TYPE_RE.search(text, item_start, item_end)
+            if wire_type:
+                edits.append((wire_type.start(), wire_type.end(), "(type protect)"))
+            else:
+                edits.append((item_end - 1, item_end - 1, " (type protect)"))
 
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text
 
-def run_freerouting(file_path: str, jar_path: str, keep_connections: list = None) -> str:
+
+def export_dsn(board: pcbnew.BOARD, dsn_file: str, keep_connections: Optional[list] = None, nets: Optional[list[str]] = None) -> None:
+    """
+    Export the board as a Specctra DSN file. With keep_connections or nets only the listed (reference, pad number) pairs
+    and the pads of the listed nets are routed, every other pad is left unconnected and the existing copper is protected.
+    The board itself is never modified.
+    """
+    with span("export_dsn"):
+        pcbnew.ExportSpecctraDSN(board, str(dsn_file))
+
+    if keep_connections or nets:
+        pins = {f"{ref}-{pad_num}" for ref, pad_num in keep_connections or []}
+        with open(dsn_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        text = filter_dsn(text, pins, set(nets or []))
+        with open(dsn_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def count_routing_result(board: pcbnew.BOARD) -> dict:
+    """
+    Count the unrouted connections and the vias of a board, used to rank routing results.
+    """
+    routing_status = BoardConnectivity(board).get_routing_status()
+    unrouted = sum(total - routed for routed, total in routing_status.values())
+    vias = sum(1 for item in board.GetTracks() if item.GetClass() == "PCB_VIA")
+    return {'unrouted': unrouted, 'vias': vias}
+
+
+def get_design_rules(board: pcbnew.BOARD) -> list:
+    """
+    Design rules the DSN export takes from the project files next to the board: the net classes and board design
+    settings of the .kicad_pro file and the custom rules of the .kicad_dru file. Rules changed in the board editor are
+    only seen once the project is saved.
+    """
+    stem = os.path.splitext(board.GetFileName())[0]
+    rules = []
+    try:
+        with open(stem + '.kicad_pro', 'r', encoding='utf-8') as f:
+            project = json.load(f)
+        rules.append([project.get('net_settings'), project.get('board', {}).get('design_settings')])
+    except (OSError, ValueError):
+        rules.append(None)
+    try:
+        with open(stem + '.kicad_dru', 'r', encoding='utf-8') as f:
+            rules.append(f.read())
+    except OSError:
+        rules.append(None)
+    return rules
+
+
+def get_routing_key(board: pcbnew.BOARD, keep_connections: Optional[list] = None, max_passes: Optional[int] = None,
+                    nets: Optional[list[str]] = None) -> str:
+    """
+    Hash everything a routing result depends on: footprint placements, pad nets, the existing copper, zones and rule
+    areas, the board outline, the design rules of the project files, the keep_connections and nets selection and the
+    router pass limit. Item order on the board does not matter.
+    """
+    footprints = []
+    for footprint in board.GetFootprints():
+        pos = footprint.GetPosition()
+        pads = sorted([pad.GetNumber(), pad.GetNetname()] for pad in footprint.Pads())
+        footprints.append([footprint.GetReference(), str(footprint.GetFPID().GetLibItemName()), pos.x, pos.y,
+                           round(footprint.GetOrientationDegrees(), 3), footprint.GetLayer(), pads])
+
+    copper = []
+    for item in board.GetTracks():
+        if item.GetClass() == "PCB_VIA":
+            pos = item.GetPosition()
+            copper.append(["via", item.GetNetname(), pos.x, pos.y, item.GetWidth(pcbnew.F_Cu), item.GetDrillValue()])
+        else:
+            start, end = item.GetStart(), item.GetEnd()
+            copper.append(["track", item.GetNetname(), start.x, start.y, end.x, end.y, item.GetWidth(), item.GetLayerName()])
+
+    zones = []
+    for zone in board.Zones():
+        polygon = zone.Outline().Outline(0)
+        points = [[polygon.CPoint(i).x, polygon.CPoint(i).y] for i in range(polygon.PointCount())]
+        zones.append([zone.GetNetname(), sorted(zone.GetLayerSet().Seq()), zone.GetIsRuleArea(), points])
+
+    outline = board.ComputeBoundingBox(True)
+    keep = sorted({(str(ref), str(pad_num)) for ref, pad_num in keep_connections}) if keep_connections else None
+    selected_nets = sorted(set(nets)) if nets else None
+    state = [sorted(footprints), sorted(copper), sorted(zones), [outline.GetX(), outline.GetY(), outline.GetWidth(), outline.GetHeight()],
+             get_design_rules(board), keep, selected_nets, max_passes]
+    return hashlib.blake2b(json.dumps(state, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+class RoutingCache:
+    """
+    On-disk cache of routing results, one SES file per routing key, so routing an unchanged board again imports the
+    stored result instead of running the router. The least recently used entries are deleted once the cache directory
+    grows beyond max_bytes.
+
+    Args:
+        cache_dir (str): Directory holding the SES files.
+        max_bytes (int): Maximum total size of the SES files.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.ses")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: Path of the cached SES file, or None.
+        """
+        if not key.isalnum():
+            return None
+        path = self._entry_path(key)
+        try:
+            # The file access time is unreliable on many mounts, so the mtime records the last use for eviction
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, ses_file: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+        if os.path.abspath(ses_file) != os.path.abspath(path):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.copyfile(ses_file, temp_path)
+            os.replace(temp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str = None) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.ses'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.cache_dir, name)))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_bytes -= size
+
+
+def get_routing_cache() -> Optional[RoutingCache]:
+    """
+    Returns:
+        Optional[RoutingCache]: The configured routing cache, or None if it is turned off.
+    """
+    config = load_const_section('ROUTING_CACHE', ROUTING_CACHE_DEFAULTS)
+    if not config['enabled']:
+        return None
+    cache_dir = config['dir']
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.join(os.path.dirname(CONST_PATH), cache_dir)
+    return RoutingCache(cache_dir, config['max_bytes'])
+
+
+def cache_routing_result(cache: RoutingCache, board: pcbnew.BOARD, ses_file: str, key: Optional[str], keep_connections: Optional[list] = None,
+                         max_passes: Optional[int] = None, nets: Optional[list[str]] = None) -> None:
+    """
+    Store an imported routing result under the key of the board it was routed from and under the key of the routed
+    board, so routing either of them again is a cache hit.
+    """
+    if key is not None:
+        cache.put(key, ses_file)
+    cache.put(get_routing_key(board, keep_connections, max_passes, nets), ses_file)
+
+
+def run_freerouting(file_path: str, jar_path: str, keep_connections: list = None, seed: int = 2, timeout: Optional[float] = None,
+                    use_cache: bool = True, nets: Optional[list[str]] = None) -> str:
     """
     Run FreeRouting on the given PCB file.
 
     Args:
         file_path (str): Path to the PCB file.
         jar_path (str): Path to the FreeRouting JAR file.
-        keep_connections (list): List of tuples specifying pads to keep.
+        keep_connections (list): List of tuples specifying pads to route.
+        seed (int): Random seed of the router.
+        timeout (Optional[float]): Seconds after which the router is stopped. If None, waits until it finishes.
+        use_cache (bool): Import the cached result if the board was routed before in the same state, whatever the seed.
+        nets (Optional[list[str]]): Names of the nets to route. With keep_connections or nets the other pads are left
+            unconnected and the existing copper stays in place, so the board can be routed a few nets at a time.
     """
 
-    board = pcbnew.LoadBoard(file_path)
+    board = load_board(file_path)
     pcb_file = Path(file_path).resolve()
-    jar_file = Path(jar_path).resolve()
     dsn_file = pcb_file.with_suffix('.dsn')
     ses_file = dsn_file.with_suffix('.ses')
 
-    original_nets = {}
-    original_track_nets = {}
-    
-    if keep_connections:
-        for footprint in board.GetFootprints():
-            footprint_ref = footprint.GetReference()
-            for pad in footprint.Pads():
-                pad_num = pad.GetNumber()
-                if (footprint_ref, pad_num) not in keep_connections:
-                    original_nets[(footprint_ref, pad_num)] = pad.GetNetCode()
-                    pad.SetNetCode(0)
-
-        # for i, track in enumerate(board.GetTracks()):
-        #     net_code = track.GetNetCode()
-        #     original_track_nets[i] = net_code
-        #     track.SetNetCode(0)
-
-    pcbnew.ExportSpecctraDSN(board, str(dsn_file))
-
-    if original_nets:
-        for footprint in board.GetFootprints():
-            footprint_ref = footprint.GetReference()
-            for pad in footprint.Pads():
-                pad_num = pad.GetNumber()
-                if (footprint_ref, pad_num) in original_nets:
-                    pad.SetNetCode(original_nets[(footprint_ref, pad_num)])
-    
-    # if original_track_nets:
-    #     for i, track in enumerate(board.GetTracks()):
-    #         if i in original_track_nets:
-    #             track.SetNetCode(original_track_nets[i])
-
-
-    cmd = [
-        "java",
-        "-jar", str(jar_file),
-        # "--gui.enabled=false",
-        "-de", str(dsn_file),
-        "-do", str(ses_file),
-        "-random_seed", "2",
-        # "-mp", "100",
-    ]
+    cache = get_routing_cache() if use_cache else None
+    key = get_routing_key(board, keep_connections, nets=nets) if cache is not None else None
+    cached_file = cache.get(key) if cache is not None else None
+
+    if cached_file is not None:
+        shutil.copyfile(cached_file, ses_file)
+        msg = f"FreeRouting skipped, routing result reused from cache. SES file saved at: {ses_file}"
+    else:
+        export_dsn(board, dsn_file, keep_connections, nets)
+
+        cmd = freerouting_command(jar_path, dsn_file, ses_file, seed)
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        check=True
-    )
+        with span("freerouting"):
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=timeout
+            )
+        msg = f"FreeRouting completed. SES file saved at: {ses_file}"
 
-    pcbnew.ImportSpecctraSES(board, str(ses_file))
-    pcbnew.SaveBoard(str(pcb_file), board)
+    with span("import_ses"):
+        pcbnew.ImportSpecctraSES(board, str(ses_file))
+    save_board(str(pcb_file), board)
+    if cache is not None:
+        cache_routing_result(cache, board, ses_file, key, keep_connections, nets=nets)
 
-    msg = f"FreeRouting completed. SES file saved at: {ses_file}"
     print(msg)
     return str(ses_file)
 
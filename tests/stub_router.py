@@ -0,0 +1,36 @@
+"""
+Stand-in for FreeRouting, run through the ROUTING command setting. It takes the FreeRouting command line, prints pass
+lines like the router, and writes the result of its seed to the -do file as JSON for the test's score_routing_ses.
+
+The STUB_ROUTER_PLAN environment variable holds a JSON object of seed -> {'unrouted', 'vias', 'passes', 'sleep',
+'exit'}, with "default" for the other seeds.
+"""
+import os
+import sys
+import json
+import time
+
+
+def main(argv: list[str]) -> int:
+    args = dict(zip(argv[::2], argv[1::2]))
+    seed = args['-random_seed']
+    plans = json.loads(os.environ.get('STUB_ROUTER_PLAN', '{}'))
+    plan = dict(plans.get('default', {}), **plans.get(seed, {}))
+
+    passes = plan.get('passes', 3)
+    sleep = plan.get('sleep', 0.0)
+    for index in range(1, passes + 1):
+        print(f"Auto-router pass #{index} on board 'stub' was completed in {sleep / passes:.2f} seconds", flush=True)
+        time.sleep(sleep / passes)
+
+    if plan.get('exit', 0) != 0:
+        print("Routing failed", flush=True)
+        return plan['exit']
+
+    with open(args['-do'], 'w', encoding='utf-8') as f:
+        json.dump({'seed': int(seed), 'unrouted': plan.get('unrouted', 0), 'vias': plan.get('vias', 0)}, f)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
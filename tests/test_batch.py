@@ -0,0 +1,43 @@
+import time
+import asyncio
+
+import pcb_synth
+
+from pcb_batch import find_boards, stream_batch_results, iter_batch_results
+
+
+def write_variants(tmp_path, sizes: list[int]) -> list[str]:
+    for index, footprints in enumerate(sizes):
+        pcb_synth.write_board(str(tmp_path / f"v{index}.kicad_pcb"), footprints=footprints, tracks=footprints, vias=0, seed=index)
+    return find_boards([str(tmp_path)])
+
+
+def test_stream_yields_every_board(tmp_path):
+    paths = write_variants(tmp_path, [4, 9, 16])
+
+    async def main():
+        return [result async for result in stream_batch_results(paths, ['drc', 'env'], workers=2)]
+
+    results = asyncio.run(main())
+
+    assert sorted(result['file_path'] for result in results) == paths
+    assert all(result['error'] is None for result in results)
+    assert {result['file_path']: result['modules'] for result in results} == \
+           {result['file_path']: result['modules'] for result in iter_batch_results(paths, ['env'], workers=1)}
+
+
+def test_closing_the_stream_does_not_wait_for_the_other_boards(tmp_path):
+    paths = write_variants(tmp_path, [4, 1500, 1500, 1500])
+
+    async def main():
+        results = stream_batch_results(paths, workers=1)
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    start = time.perf_counter()
+    first = asyncio.run(main())
+
+    assert first['file_path'] == paths[0]
+    # Each of the large boards takes seconds, none of them is waited for
+    assert time.perf_counter() - start < 1.0
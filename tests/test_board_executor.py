@@ -0,0 +1,35 @@
+import sys
+import time
+import asyncio
+import threading
+
+import pcb_synth
+
+from pcb_executor import BoardExecutor
+
+
+async def worker_name(delay: float = 0.0) -> str:
+    time.sleep(delay)
+    return threading.current_thread().name
+
+
+def test_home_only_reads_stay_on_the_home_worker(tmp_path, monkeypatch):
+    # Board workers send tool output to stderr, keep that inside the test
+    monkeypatch.setattr(sys, 'stdout', sys.stdout)
+    path = pcb_synth.write_board(str(tmp_path / "board.kicad_pcb"), footprints=1, tracks=0, vias=0)
+    executor = BoardExecutor("thread", 2)
+
+    async def main():
+        busy = asyncio.ensure_future(executor.run(path, worker_name, 0.3, readonly=True))
+        await asyncio.sleep(0.05)
+        fanned_out = await executor.run(path, worker_name, readonly=True)
+        home = await executor.run(path, worker_name, readonly=True, home_only=True)
+        return await busy, fanned_out, home
+
+    try:
+        busy, fanned_out, home = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert fanned_out != busy
+    assert home == busy
@@ -0,0 +1,33 @@
+import pytest
+
+import pcb_synth
+
+from pcb_session import board_cache, board_transaction, load_board, save_board, invalidate_board
+
+
+@pytest.fixture
+def board_path(tmp_path):
+    path = pcb_synth.write_board(str(tmp_path / "board.kicad_pcb"), footprints=4, tracks=0, vias=0)
+    yield path
+    invalidate_board()
+
+
+def test_aborted_transaction_is_reported(board_path):
+    with pytest.raises(RuntimeError, match="aborted"):
+        with board_transaction(board_path):
+            save_board(board_path, load_board(board_path))
+            # What a failing mutation does before it returns its error
+            invalidate_board(board_path)
+
+    assert not board_cache.in_transaction(board_path)
+
+
+def test_exception_rolls_back(board_path):
+    with pytest.raises(ValueError):
+        with board_transaction(board_path):
+            board = load_board(board_path)
+            save_board(board_path, board)
+            raise ValueError("mutation failed")
+
+    assert not board_cache.in_transaction(board_path)
+    assert load_board(board_path) is not board
@@ -0,0 +1,144 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pcb_datasheet import DATASHEET_FETCH_DEFAULTS, DatasheetFetcher
+
+
+class StandInServer:
+    """
+    Local stand-in for the datasheet site. Each request is answered by the next planned (status, headers) of its path,
+    the last plan repeats. Arrival times and the peak number of requests in flight are recorded.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.plans = {}
+        self.arrivals = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stand_in.lock:
+                    stand_in.arrivals.append((self.path, time.monotonic()))
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                    plan = stand_in.plans.get(self.path, [(200, {})])
+                    status, headers = plan.pop(0) if len(plan) > 1 else plan[0]
+                try:
+                    time.sleep(stand_in.delay)
+                    body = f"page {self.path}".encode()
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stand_in.lock:
+                        stand_in.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def requests(self, path: str) -> list[float]:
+        return [arrival for request_path, arrival in self.arrivals if request_path == path]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_server(monkeypatch):
+    for name in ('HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'http_proxy', 'https_proxy', 'all_proxy'):
+        monkeypatch.delenv(name, raising=False)
+    servers = []
+
+    def make(delay: float = 0.0) -> StandInServer:
+        server = StandInServer(delay)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def fetch_all(urls: list[str], **config) -> list:
+    async def main():
+        fetcher = DatasheetFetcher(dict(DATASHEET_FETCH_DEFAULTS, **config))
+        try:
+            return await asyncio.gather(*(fetcher.fetch(url, 5) for url in urls), return_exceptions=True)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(main())
+
+
+def test_concurrency_cap(make_server):
+    server = make_server(delay=0.2)
+    results = fetch_all([f"{server.url}/page{i}" for i in range(6)], max_concurrency=2, host_interval_seconds=0)
+
+    assert results == [f"page /page{i}" for i in range(6)]
+    assert server.max_in_flight == 2
+
+
+def test_per_host_spacing(make_server):
+    server = make_server()
+    fetch_all([f"{server.url}/page{i}" for i in range(4)], host_interval_seconds=0.15)
+
+    arrivals = sorted(arrival for _, arrival in server.arrivals)
+    assert len(arrivals) == 4
+    assert min(later - earlier for earlier, later in zip(arrivals, arrivals[1:])) >= 0.13
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_retry_after(make_server, status):
+    server = make_server()
+    server.plans['/busy'] = [(status, {'Retry-After': '1'}), (200, {})]
+    results = fetch_all([f"{server.url}/busy"], host_interval_seconds=0, backoff_seconds=0.01)
+
+    assert results == ["page /busy"]
+    first, second = server.requests('/busy')
+    assert second - first >= 0.95
+
+
+def test_retry_with_backoff(make_server):
+    server = make_server()
+    server.plans['/flaky'] = [(503, {}), (503, {}), (200, {})]
+    results = fetch_all([f"{server.url}/flaky"], host_interval_seconds=0, backoff_seconds=0.01)
+
+    assert results == ["page /flaky"]
+    assert len(server.requests('/flaky')) == 3
+
+
+def test_give_up(make_server):
+    server = make_server()
+    server.plans['/down'] = [(503, {})]
+    results = fetch_all([f"{server.url}/down"], host_interval_seconds=0, backoff_seconds=0.01, retries=2)
+
+    assert isinstance(results[0], httpx.HTTPStatusError)
+    assert results[0].response.status_code == 503
+    assert len(server.requests('/down')) == 3
+
+
+def test_no_retry_on_client_error(make_server):
+    server = make_server()
+    server.plans['/missing'] = [(404, {})]
+    results = fetch_all([f"{server.url}/missing"], host_interval_seconds=0, backoff_seconds=0.01)
+
+    assert isinstance(results[0], httpx.HTTPStatusError)
+    assert len(server.requests('/missing')) == 1
@@ -0,0 +1,152 @@
+import re
+import asyncio
+
+import pytest
+
+import pcb_synth
+
+from pcb_reader import read_board, FromMM
+from pcb_spatial import local_to_board
+from pcb_utility import get_footprint_courtyard, box_to_tuple
+from pcb_tool_get import collect_pcb_env
+from pcb_tool_check import get_design_rule_state
+from pcb_session import board_cache, load_board_readonly, invalidate_board, resolve_board_path
+
+
+FOOTPRINT_AT_RE = re.compile(r'\(footprint "Synth:SYNTH-\d+"\n\t\t\(layer "F.Cu"\)\n\t\t\(uuid "[^"]+"\)\n\t\t\(at ([-\d.]+) ([-\d.]+)(?: (\d+))?\)')
+
+
+def synth_board(tmp_path, name: str = "board.kicad_pcb", edit=None, **kwargs) -> str:
+    text = pcb_synth.generate_board(**kwargs)
+    if edit is not None:
+        text = edit(text)
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def placements(path: str) -> list[tuple]:
+    with open(path, encoding='utf-8') as f:
+        return [(float(x), float(y), float(angle or 0)) for x, y, angle in FOOTPRINT_AT_RE.findall(f.read())]
+
+
+@pytest.fixture
+def board_path(tmp_path):
+    return synth_board(tmp_path, footprints=9, pads=8, fanout=3, tracks=20, vias=5, seed=7)
+
+
+def test_footprints_and_pads(board_path):
+    board = read_board(board_path)
+    expected = placements(board_path)
+    footprints = board.GetFootprints()
+
+    assert [footprint.GetReference() for footprint in footprints] == [f"U{i}" for i in range(1, 10)]
+    local_pads = pcb_synth.footprint_pads(8)
+    for footprint, (x, y, angle) in zip(footprints, expected):
+        pos = footprint.GetPosition()
+        assert (pos.x, pos.y) == (FromMM(x), FromMM(y))
+        assert footprint.GetOrientationDegrees() == angle
+        pads = footprint.Pads()
+        assert [pad.GetNumber() for pad in pads] == [str(i) for i in range(1, 9)]
+        for pad, (pad_x, pad_y) in zip(pads, local_to_board(local_pads, (x, y), angle)):
+            pad_pos = pad.GetPosition()
+            assert abs(pad_pos.x - FromMM(pad_x)) <= 1 and abs(pad_pos.y - FromMM(pad_y)) <= 1
+            assert pad.GetOrientationDegrees() == angle
+        assert pads[-1].GetNetname() == "GND"
+
+
+def test_pad_angle_is_absolute(tmp_path):
+    # A pad written without an angle is at 0 degrees even on a rotated footprint
+    path = synth_board(tmp_path, footprints=1, pads=1, tracks=0, vias=0, seed=1,
+                       edit=lambda text: re.sub(r'\(at ([-\d.]+) ([-\d.]+)\)\n', r'(at \1 \2 90)\n', text, count=1))
+    footprint = read_board(path).GetFootprints()[0]
+
+    assert footprint.GetOrientationDegrees() == 90
+    assert footprint.Pads()[0].GetOrientationDegrees() == 0.0
+
+
+def test_courtyards(board_path):
+    board = read_board(board_path)
+    half_w, half_h = pcb_synth.footprint_courtyard(8)
+    margin = FromMM(0.05) // 2
+
+    for footprint, (x, y, angle) in zip(board.GetFootprints(), placements(board_path)):
+        w, h = (half_h, half_w) if angle in (90, 270) else (half_w, half_h)
+        courtyard = asyncio.run(get_footprint_courtyard(footprint))
+        expected = (FromMM(x - w) - margin, FromMM(y - h) - margin, FromMM(x + w) + margin, FromMM(y + h) + margin)
+        assert all(abs(a - b) <= 1 for a, b in zip(box_to_tuple(courtyard), expected))
+
+
+def test_nets_tracks_and_vias(board_path):
+    with open(board_path, encoding='utf-8') as f:
+        text = f.read()
+    board = read_board(board_path)
+    nets = board.GetNetsByName()
+
+    assert set(re.findall(r'\t\(net \d+ "([^"]*)"\)', text)) <= set(nets)
+    assert "GND" in nets
+    tracks = [item for item in board.GetTracks() if item.GetClass() == "PCB_TRACK"]
+    vias = [item for item in board.GetTracks() if item.GetClass() == "PCB_VIA"]
+    assert len(tracks) == 20
+    assert len(vias) == 5
+
+    first = re.search(r'\(segment \(start ([-\d.]+) ([-\d.]+)\) \(end ([-\d.]+) ([-\d.]+)\) \(width ([\d.]+)\)', text)
+    start, end = tracks[0].GetStart(), tracks[0].GetEnd()
+    assert (start.x, start.y, end.x, end.y) == tuple(FromMM(float(value)) for value in first.groups()[:4])
+    assert tracks[0].GetWidth() == FromMM(0.25)
+    assert vias[0].GetWidth() == FromMM(0.6)
+    assert vias[0].GetDrillValue() == FromMM(0.3)
+
+
+def test_collect_pcb_env(board_path):
+    env = asyncio.run(collect_pcb_env(read_board(board_path)))
+
+    assert [row[0] for row in env['modules']['rows']] == [f"U{i}" for i in range(1, 10)]
+    assert all(len(row[7]) == 8 and row[7][-1] == ['8', 'GND'] for row in env['modules']['rows'])
+    assert len(env['tracks']['rows']) == 20
+    assert len(env['vias']['rows']) == 5
+    gnd = next(row for row in env['nets']['rows'] if row[1] == "GND")
+    assert len(gnd[2]) == 9
+    assert env['board']['courtyard'] is not None
+
+
+def test_design_rule_check(tmp_path):
+    def overlap_and_leave_board(text):
+        at = FOOTPRINT_AT_RE.findall(text)
+        x, y = float(at[0][0]), float(at[0][1])
+        # U2 on top of U1, U3 outside the board edge
+        text = text.replace(f"(at {at[1][0]} {at[1][1]}", f"(at {x + 1:g} {y:g}", 1)
+        return text.replace(f"(at {at[2][0]} {at[2][1]}", "(at -50 -50", 1)
+
+    path = synth_board(tmp_path, footprints=4, pads=4, tracks=0, vias=0, seed=3, edit=overlap_and_leave_board)
+    board = load_board_readonly(path)
+    try:
+        check = asyncio.run(get_design_rule_state(board, 0.2).check())
+        keys = set(check['violations'])
+        uuids = {footprint.m_Uuid.AsString(): footprint.GetReference() for footprint in board.GetFootprints()}
+
+        clearances = {tuple(sorted(uuids[part] for part in key[1:])) for key in keys if key[0] == 'clearance'}
+        onboard = {uuids[key[1]] for key in keys if key[0] == 'onboard'}
+        assert clearances == {("U1", "U2")}
+        assert onboard == {"U3"}
+        assert check['rechecked'] == 4
+
+        again = asyncio.run(get_design_rule_state(board, 0.2).check())
+        assert again['rechecked'] == 0
+        assert again['violations'] == check['violations']
+    finally:
+        invalidate_board()
+
+
+def test_readonly_eviction_releases_caches(tmp_path, monkeypatch):
+    released = []
+    monkeypatch.setattr(board_cache, 'max_entries', 1)
+    monkeypatch.setattr(board_cache, '_release_hooks', board_cache._release_hooks + [released.append])
+    first = synth_board(tmp_path, "first.kicad_pcb", footprints=1, tracks=0, vias=0)
+    second = synth_board(tmp_path, "second.kicad_pcb", footprints=1, tracks=0, vias=0)
+    try:
+        load_board_readonly(first)
+        load_board_readonly(second)
+        assert released == [resolve_board_path(first)]
+    finally:
+        invalidate_board()
@@ -0,0 +1,99 @@
+import re
+import types
+
+import routing
+
+from routing import filter_dsn, export_dsn
+
+
+DSN = """(pcb "board.dsn"
+  (parser
+    (string_quote ")
+    (space_in_quoted_tokens on)
+    (host_cad "KiCad's Pcbnew")
+  )
+  (resolution um 10)
+  (network
+    (net GND
+      (pins U1-4 U2-4 U3-4)
+    )
+    (net "Net-(U1-Pad2)"
+      (pins U1-2 U2-1)
+    )
+    (net "/SIG A"
+      (pins U1-1 U3-1 U3-2)
+    )
+    (class kicad_default "" GND "/SIG A" "Net-(U1-Pad2)"
+      (circuit
+        (use_via Via[0-1]_600:300_um)
+      )
+      (rule
+        (width 250)
+        (clearance 200)
+      )
+    )
+  )
+  (wiring
+    (wire (path F.Cu 250  1000 1000  2000 1000)(net GND)(type route))
+    (wire (path B.Cu 250  1000 2000  2000 2000)(net "Net-(U1-Pad2)"))
+    (via "Via[0-1]_600:300_um"  1500 1500 (net GND)(type route))
+  )
+)
+"""
+
+
+def net_pins(text: str) -> dict:
+    return {name.strip('"'): pins.split() for name, pins in re.findall(r'\(net ("[^"]*"|\S+)\n\s+\(pins([^)]*)\)', text)}
+
+
+def wiring(text: str) -> list[str]:
+    return re.findall(r'\((?:wire|via) .*\)\n', text)
+
+
+def test_quoted_net_names():
+    text = filter_dsn(DSN, set(), {"Net-(U1-Pad2)", "/SIG A"}, protect=False)
+
+    assert net_pins(text) == {"GND": [], "Net-(U1-Pad2)": ["U1-2", "U2-1"], "/SIG A": ["U1-1", "U3-1", "U3-2"]}
+    # The class still lists every net, only the pins change
+    assert '(class kicad_default "" GND "/SIG A" "Net-(U1-Pad2)"' in text
+
+
+def test_nets_and_pins_together():
+    text = filter_dsn(DSN, {"U1-4", "U2-4", "U3-2"}, {"Net-(U1-Pad2)"}, protect=False)
+
+    assert net_pins(text) == {"GND": ["U1-4", "U2-4"], "Net-(U1-Pad2)": ["U1-2", "U2-1"], "/SIG A": ["U3-2"]}
+
+
+def test_wiring_is_protected():
+    text = filter_dsn(DSN, set(), {"GND"})
+
+    assert wiring(text) == [
+        '(wire (path F.Cu 250  1000 1000  2000 1000)(net GND)(type protect))\n',
+        '(wire (path B.Cu 250  1000 2000  2000 2000)(net "Net-(U1-Pad2)") (type protect))\n',
+        '(via "Via[0-1]_600:300_um"  1500 1500 (net GND)(type protect))\n',
+    ]
+    assert net_pins(text)["GND"] == ["U1-4", "U2-4", "U3-4"]
+
+
+def test_wiring_left_alone_without_protect():
+    text = filter_dsn(DSN, set(), {"GND"}, protect=False)
+
+    assert wiring(text) == wiring(DSN)
+    assert text.count("(type route)") == 2
+
+
+def test_export_dsn(tmp_path, monkeypatch):
+    def export(board, dsn_file):
+        with open(dsn_file, 'w', encoding='utf-8') as f:
+            f.write(DSN)
+
+    monkeypatch.setattr(routing, 'pcbnew', types.SimpleNamespace(ExportSpecctraDSN=export))
+    dsn_file = tmp_path / "board.dsn"
+
+    export_dsn(None, str(dsn_file))
+    assert dsn_file.read_text(encoding='utf-8') == DSN
+
+    export_dsn(None, str(dsn_file), keep_connections=[("U1", "1"), ("U3", 2)], nets=["GND"])
+    text = dsn_file.read_text(encoding='utf-8')
+    assert net_pins(text) == {"GND": ["U1-4", "U2-4", "U3-4"], "Net-(U1-Pad2)": [], "/SIG A": ["U1-1", "U3-2"]}
+    assert text.count("(type protect)") == 3
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import asyncio
+import types
+
+import pytest
+
+import pcb_routing
+import pcb_executor
+import pcb_synth
+
+from pcb_executor import BoardExecutor
+from pcb_reader import read_board
+from pcb_routing import RoutingJobManager, format_routing_job
+from routing import ROUTING_DEFAULTS, RoutingCache, get_routing_key, cache_routing_result
+
+
+STUB_ROUTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_router.py")
+
+GND_ZONE = '\t(zone (net 1) (net_name "GND") (layer "B.Cu") (uuid "6f1c1f6e-3c1b-4d0e-9f52-0d1f5b1c2a10") (hatch edge 0.5) ' \
+           '(min_thickness 0.25) (polygon (pts (xy 0 0) (xy {size} 0) (xy {size} {size}) (xy 0 {size}))))\n'
+
+
+class RouterStandIns:
+    """
+    Board side of a routing job without KiCad: the DSN export writes a placeholder, scoring reads the stub router's SES,
+    and imports and saves are recorded instead of touching the board.
+    """
+
+    def __init__(self):
+        self.imported = []
+        self.saved = []
+
+    async def score_routing_ses(self, file_path: str, ses_file: str) -> dict:
+        with open(ses_file, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        return {'unrouted': result['unrouted'], 'vias': result['vias']}
+
+    def export_dsn(self, board, dsn_file: str, keep_connections=None, nets=None) -> None:
+        with open(dsn_file, 'w', encoding='utf-8') as f:
+            f.write("(pcb stub)\n")
+
+    def import_ses(self, board, ses_file: str) -> None:
+        with open(ses_file, 'r', encoding='utf-8') as f:
+            self.imported.append(json.load(f)['seed'])
+
+    def save_board(self, file_path: str, board, changed: bool = True) -> bool:
+        self.saved.append(file_path)
+        return True
+
+
+@pytest.fixture
+def routing(monkeypatch, tmp_path):
+    # Inline mode sends tool output to stderr, keep that inside the test
+    monkeypatch.setattr(sys, 'stdout', sys.stdout)
+    monkeypatch.setattr(pcb_executor, '_board_executor', BoardExecutor("inline", 1))
+    stand_ins = RouterStandIns()
+    monkeypatch.setattr(pcb_routing, 'score_routing_ses', stand_ins.score_routing_ses)
+    monkeypatch.setattr(pcb_routing, 'export_dsn', stand_ins.export_dsn)
+    monkeypatch.setattr(pcb_routing, 'save_board', stand_ins.save_board)
+    monkeypatch.setattr(pcb_routing, 'pcbnew', types.SimpleNamespace(ImportSpecctraSES=stand_ins.import_ses))
+
+    board_path = pcb_synth.write_board(str(tmp_path / "board.kicad_pcb"), footprints=4, tracks=0, vias=0)
+    yield stand_ins, board_path
+    pcb_routing.invalidate_board()
+
+
+def make_manager(plans: dict, monkeypatch, command: list[str] = None) -> RoutingJobManager:
+    monkeypatch.setenv('STUB_ROUTER_PLAN', json.dumps(plans))
+    return RoutingJobManager(dict(ROUTING_DEFAULTS, command=command or [sys.executable, STUB_ROUTER]))
+
+
+async def wait_for(condition, timeout: float = 10.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.02)
+
+
+def test_best_seed_is_imported(routing, monkeypatch):
+    stand_ins, board_path = routing
+    manager = make_manager({'default': {'passes': 4, 'sleep': 0.4},
+                            '1': {'unrouted': 2, 'vias': 0},
+                            '2': {'unrouted': 0, 'vias': 7},
+                            '3': {'unrouted': 0, 'vias': 3},
+                            '4': {'unrouted': 0, 'vias': 3}}, monkeypatch)
+
+    async def main():
+        job = manager.submit(board_path, seeds=[1, 2, 3, 4], max_parallel=2, use_cache=False)
+        await wait_for(lambda: any(run.status == "running" and run.passes > 0 for run in job.runs))
+        assert job.status == "routing"
+        assert "pass" in format_routing_job(job)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.status == "done", job.message
+    assert [run.status for run in job.runs] == ["done"] * 4
+    assert all(run.passes == 4 for run in job.runs)
+    # Fewest unrouted first, then fewest vias, then the lowest seed
+    assert job.best.seed == 3
+    assert stand_ins.imported == [3]
+    assert stand_ins.saved == [board_path]
+    assert "Best: seed 3 with 0 unrouted connections and 3 vias" in format_routing_job(job)
+
+
+def test_timeout(routing, monkeypatch):
+    stand_ins, board_path = routing
+    manager = make_manager({'1': {'sleep': 30}, '2': {'unrouted': 1, 'vias': 1}}, monkeypatch)
+
+    async def main():
+        job = manager.submit(board_path, seeds=[1, 2], timeout=0.5, use_cache=False)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.runs[0].status == "timeout"
+    assert job.runs[0].result is None
+    assert job.status == "done", job.message
+    assert job.best.seed == 2
+    assert stand_ins.imported == [2]
+
+
+def test_cancel(routing, monkeypatch):
+    stand_ins, board_path = routing
+    manager = make_manager({'default': {'sleep': 30}}, monkeypatch)
+
+    async def main():
+        job = manager.submit(board_path, seeds=[1, 2, 3], max_parallel=2, use_cache=False)
+        await wait_for(lambda: job.status == "routing" and job.runs[1].status == "running")
+        assert manager.cancel(job.id).startswith("SUCCESS")
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.status == "cancelled"
+    assert [run.status for run in job.runs] == ["cancelled"] * 3
+    assert not any(os.path.exists(run.ses_file) for run in job.runs)
+    assert stand_ins.imported == []
+    assert manager.cancel(job.id).startswith("Error")
+
+
+def test_board_changed_while_routing(routing, monkeypatch):
+    stand_ins, board_path = routing
+    manager = make_manager({'default': {'sleep': 0.5}}, monkeypatch)
+
+    async def main():
+        job = manager.submit(board_path, seeds=[1], use_cache=False)
+        await wait_for(lambda: job.runs[0].status == "running")
+        stat = os.stat(board_path)
+        os.utime(board_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.status == "failed"
+    assert job.message.startswith("Error: The board changed while routing")
+    assert os.path.exists(job.runs[0].ses_file)
+    assert stand_ins.imported == []
+    assert stand_ins.saved == []
+
+
+def test_router_does_not_start(routing, monkeypatch, tmp_path):
+    stand_ins, board_path = routing
+    manager = make_manager({}, monkeypatch, command=[str(tmp_path / "missing_router")])
+
+    async def main():
+        job = manager.submit(board_path, seeds=[1, 2], use_cache=False)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+
+    assert [run.status for run in job.runs] == ["failed"] * 2
+    assert all(run.error.startswith("Could not start the router") for run in job.runs)
+    assert job.status == "failed"
+    assert job.message == "Error: No seed finished routing"
+
+
+def test_repeated_job_reuses_the_cache(routing, monkeypatch, tmp_path):
+    stand_ins, board_path = routing
+    cache = RoutingCache(str(tmp_path / "cache"), 1 << 20)
+    monkeypatch.setattr(pcb_routing, 'get_routing_cache', lambda: cache)
+    manager = make_manager({'1': {'unrouted': 1}, '2': {'unrouted': 0, 'vias': 2}}, monkeypatch)
+
+    async def main():
+        first = manager.submit(board_path, seeds=[1, 2])
+        await first.task
+        second = manager.submit(board_path, seeds=[1, 2])
+        await second.task
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first.status == "done", first.message
+    assert second.status == "done", second.message
+    assert second.message.endswith("reused from the routing cache")
+    assert [run.status for run in second.runs] == ["skipped"] * 2
+    assert not any(run.started for run in second.runs)
+    assert stand_ins.imported == [2, 2]
+    assert cache.get(first.key) is not None
+
+
+def write_key_board(tmp_path, name: str, seed: int = 0, zone_size=None) -> str:
+    text = pcb_synth.generate_board(footprints=4, tracks=2, vias=1, seed=seed)
+    if zone_size is not None:
+        text = text[:text.rindex(")")] + GND_ZONE.format(size=zone_size) + ")\n"
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_routing_key_covers_zones_and_rules(tmp_path):
+    board_path = write_key_board(tmp_path, "board.kicad_pcb")
+    key = get_routing_key(read_board(board_path))
+
+    assert get_routing_key(read_board(write_key_board(tmp_path, "copy.kicad_pcb"))) == key
+    assert get_routing_key(read_board(board_path), nets=["GND"]) != key
+    zoned = get_routing_key(read_board(write_key_board(tmp_path, "zoned.kicad_pcb", zone_size=10)))
+    assert zoned != key
+    assert get_routing_key(read_board(write_key_board(tmp_path, "zoned2.kicad_pcb", zone_size=20))) != zoned
+
+    project = {'net_settings': {'classes': [{'name': "Default", 'clearance': 0.2, 'track_width': 0.25}]}, 'board': {'design_settings': {}}}
+    (tmp_path / "board.kicad_pro").write_text(json.dumps(project), encoding='utf-8')
+    with_rules = get_routing_key(read_board(board_path))
+    assert with_rules != key
+    project['net_settings']['classes'][0]['clearance'] = 0.3
+    (tmp_path / "board.kicad_pro").write_text(json.dumps(project), encoding='utf-8')
+    assert get_routing_key(read_board(board_path)) != with_rules
+    (tmp_path / "board.kicad_dru").write_text('(version 1)\n(rule "HV" (constraint clearance (min 1mm)))\n', encoding='utf-8')
+    assert get_routing_key(read_board(board_path)) not in (key, with_rules)
+
+
+def test_routed_board_key_is_cached(tmp_path):
+    cache = RoutingCache(str(tmp_path / "cache"), 1 << 20)
+    before = read_board(write_key_board(tmp_path, "before.kicad_pcb", seed=1))
+    after = read_board(write_key_board(tmp_path, "after.kicad_pcb", seed=2))
+    ses_file = tmp_path / "result.ses"
+    ses_file.write_text("(session stub)", encoding='utf-8')
+
+    key = get_routing_key(before)
+    cache_routing_result(cache, after, str(ses_file), key)
+
+    assert cache.get(key) is not None
+    assert cache.get(get_routing_key(after)) is not None
+    assert get_routing_key(after) != key
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = RoutingCache(str(tmp_path / "cache"), 250)
+    ses_file = tmp_path / "result.ses"
+    ses_file.write_text("x" * 100, encoding='utf-8')
+
+    for age, key in enumerate(["first", "second"]):
+        path = cache.put(key, str(ses_file))
+        os.utime(path, (1000 + age, 1000 + age))
+    # Using the first entry makes the second one the least recently used
+    assert cache.get("first") is not None
+    cache.put("third", str(ses_file))
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None